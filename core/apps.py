@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from . import counting
+
+        # 单行写入时让分页计数缓存失效；bulk_create/update 等批量写由 sync 负责
+        for model in self.get_models():
+            post_save.connect(counting.model_written, sender=model, dispatch_uid=f'count:save:{model._meta.label}')
+            post_delete.connect(counting.model_written, sender=model, dispatch_uid=f'count:delete:{model._meta.label}')
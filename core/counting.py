@@ -0,0 +1,119 @@
+# core/counting.py
+"""
+分页总数（COUNT）策略。
+  - 精确计数按规范化 SQL 缓存，键中带上查询涉及的每张表的代数，
+    任何一张表有写入（post_save/post_delete 或 sync 的批量写）都会让键失效，另有短 TTL 兜底；
+  - 表较大时不做 COUNT(*)，改用数据库的行数估算（MySQL EXPLAIN rows×filtered，
+    PostgreSQL EXPLAIN Plan Rows），估算值不低于 COUNT_ESTIMATE_THRESHOLD 时直接返回，
+    并在分页结果里标记 count_is_estimate。SQLite 等无估算能力的后端始终精确计数。
+    估算值只用于展示总数，翻页不依赖它（见 pagination.CountingPaginator）。
+表代数放在共享缓存中；缓存是进程内的（list_cache.is_shared 为 False）或缓存后端不可用时不缓存计数。
+"""
+import hashlib
+import json
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+
+from . import list_cache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'count'
+
+
+def get_timeout():
+    return getattr(settings, 'COUNT_CACHE_TIMEOUT', 30)
+
+
+def get_threshold():
+    return getattr(settings, 'COUNT_ESTIMATE_THRESHOLD', None)
+
+
+def is_enabled():
+    return getattr(settings, 'COUNT_CACHE_ENABLED', True)
+
+
+def bump_tables(*db_tables):
+    for db_table in set(db_tables):
+        list_cache.bump_generation(f'table:{db_table}')
+
+
+def bump_models(*models):
+    bump_tables(*(model._meta.db_table for model in models))
+
+
+def model_written(sender, **kwargs):
+    """post_save / post_delete 信号处理：使该表相关的计数缓存失效"""
+    bump_models(sender)
+
+
+def _tables(sql, using):
+    quote = connections[using].ops.quote_name
+    return sorted(
+        model._meta.db_table for model in apps.get_app_config('core').get_models()
+        if quote(model._meta.db_table) in sql
+    )
+
+
+def _make_key(queryset):
+    sql, params = queryset.order_by().query.get_compiler(queryset.db).as_sql()
+    generations = [(table, list_cache.get_generation(f'table:{table}')) for table in _tables(sql, queryset.db)]
+    if any(generation is None for _, generation in generations):
+        return None
+    raw = json.dumps([sql, [str(p) for p in params], generations], ensure_ascii=False)
+    return f'{KEY_PREFIX}:{hashlib.md5(raw.encode("utf-8")).hexdigest()}'
+
+
+def estimate_count(queryset):
+    """数据库行数估算，后端不支持时返回 None"""
+    connection = connections[queryset.db]
+    sql, params = queryset.order_by().query.get_compiler(queryset.db).as_sql()
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]['Plan']['Plan Rows'])
+            if connection.vendor == 'mysql':
+                cursor.execute('EXPLAIN ' + sql, params)
+                columns = [column[0] for column in cursor.description]
+                estimate = 1.0
+                for row in cursor.fetchall():
+                    row = dict(zip(columns, row))
+                    # 相关子查询的 rows 是每次执行的行数，不参与相乘
+                    if row.get('select_type') not in ('SIMPLE', 'PRIMARY') or row.get('rows') is None:
+                        continue
+                    estimate *= row['rows'] * float(row.get('filtered') or 100) / 100
+                return int(estimate)
+    except Exception as e:
+        logger.warning(f"Row estimate failed, falling back to COUNT(*): {e}")
+    return None
+
+
+def get_count(queryset):
+    """返回 (count, is_estimate)"""
+    if not is_enabled():
+        return queryset.count(), False
+
+    key = _make_key(queryset) if list_cache.is_shared() else None
+    if key is not None:
+        cached = list_cache.get_value(key)
+        if cached is not None:
+            return cached
+
+    result = None
+    threshold = get_threshold()
+    if threshold is not None:
+        estimate = estimate_count(queryset)
+        if estimate is not None and estimate >= threshold:
+            result = (estimate, True)
+    if result is None:
+        result = (queryset.count(), False)
+    if key is not None:
+        list_cache.set_value(key, result, get_timeout())
+    return result
@@ -0,0 +1,247 @@
+# core/dimensions.py
+"""
+批量写题目时的维度解析（Category / Major / Chapter / ExamGroup / Source / ExerciseType / School / Exam）。
+先收集整批数据里出现的全部维度键，每张表一次查询取回已有行，缺失的 bulk_create，
+之后每道题都从内存字典取外键对象，不再逐题 get_or_create。
+
+匹配规则与原来的 get_or_create 一致：同名（且同上级）视为同一行，已有多行时取主键最小的一行；
+MySQL 默认排序规则不区分大小写，比较键时同样转小写，避免插入只差大小写的重复行。
+"""
+import logging
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Category, Chapter, Exam, ExamGroup, ExerciseType, Major, School, Source
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+EXAM_FIELDS = ('from_school', 'exam_time', 'exam_code', 'exam_full_name')
+
+
+def _norm(value):
+    if isinstance(value, str) and connection.vendor == 'mysql':
+        return value.lower()
+    return value
+
+
+def _batches(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class DimensionResolver:
+    """
+    resolver = DimensionResolver(validated_data_list)
+    resolver.taxonomy(data)          -> {'category': ..., 'major': ..., ...}
+    resolver.exam(exam_data)         -> Exam（exam_data 与 ExerciseFromSerializer 拼出的查询条件一致）
+    """
+
+    def __init__(self, data_list):
+        self.categories = {}
+        self.majors = {}
+        self.chapters = {}
+        self.exam_groups = {}
+        self.sources = {}
+        self.types = {}
+        self.schools = {}
+        self.exams = {}
+        self._resolve(list(data_list))
+
+    # ---- 对外接口 ----
+
+    def taxonomy(self, data):
+        """按 ExerciseWriteSerializer 原有规则取出一道题的层级/来源/题型；major 等缺少上级时为 None"""
+        category = self.categories.get(_norm(data.get('category')))
+        major = self.majors.get((_norm(data.get('major')), category.pk)) if category and data.get('major') else None
+        chapter = self.chapters.get((_norm(data.get('chapter')), major.pk)) if major and data.get('chapter') else None
+        exam_group = (
+            self.exam_groups.get((_norm(data.get('examgroup')), chapter.pk)) if chapter and data.get('examgroup') else None
+        )
+        return {
+            'category': category,
+            'major': major,
+            'chapter': chapter,
+            'exam_group': exam_group,
+            'source': self.sources.get(_norm(data.get('source'))) if data.get('source') else None,
+            'exercise_type': self.types.get(_norm(data.get('type'))),
+        }
+
+    def school(self, name):
+        return self.schools.get(_norm(name))
+
+    def exam(self, exam_data):
+        return self.exams.get(self._exam_key(exam_data))
+
+    def exam_for(self, exercise_from, category):
+        """exercise_from 按 from_school 等字段对应的试卷（与 ExerciseFromSerializer 的匹配规则一致），没有时返回 None"""
+        exam_data = self.exam_data(exercise_from, category)
+        if exam_data is None:
+            return None
+        if exam_data.get('from_school'):
+            exam_data['school'] = self.school(exam_data['from_school'])
+        return self.exam(exam_data)
+
+    @staticmethod
+    def exam_data(exercise_from, category):
+        """由 exercise_from 的 from_school 等字段拼出试卷查询条件（不含 school），无可用字段时返回 None"""
+        if not exercise_from or exercise_from.get('exam') or exercise_from.get('exam_write'):
+            return None
+        exam_data = {field: exercise_from.get(field) for field in EXAM_FIELDS if exercise_from.get(field) is not None}
+        if not any(exercise_from.get(field) for field in EXAM_FIELDS) or not exam_data:
+            return None
+        if category is not None:
+            exam_data['category'] = category
+        return exam_data
+
+    # ---- 解析 ----
+
+    def _resolve(self, data_list):
+        self.categories = self._get_or_create(
+            Category, 'category_name', {_norm(d['category']): {'category_name': d['category']} for d in data_list if d.get('category')}
+        )
+        self.sources = self._get_or_create(
+            Source, 'source_name', {_norm(d['source']): {'source_name': d['source']} for d in data_list if d.get('source')}
+        )
+        self.types = self._get_or_create(
+            ExerciseType, 'type_name', {_norm(d['type']): {'type_name': d['type']} for d in data_list if d.get('type')}
+        )
+
+        wanted = {}
+        for d in data_list:
+            category = self.categories.get(_norm(d.get('category')))
+            if category and d.get('major'):
+                wanted[(_norm(d['major']), category.pk)] = {'major_name': d['major'], 'category': category}
+        self.majors = self._get_or_create(Major, ('major_name', 'category_id'), wanted)
+
+        wanted = {}
+        for d in data_list:
+            major = self.taxonomy_part(d, 'major')
+            if major and d.get('chapter'):
+                wanted[(_norm(d['chapter']), major.pk)] = {'chapter_name': d['chapter'], 'major': major}
+        self.chapters = self._get_or_create(Chapter, ('chapter_name', 'major_id'), wanted)
+
+        wanted = {}
+        for d in data_list:
+            chapter = self.taxonomy_part(d, 'chapter')
+            if chapter and d.get('examgroup'):
+                wanted[(_norm(d['examgroup']), chapter.pk)] = {'examgroup_name': d['examgroup'], 'chapter': chapter}
+        self.exam_groups = self._get_or_create(ExamGroup, ('examgroup_name', 'chapter_id'), wanted)
+
+        exam_lookups = [
+            self.exam_data(d.get('exercise_from'), self.categories.get(_norm(d.get('category'))))
+            for d in data_list
+        ]
+        exam_lookups = [lookup for lookup in exam_lookups if lookup]
+        self.schools = self._get_or_create(
+            School, 'name', {_norm(l['from_school']): {'name': l['from_school']} for l in exam_lookups if l.get('from_school')}
+        )
+        for lookup in exam_lookups:
+            if lookup.get('from_school'):
+                lookup['school'] = self.school(lookup['from_school'])
+        self._resolve_exams(exam_lookups)
+
+    def taxonomy_part(self, data, level):
+        return self.taxonomy(data)[level]
+
+    @staticmethod
+    def _exam_key(exam_data):
+        items = []
+        for field, value in exam_data.items():
+            if field in ('school', 'category'):
+                items.append((f'{field}_id', value.pk if value is not None else None))
+            else:
+                items.append((field, _norm(value)))
+        return tuple(sorted(items))
+
+    @staticmethod
+    def _exam_matches(exam, key):
+        return all(_norm(getattr(exam, field)) == value for field, value in key)
+
+    def _resolve_exams(self, lookups):
+        """
+        试卷按 get_or_create(**exam_data) 的语义匹配：只比较给出的字段，未给出的字段不限。
+        一次查询取回所有候选行；同一批里后面的条件也能匹配到前面刚新建的试卷，与逐条执行的结果一致。
+        """
+        originals = {}
+        for lookup in lookups:
+            originals.setdefault(self._exam_key(lookup), lookup)
+        if not originals:
+            return
+
+        candidates = []
+        for batch in _batches(originals):
+            query = Q()
+            for key in batch:
+                query |= Q(**dict(key))
+            candidates.extend(Exam.objects.filter(query).order_by('pk'))
+
+        created = []
+        for key, lookup in originals.items():
+            exam = next((e for e in candidates if self._exam_matches(e, key)), None)
+            if exam is None:
+                exam = next((e for e in created if self._exam_matches(e, key)), None)
+            if exam is None:
+                exam = Exam(**lookup)
+                created.append(exam)
+            self.exams[key] = exam
+
+        if created:
+            Exam.objects.bulk_create(created, batch_size=BATCH_SIZE)
+            if any(exam.pk is None for exam in created):
+                self._refetch_exam_pks(created)
+            logger.debug(f"Created {len(created)} Exam rows")
+
+    def _refetch_exam_pks(self, created):
+        # 后端不回填主键（MySQL）：按完整字段查回刚插入的行，取主键最大者
+        fields = ('category_id', 'school_id') + EXAM_FIELDS
+        for batch in _batches(created):
+            query = Q()
+            keys = []
+            for exam in batch:
+                key = tuple((field, _norm(getattr(exam, field))) for field in fields)
+                keys.append(key)
+                query |= Q(**dict(key))
+            rows = list(Exam.objects.filter(query).order_by('-pk'))
+            for exam, key in zip(batch, keys):
+                match = next((row for row in rows if self._exam_matches(row, key)), None)
+                if match is not None:
+                    exam.pk = match.pk
+
+    def _get_or_create(self, model, key_fields, wanted):
+        """
+        wanted: {归一化键: 新建时的字段}；键为单字段名时是值本身，多字段时是元组。
+        一次查询取回已有行（取主键最小者），缺失的 bulk_create；后端不回填主键时（MySQL）按键再查一次。
+        """
+        if not wanted:
+            return {}
+        single = isinstance(key_fields, str)
+        fields = (key_fields,) if single else key_fields
+
+        def key_of(obj):
+            values = tuple(_norm(getattr(obj, field)) for field in fields)
+            return values[0] if single else values
+
+        def fetch(keys):
+            # 各字段分别 IN 过滤，再在内存里按组合键精确匹配
+            found = {}
+            for batch in _batches(keys):
+                lookup = {
+                    f'{field}__in': {key if single else key[i] for key in batch} for i, field in enumerate(fields)
+                }
+                for obj in model.objects.filter(**lookup).order_by('pk'):
+                    found.setdefault(key_of(obj), obj)
+            return found
+
+        resolved = fetch(wanted)
+        missing = [key for key in wanted if key not in resolved]
+        if missing:
+            created = model.objects.bulk_create([model(**wanted[key]) for key in missing], batch_size=BATCH_SIZE)
+            if all(obj.pk is not None for obj in created):
+                resolved.update(zip(missing, created))
+            else:
+                resolved.update(fetch(missing))
+            logger.debug(f"Created {len(missing)} {model.__name__} rows")
+        return resolved
@@ -0,0 +1,235 @@
+# core/export_cache.py
+"""
+导出文件缓存。
+同一组筛选条件在数据没有变化时导出的内容相同，第一次导出边流式返回边写入
+EXPORT_CACHE_DIR，之后直接读文件：
+  - 文件名 = 筛选条件摘要 + 数据代数（沿用 list_cache 的 epoch / 分类 / all 代数），
+    代数变化后旧文件不会再被命中，也就不需要在写入时同步删除才能保证正确；
+  - ETag 由同样的摘要和代数组成，不读文件就能回答 If-None-Match（304）；
+  - 命中时支持单段 Range / If-Range，断点续传大文件；
+  - 数据写入后按代数清理过期文件（sync 调用 invalidate）：题目写入只检查涉及的分类和 all，
+    epoch 变化时检查全部分类，只保留当前代数的文件，其他分类、当前代数的文件不受影响。
+代数来自 list_cache 的共享计数器，进程内缓存上各 worker 的代数互不可见，会继续命中旧文件、
+返回旧 ETag，所以与列表缓存一样只在 list_cache.is_shared() 时开启；缓存后端不可用时直接流式导出。
+写入先落到临时文件，完整生成后再原子替换，客户端中途断开或导出出错时不会留下半个文件。
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import exporting, list_cache
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def is_enabled():
+    return getattr(settings, 'EXPORT_CACHE_ENABLED', True) and list_cache.is_shared()
+
+
+def get_dir():
+    return getattr(settings, 'EXPORT_CACHE_DIR', os.path.join('media', 'exports', 'cache'))
+
+
+def _scope_dir(scope):
+    return os.path.join(get_dir(), scope.replace(':', '-'))
+
+
+def _version(scope):
+    """当前代数；缓存后端不可用时返回 None"""
+    generations = (list_cache.get_generation('epoch'), list_cache.get_generation(scope))
+    if None in generations:
+        return None
+    return f'{generations[0]}.{generations[1]}'
+
+
+class Artifact:
+    """一组筛选条件 + 输出格式在当前数据代数下对应的导出文件"""
+
+    def __init__(self, filters, ndjson=False, gzip=False, encoding=None):
+        filters = {name: str(value) for name, value in filters.items() if value not in (None, '')}
+        category_id = filters.get('category_id')
+        self.scope = f'category:{category_id}' if category_id else 'all'
+        self.version = version = _version(self.scope)
+        self.content_type, self.ext = exporting.output_format(ndjson=ndjson, gzip=gzip)
+        # .gz 下载与 gzip 传输压缩的字节相同，共用一个文件；ETag 按表示形式区分
+        self.encoding = None if gzip else encoding
+        self.compression = 'gzip' if gzip else encoding
+        stored = f"{'ndjson' if ndjson else 'json'}{'.' + exporting.COMPRESSIONS[self.compression] if self.compression else ''}"
+        self.digest = hashlib.sha1(
+            json.dumps([sorted(filters.items()), stored]).encode('utf-8')
+        ).hexdigest()[:20]
+        self.etag = f'"{self.digest}-{version}{"-" + self.encoding if self.encoding else ""}"'
+        self.path = os.path.join(_scope_dir(self.scope), f'{self.digest}.{version}.{stored}')
+
+    def write_through(self, stream):
+        """边产出边写临时文件，完整结束后替换为正式文件并清理同一筛选条件的旧版本"""
+        directory = os.path.dirname(self.path)
+        tmp_path = os.path.join(directory, f'.{uuid.uuid4().hex}.tmp')
+        try:
+            os.makedirs(directory, exist_ok=True)
+            f = open(tmp_path, 'wb')
+        except OSError as e:
+            logger.warning(f"Export cache disabled for {self.path}: {e}")
+            yield from stream
+            return
+        done = False
+        try:
+            with f:
+                for chunk in stream:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, self.path)
+            done = True
+        finally:
+            if not done:
+                _remove(tmp_path)
+        for path in glob.glob(os.path.join(directory, f'{self.digest}.*')):
+            if path != self.path:
+                _remove(path)
+        logger.info(f"Cached export {self.path}")
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _read(f, start, length):
+    with f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def _parse_range(header, size):
+    """单段 bytes 范围 -> (start, end)；格式不支持时返回 None（按完整文件响应），无法满足时返回 False"""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # bytes=-N：最后 N 个字节
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def etag_matches(etag, header):
+    """If-None-Match / If-Range 是否包含 etag（忽略弱校验前缀 W/）"""
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+    return '*' in tags or etag in tags
+
+
+def file_response(request, path, content_type, etag):
+    """从文件响应，处理 Range / If-Range；文件不存在时返回 None"""
+    try:
+        # 先打开再读：之后文件即使被 invalidate 删除也不影响本次读取
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    size = os.fstat(f.fileno()).st_size
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    byte_range = _parse_range(header, size) if header and (not if_range or etag_matches(etag, if_range)) else None
+    if byte_range is False:
+        f.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        start, end = 0, size - 1
+        response = StreamingHttpResponse(_read(f, 0, size), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read(f, start, end - start + 1), content_type=content_type, status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    return response
+
+
+def response(request, exercises, filters, filename, ndjson=False, gzip=False, encoding=None):
+    """
+    导出响应：filters 为决定导出内容的筛选条件（如 {'category_id': 3}），filename 不含扩展名；
+    encoding 为传输压缩（'gzip' / 'zstd'），各压缩方式分别缓存。
+    未开启缓存时等同 exporting.streaming_response。
+    """
+    if not is_enabled():
+        return exporting.streaming_response(exercises, filename, ndjson=ndjson, gzip=gzip, encoding=encoding)
+
+    artifact = Artifact(filters, ndjson=ndjson, gzip=gzip, encoding=encoding)
+    if artifact.version is None:
+        return exporting.streaming_response(exercises, filename, ndjson=ndjson, gzip=gzip, encoding=encoding)
+    if etag_matches(artifact.etag, request.META.get('HTTP_IF_NONE_MATCH')):
+        result = HttpResponseNotModified()
+    else:
+        result = file_response(request, artifact.path, artifact.content_type, artifact.etag)
+        if result is None:
+            # 未命中时忽略 Range，完整返回（RFC 9110 允许），同时写入缓存
+            stream = exporting.export_stream(exercises, ndjson=ndjson, compression=artifact.compression)
+            result = StreamingHttpResponse(artifact.write_through(stream), content_type=artifact.content_type)
+    if result.status_code in (200, 206):
+        exporting.set_download_headers(result, filename, artifact.ext, artifact.encoding)
+        result['Accept-Ranges'] = 'bytes'
+    else:
+        patch_vary_headers(result, ('Accept-Encoding',))
+    result['ETag'] = artifact.etag
+    return result
+
+
+def _all_scopes():
+    try:
+        names = os.listdir(get_dir())
+    except OSError:
+        return set()
+    return {name.replace('-', ':', 1) for name in names}
+
+
+def invalidate(category_ids=None):
+    """
+    删除不是当前代数的已缓存导出文件（需在 list_cache 递增代数之后调用）。
+    category_ids 为涉及的分类，检查这些分类和 all；None 表示 epoch 变化，检查全部分类。
+    """
+    if category_ids is None:
+        scopes = _all_scopes()
+    else:
+        scopes = {f'category:{category_id}' for category_id in category_ids if category_id is not None} | {'all'}
+    removed = 0
+    for scope in scopes:
+        # 文件名为 {digest}.{epoch}.{代数}.{格式}；以 . 开头的临时文件不会被 glob 匹配
+        version = _version(scope)
+        if version is None:
+            continue
+        for path in glob.glob(os.path.join(_scope_dir(scope), '*')):
+            if os.path.basename(path).split('.', 1)[1].startswith(f'{version}.'):
+                continue
+            _remove(path)
+            removed += 1
+    if removed:
+        logger.debug(f"Removed {removed} stale cached exports in {len(scopes)} scopes")
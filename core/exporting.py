@@ -0,0 +1,402 @@
+# core/exporting.py
+"""
+题目导出的记录格式与流式输出。
+两个导出视图共用同一份记录格式（与导入格式一致，可直接再导入）。
+取数按 exercise_id 分块，每块主表和四张子表各一条 values_list 查询，在内存里拼装记录，
+整块一次编码（装有 orjson 时用 orjson），不实例化模型对象。输出两种格式：
+  - JSON 数组：逐块写出元素，逗号由生成器自身维护，不依赖预先统计的总数；
+  - NDJSON：每行一个对象，可按行切分并行处理，也可直接追加到已有文件。
+两种格式都可以边生成边压缩：?gzip=true 下载 .gz 文件；或按 Accept-Encoding / ?compress=
+做 gzip / zstd 传输压缩（Content-Encoding）。压缩对象逐块喂入，内存占用只与块大小有关。
+大分类可以改用后台任务（ExportJob）导出到文件，按块更新进度，完成后再下载。
+后台任务的执行方式同导入（EXPORT_JOB_MODE，默认 celery）；每块写入时刷新 updated_at，
+执行中的任务超过 EXPORT_JOB_STALE_TIMEOUT 秒没有进度时，查询时标记为失败并删除临时文件（fail_if_stale）。
+"""
+import json
+import logging
+import os
+import threading
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+
+from .models import Exercise, ExerciseAnalysis, ExerciseAnswer, ExerciseImage, ExportJob, Question
+
+try:
+    import orjson
+except ImportError:  # 未安装时退回标准库编码器，输出内容相同
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # 未安装时只提供 gzip 压缩
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+# 压缩方式 -> 文件扩展名；GZIP_LEVEL 与 zlib 默认一致，ZSTD_LEVEL 为 zstd 默认级别
+COMPRESSIONS = {'gzip': 'gz', 'zstd': 'zst'}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# 主表一次查询取出的列（外键名称、题干、来源、试卷都走 JOIN），顺序与 build_record 的解包一致
+EXERCISE_COLUMNS = (
+    'exercise_id',
+    'category__category_name',
+    'major__major_name',
+    'chapter__chapter_name',
+    'exam_group__examgroup_name',
+    'source__source_name',
+    'exercise_type__type_name',
+    'level',
+    'score',
+    'stem__stem_content',
+    'exercise_from',
+    'exercise_from__is_official_exercise',
+    'exercise_from__exam',
+    'exercise_from__exam__from_school',
+    'exercise_from__exam__exam_time',
+    'exercise_from__exam__exam_code',
+    'exercise_from__exam__exam_full_name',
+    'exercise_from__exercise_number',
+    'exercise_from__material_name',
+    'exercise_from__section',
+    'exercise_from__page_number',
+)
+
+# 子表：(记录中的键, 模型, 导出字段, 排序)；字段名即导出的键名，排序与原先的预取一致
+CHILDREN = (
+    ('questions', Question,
+     ('question_order', 'question_stem', 'question_answer', 'question_analysis'), ('question_id',)),
+    ('answer', ExerciseAnswer,
+     ('answer_content', 'mark', 'from_model', 'render_type', 'answer_order'), ('answer_order', 'answer_id')),
+    ('analysis', ExerciseAnalysis,
+     ('analysis_content', 'mark', 'render_type'), ('analysis_id',)),
+    ('image_links', ExerciseImage,
+     ('image_link', 'source_type', 'is_deprecated', 'ocr_result'), ('image_id',)),
+)
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 1000)
+
+
+def build_record(row, children):
+    """由主表一行和按题目分组的子表数据拼出一条导出记录（格式与导入一致）"""
+    (exercise_id, category, major, chapter, examgroup, source, exercise_type, level, score, stem,
+     from_id, is_official_exercise, exam_id, from_school, exam_time, exam_code, exam_full_name,
+     exercise_number, material_name, section, page_number) = row
+    has_from = from_id is not None
+    has_exam = exam_id is not None
+    questions, answers, analyses, images = (group.get(exercise_id, []) for group in children)
+    return {
+        "exercise_id": exercise_id,
+        "category": category,
+        "major": major,
+        "chapter": chapter,
+        "examgroup": examgroup,
+        "source": source,
+        "type": exercise_type,
+        "level": level,
+        "score": score,
+        "stem": stem,
+        "questions": questions,
+        "answer": answers,
+        "analysis": analyses,
+        "exercise_from": {
+            "is_official_exercise": is_official_exercise if has_from else 0,
+            "from_school": from_school if has_exam else "",
+            "exam_time": exam_time if has_exam else "",
+            "exam_code": exam_code if has_exam else "",
+            "exam_full_name": exam_full_name if has_exam else "",
+            "exercise_number": exercise_number if has_from else 0,
+            "material_name": material_name if has_from else "",
+            "section": section if has_from else "",
+            "page_number": page_number if has_from else 0
+        },
+        "image_links": images
+    }
+
+
+def _children(ids):
+    """每张子表一次 values_list 查询，在内存里按 exercise_id 分组为字典列表"""
+    groups = []
+    for _, model, fields, ordering in CHILDREN:
+        group = {}
+        rows = model.objects.filter(exercise_id__in=ids).order_by(*ordering).values_list('exercise_id', *fields)
+        for exercise_id, *values in rows:
+            group.setdefault(exercise_id, []).append(dict(zip(fields, values)))
+        groups.append(group)
+    return groups
+
+
+def iter_batches(queryset, size=None):
+    """
+    按 exercise_id 升序分块产出导出记录列表。
+    每块按上一块的最大 id 向后取 size 行（不用 OFFSET），共 1 条主查询 + 4 条子表查询，
+    全程只取 values_list 元组、不实例化模型；单条出错时记录日志并跳过。
+    """
+    size = size or chunk_size()
+    last_id = None
+    count = 0
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(exercise_id__gt=last_id)
+        rows = list(chunk.order_by('exercise_id').values_list(*EXERCISE_COLUMNS)[:size])
+        if not rows:
+            break
+        ids = [row[0] for row in rows]
+        children = _children(ids)
+        batch = []
+        for row in rows:
+            try:
+                batch.append(build_record(row, children))
+            except Exception as e:
+                logger.error(f"Error processing exercise {row[0]}: {str(e)}")
+        count += len(batch)
+        if batch:
+            yield batch
+        if len(rows) < size:
+            break
+        last_id = ids[-1]
+    logger.info(f"Finished generating export stream, total exercises: {count}")
+
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(value):
+    """编码为紧凑的 UTF-8 JSON 字节串；装有 orjson 时用 orjson"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return _ENCODER.encode(value).encode('utf-8')
+
+
+def json_stream(batches):
+    """JSON 数组：'[' + 逐块整体编码的元素 + ']'；每块编码为一个列表后去掉首尾方括号"""
+    yield b'['
+    first = True
+    for batch in batches:
+        data = dumps(batch)[1:-1]
+        yield data if first else b',' + data
+        first = False
+    yield b']'
+
+
+def ndjson_stream(batches):
+    """NDJSON：每条记录一行"""
+    for batch in batches:
+        yield b''.join(dumps(record) + b'\n' for record in batch)
+
+
+def available_encodings():
+    """可用的压缩方式，按优先顺序（zstd 压缩和解压都更快）"""
+    return ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    按 Accept-Encoding 选择压缩方式：q 值高者优先，相同时按 available_encodings 的顺序；
+    客户端不接受压缩或更偏好 identity 时返回 None。
+    """
+    weights = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    if best is not None and weights.get('identity', 0.0) > best_q:
+        return None
+    return best
+
+
+def _compressor(encoding):
+    # 两种压缩对象都提供 compress(data) / flush()
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31：带 gzip 文件头
+
+
+def compress_stream(chunks, encoding='gzip'):
+    """把字节块边生成边压缩（每块喂给同一个压缩对象，内存不随导出量增长）"""
+    compressor = _compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def output_format(ndjson=False, gzip=False):
+    """返回 (Content-Type, 扩展名)；gzip=True 为下载 .gz 文件，传输压缩（Content-Encoding）不改变这两者"""
+    fmt = 'ndjson' if ndjson else 'json'
+    if gzip:
+        return 'application/gzip', f'{fmt}.gz'
+    return CONTENT_TYPES[fmt], fmt
+
+
+def encode_stream(batches, ndjson=False, compression=None):
+    """把记录块编码为输出格式的字节流；compression 为 None / 'gzip' / 'zstd'"""
+    stream = (ndjson_stream if ndjson else json_stream)(batches)
+    return compress_stream(stream, compression) if compression else stream
+
+
+def export_stream(exercises, ndjson=False, compression=None):
+    """exercises 为待导出题目的 QuerySet（排序无关，按 exercise_id 分块导出），返回字节流"""
+    return encode_stream(iter_batches(exercises), ndjson=ndjson, compression=compression)
+
+
+def set_download_headers(response, filename, ext, encoding=None):
+    """附件文件名 + 传输压缩；内容随 Accept-Encoding 变化，需带 Vary"""
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{ext}"'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+
+def streaming_response(exercises, filename, ndjson=False, gzip=False, encoding=None):
+    """
+    filename 不含扩展名。
+    ndjson=True 输出 .ndjson，gzip=True 输出压缩后的 .gz 文件；
+    encoding（'gzip' / 'zstd'）为传输压缩，客户端按 Content-Encoding 自动解压，下载 .gz 文件时忽略。
+    """
+    encoding = None if gzip else encoding
+    content_type, ext = output_format(ndjson=ndjson, gzip=gzip)
+    stream = export_stream(exercises, ndjson=ndjson, compression='gzip' if gzip else encoding)
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    set_download_headers(response, filename, ext, encoding)
+    return response
+
+
+def get_job_dir():
+    return getattr(settings, 'EXPORT_JOB_DIR', os.path.join('media', 'exports', 'jobs'))
+
+
+def get_job_mode():
+    return getattr(settings, 'EXPORT_JOB_MODE', 'celery')
+
+
+def get_stale_timeout():
+    return getattr(settings, 'EXPORT_JOB_STALE_TIMEOUT', 600)
+
+
+def _tmp_path(job_id):
+    # 按任务编号命名，任务中断后 fail_if_stale 能找到并删除
+    return os.path.join(get_job_dir(), f'.export-{job_id}.tmp')
+
+
+def create_job(category, user=None, ndjson=False, gzip=False):
+    """创建分类导出任务并提交后台执行"""
+    job = ExportJob.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        category=category, ndjson=ndjson, gzip=gzip,
+    )
+    submit_job(job.job_id)
+    return job
+
+
+def submit_job(job_id):
+    mode = get_job_mode()
+    if mode == 'eager':
+        run_job(job_id)
+    elif mode == 'celery':
+        from .tasks import export_exercises_by_category
+        transaction.on_commit(lambda: export_exercises_by_category.delay(job_id))
+    else:
+        transaction.on_commit(lambda: threading.Thread(target=_run_in_thread, args=(job_id,), daemon=True).start())
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def run_job(job_id):
+    """
+    执行导出任务；只处理 pending 状态的任务，重复投递时直接返回。
+    与 HTTP 导出同一套取数和编码，按块写入临时文件并更新 rows_written，成功后改名为正式文件。
+    """
+    now = timezone.now()
+    if not ExportJob.objects.filter(job_id=job_id, status='pending').update(status='running', started_at=now, updated_at=now):
+        return
+    job = ExportJob.objects.get(job_id=job_id)
+    if job.category_id is None:
+        _finish_job(job_id, 'failed', message="Category not found")
+        return
+
+    exercises = Exercise.objects.filter(category_id=job.category_id)
+    ExportJob.objects.filter(job_id=job_id).update(rows_total=exercises.count(), updated_at=timezone.now())
+    written = 0
+
+    def batches():
+        nonlocal written
+        for batch in iter_batches(exercises):
+            yield batch
+            # 走到这里时上一块已编码写入文件
+            written += len(batch)
+            ExportJob.objects.filter(job_id=job_id).update(rows_written=written, updated_at=timezone.now())
+
+    os.makedirs(get_job_dir(), exist_ok=True)
+    _, ext = output_format(ndjson=job.ndjson, gzip=job.gzip)
+    file_path = os.path.join(get_job_dir(), f'exercises_category_{job.category_id}_{job_id}.{ext}')
+    tmp_path = _tmp_path(job_id)
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in encode_stream(batches(), ndjson=job.ndjson, compression='gzip' if job.gzip else None):
+                f.write(chunk)
+        os.replace(tmp_path, file_path)
+    except Exception as e:
+        logger.exception(f"Export job {job_id} failed")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        _finish_job(job_id, 'failed', rows_written=written, message=f"Server error: {e}")
+        return
+
+    _finish_job(
+        job_id, 'succeeded', rows_written=written, file_path=file_path, file_size=os.path.getsize(file_path)
+    )
+    logger.info(f"Export job {job_id} finished: {written} exercises, {os.path.getsize(file_path)} bytes")
+
+
+def fail_if_stale(job):
+    """执行中的任务超过 EXPORT_JOB_STALE_TIMEOUT 秒没有进度时视为已中断，标记为失败并删除临时文件"""
+    if job.status != 'running' or job.updated_at > timezone.now() - timedelta(seconds=get_stale_timeout()):
+        return job
+    now = timezone.now()
+    if ExportJob.objects.filter(job_id=job.job_id, status='running', updated_at=job.updated_at).update(
+        status='failed', message="Job stopped making progress (worker restarted?)", finished_at=now, updated_at=now
+    ):
+        try:
+            os.remove(_tmp_path(job.job_id))
+        except OSError:
+            pass
+        logger.warning(f"Export job {job.job_id} marked failed: no progress since {job.updated_at}")
+    job.refresh_from_db()
+    return job
+
+
+def _finish_job(job_id, status, **fields):
+    now = timezone.now()
+    ExportJob.objects.filter(job_id=job_id).update(status=status, finished_at=now, updated_at=now, **fields)
@@ -0,0 +1,69 @@
+# core/fetch_plans.py
+"""
+Exercise 的取数方案（fetch plan）。
+列表、详情统一从这里取 select_related / prefetch_related / defer 组合，
+保证每批次的查询条数固定，不随页大小增长：
+  - list：外键一次 JOIN + questions 一次预取，共 2 条；
+  - detail：list + answers / analyses / images 预取，共 5 条。
+导出不实例化模型，按列取数，见 exporting.iter_batches。
+"""
+from django.db.models import Prefetch
+
+from .models import ExerciseAnalysis, ExerciseAnswer, ExerciseImage
+
+TAXONOMY = ('category', 'major', 'chapter', 'exam_group', 'source', 'exercise_type')
+
+# 多值关系的预取，固定排序，序列化结果稳定
+PREFETCHES = {
+    'questions': Prefetch('questions'),
+    'answers': Prefetch('answers', queryset=ExerciseAnswer.objects.defer('text1').order_by('answer_order', 'answer_id')),
+    'analyses': Prefetch('analyses', queryset=ExerciseAnalysis.objects.defer('text1').order_by('analysis_id')),
+    'images': Prefetch('exercise_images', queryset=ExerciseImage.objects.order_by('image_id')),
+}
+
+# 只在 select_related 时才需要延迟加载的备用大文本列
+DEFERRABLE = {'stem': 'stem__text1', 'answer': 'answer__text1', 'analysis': 'analysis__text1'}
+
+
+class FetchPlan:
+
+    def __init__(self, name, select=(), prefetch=()):
+        self.name = name
+        self.select = tuple(sorted(set(select)))
+        self.prefetch = tuple(dict.fromkeys(prefetch))
+
+    def apply(self, queryset):
+        defer = ['text1'] + [DEFERRABLE[relation] for relation in self.select if relation in DEFERRABLE]
+        return queryset.select_related(*self.select).prefetch_related(
+            *[PREFETCHES[name] for name in self.prefetch]
+        ).defer(*defer)
+
+    @property
+    def query_count(self):
+        """每批次的查询条数：主查询 1 条 + 每个预取 1 条"""
+        return 1 + len(self.prefetch)
+
+    def __repr__(self):
+        return f'FetchPlan({self.name!r}, select={self.select}, prefetch={self.prefetch})'
+
+
+PLANS = {
+    'list': FetchPlan(
+        'list',
+        select=TAXONOMY + ('stem', 'answer', 'analysis', 'exercise_from__exam'),
+        prefetch=('questions',),
+    ),
+    'detail': FetchPlan(
+        'detail',
+        select=TAXONOMY + ('stem', 'answer', 'analysis', 'exercise_from__exam'),
+        prefetch=('questions', 'answers', 'analyses', 'images'),
+    ),
+}
+
+
+def get_plan(name):
+    return PLANS[name]
+
+
+def apply(queryset, name):
+    return PLANS[name].apply(queryset)
@@ -0,0 +1,119 @@
+# core/fingerprints.py
+import hashlib
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Exercise, ExerciseAnswer, ExerciseAnswerFingerprint, Question
+
+REFRESH_BATCH_SIZE = 500
+EXAM_ATTRIBUTES = ('from_school', 'exam_time', 'exam_code', 'exam_full_name')
+
+
+def normalize(content):
+    """规范化文本内容：去掉首尾空白并把连续空白折叠为一个空格（用于题目内容哈希）"""
+    if content is None:
+        return None
+    return ' '.join(content.split())
+
+
+def fingerprint(content):
+    """答案指纹：原样内容的哈希，answer_comparison 与原来的逐字比较结果一致（空白不同即不相等）"""
+    if content is None:
+        return None
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def refresh_exercises(exercise_ids):
+    """重建指定题目的答案指纹；同一 answer_order 有多条答案时取最早的一条"""
+    exercise_ids = list(exercise_ids)
+    for start in range(0, len(exercise_ids), REFRESH_BATCH_SIZE):
+        batch_ids = exercise_ids[start:start + REFRESH_BATCH_SIZE]
+        answers = ExerciseAnswer.objects.filter(
+            exercise_id__in=batch_ids, answer_order__isnull=False
+        ).order_by('answer_id').values_list('exercise_id', 'answer_order', 'answer_content')
+
+        rows = {}
+        for exercise_id, answer_order, content in answers:
+            if (exercise_id, answer_order) not in rows:
+                rows[(exercise_id, answer_order)] = ExerciseAnswerFingerprint(
+                    exercise_id=exercise_id, answer_order=answer_order, content_hash=fingerprint(content)
+                )
+
+        with transaction.atomic():
+            ExerciseAnswerFingerprint.objects.filter(exercise_id__in=batch_ids).delete()
+            ExerciseAnswerFingerprint.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+def same_answer(index1, index2, pk_field='exercise_id'):
+    """第 index1 个答案与第 index2 个答案内容相同（两者都存在且非空）的 EXISTS 条件"""
+    second = ExerciseAnswerFingerprint.objects.filter(
+        exercise_id=OuterRef('exercise_id'), answer_order=index2, content_hash=OuterRef('content_hash')
+    )
+    first = ExerciseAnswerFingerprint.objects.filter(
+        exercise_id=OuterRef(pk_field), answer_order=index1, content_hash__isnull=False
+    ).filter(Exists(second))
+    return Exists(first)
+
+
+def exam_attributes(exam):
+    """试卷属性元组；exam 可以是 Exam、字段字典或 None"""
+    if exam is None:
+        return (None,) * len(EXAM_ATTRIBUTES)
+    if isinstance(exam, dict):
+        return tuple(exam.get(field) for field in EXAM_ATTRIBUTES)
+    return tuple(getattr(exam, field) for field in EXAM_ATTRIBUTES)
+
+
+def ordered_question_stems(questions):
+    """
+    questions: [(question_order, 题干)]，按导入/数据库中的先后顺序。
+    同一 question_order 只保留第一条（与导入时的去重一致），再按 question_order 排序（无序号的排在最后）。
+    """
+    seen = set()
+    kept = []
+    for position, (order, stem) in enumerate(questions):
+        if order is not None:
+            if order in seen:
+                continue
+            seen.add(order)
+        kept.append((order is None, order or 0, position, stem))
+    return [stem for *_, stem in sorted(kept)]
+
+
+def content_hash(stem, question_stems, exam):
+    """题目内容哈希：规范化后的题干、各小题题干、试卷属性；空值与空字符串视为相同"""
+    parts = [stem, *question_stems, *exam_attributes(exam)]
+    raw = '\x1f'.join(normalize(part) or '' for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def refresh_content_hashes(exercise_ids):
+    """按库中数据重算指定题目的内容哈希，只写回有变化的行"""
+    exercise_ids = list(exercise_ids)
+    for start in range(0, len(exercise_ids), REFRESH_BATCH_SIZE):
+        batch_ids = exercise_ids[start:start + REFRESH_BATCH_SIZE]
+        questions = {}
+        for exercise_id, order, stem in Question.objects.filter(exercise_id__in=batch_ids).order_by(
+            'question_id'
+        ).values_list('exercise_id', 'question_order', 'question_stem'):
+            questions.setdefault(exercise_id, []).append((order, stem))
+
+        changed = []
+        rows = Exercise.objects.filter(exercise_id__in=batch_ids).values_list(
+            'exercise_id', 'content_hash', 'stem__stem_content',
+            *(f'exercise_from__exam__{field}' for field in EXAM_ATTRIBUTES)
+        )
+        for exercise_id, current, stem, *exam in rows:
+            new = content_hash(stem, ordered_question_stems(questions.get(exercise_id, [])), dict(zip(EXAM_ATTRIBUTES, exam)))
+            if new != current:
+                changed.append(Exercise(exercise_id=exercise_id, content_hash=new))
+        Exercise.objects.bulk_update(changed, ['content_hash'], batch_size=1000)
+
+
+def refresh_exam_content_hashes(exam_id):
+    """试卷属性修改后，重算引用该试卷的题目的内容哈希"""
+    refresh_content_hashes(list(
+        Exercise.objects.filter(exercise_from__exam_id=exam_id).values_list('exercise_id', flat=True)
+    ))
+
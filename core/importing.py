@@ -0,0 +1,540 @@
+# core/importing.py
+"""
+题目导入引擎：读取（iter_items）→ 规范化（normalize）→ 分块校验与批量写入（Ingestion）。
+API、后台任务和 import_exercises / load_exercises 命令都经由 Ingestion 写入，
+共用整批维度解析（DimensionResolver）、批量插入（BulkExerciseSerializer）和吞吐统计。
+
+上传文件不再整体 read() + json.loads：按块读取字节、增量解码，逐个解析顶层数组元素，
+每凑满 IMPORT_CHUNK_SIZE 条就校验并写入一次，内存占用只与块大小有关，与文件大小无关。
+
+后台导入（ImportJob）：上传内容先落盘，再按 IMPORT_JOB_MODE 执行：
+  - celery（默认）：提交到 Celery worker（core.tasks.run_import_job）；
+  - thread：在当前进程的后台线程中执行，只适合单进程部署，worker 被回收时任务随之中断；
+  - eager：在请求内同步执行（测试/调试）。
+后台任务逐块提交：校验失败的行跳过并记入错误报告，其余行照常写入。
+每块提交时刷新 updated_at，执行中的任务超过 IMPORT_JOB_STALE_TIMEOUT 秒没有进度（进程被回收、worker 崩溃），
+查询时标记为失败（fail_if_stale）。上传的文件在任务结束（无论成败）后删除。
+
+NDJSON（每行一个 JSON 对象，.ndjson / .jsonl）逐行解析，可直接切分、追加；
+两种格式都可以 gzip 压缩，按文件头自动识别（iter_items）。
+旧导出格式的 camelCase 键（exerciseFrom、questionOrder 等）在写入前统一转为 snake_case。
+
+可续传导入（import_checkpointed）：每块单独提交，同一事务内把检查点（文件哈希 + 已提交行数）前移；
+失败或进程中断后用同一文件重新导入，会从检查点之后继续，已提交的块不会重复写入。
+"""
+import codecs
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import ImportCheckpoint, ImportJob
+from .serializers import BulkExerciseSerializer
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 64 * 1024
+# 单个元素的字符数上限，防止格式错误（如缺少右括号）时把剩余文件全部读进内存
+MAX_ELEMENT_CHARS = 16 * 1024 * 1024
+WHITESPACE = ' \t\n\r'
+GZIP_MAGIC = b'\x1f\x8b'
+NDJSON_SUFFIXES = ('.ndjson', '.jsonl')
+# 压缩文件损坏或被截断时抛出的异常
+COMPRESSION_ERRORS = (gzip.BadGzipFile, EOFError, zlib.error)
+CAMEL_CASE = re.compile(r'(?<=[a-z0-9])([A-Z])')
+
+
+def get_chunk_size():
+    return getattr(settings, 'IMPORT_CHUNK_SIZE', 200)
+
+
+class ChunkValidationError(Exception):
+    """某一块校验失败；errors 为 [{"index": 在文件中的序号, "errors": {...}}]"""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid exercises")
+        self.errors = errors
+
+
+def iter_json_array(fileobj, read_size=READ_SIZE):
+    """
+    逐个产出顶层 JSON 数组的元素；顶层是单个对象时只产出该对象（与原 ImportExercisesView 行为一致）。
+    输入为二进制文件对象（UTF-8，可带 BOM），格式错误时抛 json.JSONDecodeError，编码错误抛 UnicodeDecodeError。
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = ''
+    pos = 0
+    consumed = 0  # 已丢弃的字符数，用于报错时给出文件内的绝对位置
+    eof = False
+
+    def fill(min_chars=0):
+        """至少读入一块，直到未解析部分（buffer[pos:]）不少于 min_chars 个字符或读到文件尾"""
+        nonlocal buffer, pos, consumed, eof
+        parts = [buffer[pos:]]
+        pending = len(parts[0])
+        while True:
+            data = fileobj.read(read_size)
+            if not data:
+                eof = True
+                parts.append(text_decoder.decode(b'', final=True))
+                break
+            text = text_decoder.decode(data)
+            parts.append(text)
+            pending += len(text)
+            if pending >= min_chars:
+                break
+        buffer = ''.join(parts)
+        consumed += pos
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    def decode_value():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                pending = len(buffer) - pos
+                if eof or pending > MAX_ELEMENT_CHARS:
+                    raise json.JSONDecodeError(f"{e.msg} (char {consumed + e.pos} of file)", buffer, e.pos)
+                # 元素不完整：每次至少把未解析部分读到两倍再重试，大元素的重复解析总量与元素大小成线性
+                fill(min(2 * pending, MAX_ELEMENT_CHARS + 1))
+                continue
+            # 数字等值可能被块边界截断，读到下一个字符再确认
+            if end == len(buffer) and not eof:
+                fill()
+                continue
+            pos = end
+            return value
+
+    def error(msg):
+        return json.JSONDecodeError(f"{msg} (char {consumed + pos} of file)", buffer, pos)
+
+    skip_whitespace()
+    if pos >= len(buffer):
+        raise error("Expecting value")
+
+    if buffer[pos] != '[':
+        value = decode_value()
+        skip_whitespace()
+        if pos < len(buffer):
+            raise error("Extra data")
+        yield value
+        return
+
+    pos += 1
+    skip_whitespace()
+    if pos < len(buffer) and buffer[pos] == ']':
+        pos += 1
+    else:
+        while True:
+            yield decode_value()
+            skip_whitespace()
+            if pos >= len(buffer):
+                raise error("Expecting ',' delimiter")
+            if buffer[pos] == ']':
+                pos += 1
+                break
+            if buffer[pos] != ',':
+                raise error("Expecting ',' delimiter")
+            pos += 1
+            skip_whitespace()
+
+    skip_whitespace()
+    if pos < len(buffer):
+        raise error("Extra data")
+
+
+def iter_ndjson(fileobj):
+    """
+    逐行产出 NDJSON 的对象，空行跳过；输入为二进制文件对象（UTF-8，首行可带 BOM）。
+    某行格式错误时抛 json.JSONDecodeError（消息中带行号），编码错误抛 UnicodeDecodeError。
+    """
+    for number, line in enumerate(fileobj, 1):
+        text = line.decode('utf-8-sig' if number == 1 else 'utf-8').strip()
+        if not text:
+            continue
+        try:
+            yield json.loads(text)
+        except json.JSONDecodeError as e:
+            raise json.JSONDecodeError(f"{e.msg} (line {number} of file)", e.doc, e.pos)
+
+
+def is_ndjson(filename):
+    """按扩展名判断是否为 NDJSON（可带 .gz 后缀）"""
+    name = (filename or '').lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return name.endswith(NDJSON_SUFFIXES)
+
+
+def decompressed(fileobj):
+    """gzip 压缩的文件返回解压后的文件对象，否则原样返回；fileobj 需可 seek"""
+    magic = fileobj.read(len(GZIP_MAGIC))
+    fileobj.seek(0)
+    if magic == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    return fileobj
+
+
+def iter_items(fileobj, ndjson=None):
+    """
+    按格式逐条产出上传/本地文件中的题目：ndjson 为 None 时按文件名判断，
+    JSON 数组与 NDJSON 均可 gzip 压缩。
+    """
+    if ndjson is None:
+        ndjson = is_ndjson(getattr(fileobj, 'name', None))
+    stream = decompressed(fileobj)
+    return iter_ndjson(stream) if ndjson else iter_json_array(stream)
+
+
+def iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def snake_case(key):
+    return CAMEL_CASE.sub(r'_\1', key).lower()
+
+
+def normalize(item):
+    """把键统一为导入格式的 snake_case（exerciseFrom -> exercise_from），值原样保留"""
+    if isinstance(item, dict):
+        return {snake_case(key) if isinstance(key, str) else key: normalize(value) for key, value in item.items()}
+    if isinstance(item, list):
+        return [normalize(value) for value in item]
+    return item
+
+
+class Ingestion:
+    """
+    ingestion = Ingestion(on_duplicate='skip', keep_ids=True, skip_invalid=True)
+    ingestion.run(items)               # 或逐块 ingestion.write(chunk, offset)
+    ingestion.stats                    # {'rows', 'written', 'skipped', 'updated', 'failed'}
+    ingestion.errors                   # [{"index", "errors"}]，最多 IMPORT_JOB_MAX_ERRORS 条
+    ingestion.summary()                # "N exercises in 1.2s: 800 exercises/s"
+
+    skip_invalid=False 时某块有不合法的行即抛 ChunkValidationError（由调用方的事务决定是否回滚已写入的块）；
+    为 True 时跳过不合法的行并记入 errors，其余行照常写入。
+    keep_ids=True 时新建的题目沿用数据中的 exercise_id（命令行导入），否则由数据库分配（API）。
+    on_duplicate 见 ExerciseWriteSerializer.resolve_duplicates。
+    """
+
+    def __init__(self, chunk_size=None, on_duplicate='create', keep_ids=False, skip_invalid=False):
+        self.chunk_size = chunk_size or get_chunk_size()
+        self.context = {'on_duplicate': on_duplicate, 'keep_ids': keep_ids}
+        self.skip_invalid = skip_invalid
+        self.max_errors = getattr(settings, 'IMPORT_JOB_MAX_ERRORS', 1000)
+        self.stats = {'rows': 0, 'written': 0, 'skipped': 0, 'updated': 0, 'failed': 0}
+        self.errors = []
+        self.started = time.monotonic()
+
+    def validate(self, chunk, offset=0):
+        """规范化并校验一块，返回 (合法行的序列化器, 合法的行, 错误列表)；序列化器已 is_valid()"""
+        rows = [normalize(item) for item in chunk]
+        serializer = BulkExerciseSerializer(data=rows, context=self.context)
+        if serializer.is_valid():
+            return serializer, rows, []
+        invalid = _item_errors(serializer)
+        errors = [_error(offset + i, rows[i], item_errors) for i, item_errors in sorted(invalid.items())]
+        rows = [item for i, item in enumerate(rows) if i not in invalid]
+        serializer = BulkExerciseSerializer(data=rows, context=self.context)
+        if rows and not serializer.is_valid():
+            # 剩余行单独校验仍失败（如块内互相依赖），整块记为失败
+            errors.append({"index": offset, "errors": serializer.errors})
+            rows = []
+        return serializer, rows, errors
+
+    def write(self, chunk, offset=0):
+        """校验并写入一块（单独的事务/保存点），返回块内行数；offset 为块首行在输入中的序号"""
+        serializer, rows, errors = self.validate(chunk, offset)
+        if errors:
+            if not self.skip_invalid:
+                raise ChunkValidationError(errors)
+            self.add_errors(errors, len(chunk) - len(rows))
+        if rows:
+            with transaction.atomic():
+                serializer.save()
+            duplicates = serializer.duplicate_stats
+            self.stats['skipped'] += duplicates['skipped']
+            self.stats['updated'] += duplicates['updated']
+            self.stats['written'] += len(rows) - duplicates['skipped']
+        self.stats['rows'] += len(chunk)
+        return len(chunk)
+
+    def run(self, items):
+        """分块写入全部数据，返回 stats"""
+        for chunk in iter_chunks(items, self.chunk_size):
+            self.write(chunk, self.stats['rows'])
+            logger.info(f"Imported chunk of {len(chunk)} exercises ({self.stats['rows']} total)")
+        logger.info(f"Ingestion finished: {self.summary()} {self.stats}")
+        return self.stats
+
+    def add_errors(self, errors, failed):
+        self.stats['failed'] += failed
+        self.errors.extend(errors[:max(self.max_errors - len(self.errors), 0)])
+
+    def merge(self, stats, errors):
+        """合并子进程的写入统计（并行导入；rows 已在主进程校验时计入）"""
+        for key in ('written', 'skipped', 'updated'):
+            self.stats[key] += stats[key]
+        self.add_errors(errors, stats['failed'])
+
+    @property
+    def elapsed(self):
+        return max(time.monotonic() - self.started, 1e-6)
+
+    def summary(self):
+        written = self.stats['written']
+        return f"{written} exercises in {self.elapsed:.1f}s: {written / self.elapsed:.0f} exercises/s"
+
+
+def _error(index, item, errors):
+    error = {"index": index, "errors": errors}
+    if isinstance(item, dict) and item.get('exercise_id') is not None:
+        error["exercise_id"] = item['exercise_id']
+    return error
+
+
+class CheckpointConflict(Exception):
+    """检查点已被另一个导入进程前移（同一文件同时导入）"""
+
+
+def file_sha256(fileobj, read_size=READ_SIZE):
+    """按块计算文件内容的 SHA-256，完成后回到文件开头"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(read_size), b''):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def get_checkpoint(file_hash, filename=None, restart=False):
+    """取得（或新建）文件对应的检查点；restart 时从头导入"""
+    checkpoint, created = ImportCheckpoint.objects.get_or_create(
+        file_hash=file_hash, defaults={'filename': filename}
+    )
+    if restart and not created:
+        checkpoint.rows_committed = 0
+        checkpoint.status = 'running'
+        checkpoint.message = None
+        checkpoint.save(update_fields=['rows_committed', 'status', 'message', 'updated_at'])
+    return checkpoint
+
+
+def import_checkpointed(items, checkpoint, chunk_size=None, write_chunk=None):
+    """
+    逐块提交并前移检查点，返回本次写入条数；不能在外层事务中调用，否则分块提交不生效。
+    跳过 checkpoint.rows_committed 之前的行（仍需解析，但不写库）；已完成的检查点直接返回 0。
+    write_chunk(chunk, offset) 负责写入一块（默认 Ingestion().write），抛出的异常会回滚该块并把检查点标记为失败。
+    """
+    if checkpoint.status == 'completed':
+        return 0
+    chunk_size = chunk_size or get_chunk_size()
+    write_chunk = write_chunk or Ingestion(chunk_size).write
+    start = checkpoint.rows_committed
+    written = 0
+    try:
+        for chunk in iter_chunks(itertools.islice(items, start, None), chunk_size):
+            offset = start + written
+            with transaction.atomic():
+                # 先前移检查点（同时锁住该行），条件更新失败说明有别的进程在导入同一文件
+                if not ImportCheckpoint.objects.filter(pk=checkpoint.pk, rows_committed=offset).update(
+                    rows_committed=offset + len(chunk), status='running', updated_at=timezone.now()
+                ):
+                    raise CheckpointConflict(f"Checkpoint {checkpoint.pk} moved past row {offset}")
+                write_chunk(chunk, offset)
+            written += len(chunk)
+            checkpoint.rows_committed = offset + len(chunk)
+            logger.info(f"Committed rows {offset}-{checkpoint.rows_committed - 1} of {checkpoint.filename}")
+    except CheckpointConflict:
+        raise
+    except Exception as e:
+        checkpoint.status = 'failed'
+        checkpoint.message = str(e)
+        ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(status='failed', message=str(e), updated_at=timezone.now())
+        raise
+
+    checkpoint.status = 'completed'
+    checkpoint.message = None
+    ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(status='completed', message=None, updated_at=timezone.now())
+    return written
+
+
+def validate_items(items, chunk_size=None):
+    """只校验不写库（dry_run），返回 {"count", "valid", "invalid", "details": [{"index", "errors"}]}"""
+    chunk_size = chunk_size or get_chunk_size()
+    max_errors = getattr(settings, 'IMPORT_JOB_MAX_ERRORS', 1000)
+    report = {"count": 0, "valid": 0, "invalid": 0, "details": []}
+    for chunk in iter_chunks(items, chunk_size):
+        serializer = BulkExerciseSerializer(data=[normalize(item) for item in chunk])
+        invalid = {} if serializer.is_valid() else _item_errors(serializer)
+        remaining = max_errors - len(report["details"])
+        report["details"].extend(
+            {"index": report["count"] + i, "errors": item_errors} for i, item_errors in sorted(invalid.items())[:remaining]
+        )
+        report["count"] += len(chunk)
+        report["invalid"] += len(invalid)
+    report["valid"] = report["count"] - report["invalid"]
+    return report
+
+
+def _item_errors(serializer):
+    errors = serializer.errors
+    # ListSerializer 的错误可能是按位置的列表，也可能是 {位置: 错误} 字典
+    items = errors.items() if isinstance(errors, dict) else enumerate(errors)
+    return {i: item_errors for i, item_errors in items if item_errors}
+
+
+def get_job_dir():
+    return getattr(settings, 'IMPORT_JOB_DIR', os.path.join('media', 'imports'))
+
+
+def get_job_mode():
+    return getattr(settings, 'IMPORT_JOB_MODE', 'celery')
+
+
+def get_stale_timeout():
+    return getattr(settings, 'IMPORT_JOB_STALE_TIMEOUT', 600)
+
+
+def create_job(fileobj=None, data=None, user=None, filename=None, on_duplicate='create', ndjson=False):
+    """
+    把上传文件（或已解析的 JSON 数据）落盘并创建任务，提交后台执行。
+    上传文件原样保存（可为 gzip），NDJSON 以 .ndjson 扩展名落盘，执行时据此选择解析方式。
+    """
+    os.makedirs(get_job_dir(), exist_ok=True)
+    suffix = '.ndjson' if ndjson and data is None else '.json'
+    file_path = os.path.join(get_job_dir(), f'{uuid.uuid4().hex}{suffix}')
+    with open(file_path, 'wb') as f:
+        if hasattr(fileobj, 'chunks'):
+            for block in fileobj.chunks():
+                f.write(block)
+        elif fileobj is not None:
+            shutil.copyfileobj(fileobj, f)
+        else:
+            f.write(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    job = ImportJob.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        filename=filename or getattr(fileobj, 'name', None),
+        file_path=file_path,
+        on_duplicate=on_duplicate,
+    )
+    submit_job(job.job_id)
+    return job
+
+
+def submit_job(job_id):
+    mode = get_job_mode()
+    if mode == 'eager':
+        run_job(job_id)
+    elif mode == 'celery':
+        from .tasks import run_import_job
+        transaction.on_commit(lambda: run_import_job.delay(job_id))
+    else:
+        transaction.on_commit(lambda: threading.Thread(target=_run_in_thread, args=(job_id,), daemon=True).start())
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def run_job(job_id):
+    """执行导入任务；只处理 pending 状态的任务，重复投递时直接返回"""
+    now = timezone.now()
+    if not ImportJob.objects.filter(job_id=job_id, status='pending').update(status='running', started_at=now, updated_at=now):
+        return
+    job = ImportJob.objects.get(job_id=job_id)
+    ingestion = Ingestion(on_duplicate=job.on_duplicate, skip_invalid=True)
+
+    try:
+        with open(job.file_path, 'rb') as f:
+            for chunk in iter_chunks(iter_items(f, is_ndjson(job.file_path)), ingestion.chunk_size):
+                ingestion.write(chunk, ingestion.stats['rows'])
+                ImportJob.objects.filter(job_id=job_id).update(
+                    errors=ingestion.errors, updated_at=timezone.now(), **_progress(ingestion)
+                )
+        status, message = 'succeeded', None
+    except (json.JSONDecodeError, UnicodeDecodeError, *COMPRESSION_ERRORS) as e:
+        status, message = 'failed', f"Invalid file: {e}"
+    except Exception as e:
+        logger.exception(f"Import job {job_id} failed")
+        status, message = 'failed', f"Server error: {e}"
+    finally:
+        # 失败的任务不会重试，上传文件留着只会占用磁盘
+        _remove(job.file_path)
+
+    _finish(job_id, status, ingestion, message)
+    logger.info(f"Import job {job_id} {status}: {ingestion.summary()} {ingestion.stats}")
+
+
+def fail_if_stale(job):
+    """执行中的任务超过 IMPORT_JOB_STALE_TIMEOUT 秒没有进度时视为已中断，标记为失败并删除上传文件"""
+    if job.status != 'running' or job.updated_at > timezone.now() - timedelta(seconds=get_stale_timeout()):
+        return job
+    now = timezone.now()
+    if ImportJob.objects.filter(job_id=job.job_id, status='running', updated_at=job.updated_at).update(
+        status='failed', message="Job stopped making progress (worker restarted?)", finished_at=now, updated_at=now
+    ):
+        _remove(job.file_path)
+        logger.warning(f"Import job {job.job_id} marked failed: no progress since {job.updated_at}")
+    job.refresh_from_db()
+    return job
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _progress(ingestion):
+    stats = ingestion.stats
+    return {
+        'rows_parsed': stats['rows'],
+        'rows_validated': stats['rows'] - stats['failed'],
+        'rows_written': stats['written'],
+        'rows_failed': stats['failed'],
+        'rows_skipped': stats['skipped'],
+    }
+
+
+def _finish(job_id, status, ingestion, message):
+    now = timezone.now()
+    ImportJob.objects.filter(job_id=job_id).update(
+        status=status, errors=ingestion.errors, message=message, finished_at=now, updated_at=now, **_progress(ingestion)
+    )
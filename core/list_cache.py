@@ -0,0 +1,162 @@
+# core/list_cache.py
+"""
+ExerciseList 响应缓存。
+缓存键 = 规范化查询参数 + 代数（generation）计数器：
+  - epoch：层级改名/试卷修改等可能影响任意分类的变更时递增，所有键都包含它；
+  - 分类代数：带 category_id 的查询只依赖该分类的代数；
+  - all 代数：不带 category_id 的查询依赖它，任何题目写入都会递增。
+写入时只递增计数器，旧键自然失效并由 TTL 回收。
+计数器必须放在所有进程共享的缓存（Redis 等）里：进程内缓存（LocMemCache）中的递增其他 worker 看不到，
+它们会一直用旧代数命中旧结果，所以这种后端上缓存自动关闭，除非声明只有单进程（CACHE_SINGLE_PROCESS）。
+缓存后端不可用（Redis 宕机等）时读取失败不影响请求：get_generation 返回 None，调用方跳过缓存直接查库。
+"""
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'exercise_list'
+STATS_KEYS = ('hits', 'misses')
+
+
+def get_cache():
+    return caches[getattr(settings, 'EXERCISE_LIST_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'EXERCISE_LIST_CACHE_TIMEOUT', 300)
+
+
+def is_shared():
+    """代数计数器是否对所有进程可见"""
+    if isinstance(get_cache(), (LocMemCache, DummyCache)):
+        return getattr(settings, 'CACHE_SINGLE_PROCESS', False)
+    return True
+
+
+def is_enabled():
+    return getattr(settings, 'EXERCISE_LIST_CACHE_ENABLED', True) and is_shared()
+
+
+def _generation_key(scope):
+    return f'{KEY_PREFIX}:gen:{scope}'
+
+
+def _initial_generation():
+    # 计数器被淘汰后以当前毫秒时间戳重新开始，保证不会回到旧值而命中旧键
+    return int(time.time() * 1000)
+
+
+def get_generation(scope):
+    """当前代数；缓存后端不可用时返回 None"""
+    cache = get_cache()
+    key = _generation_key(scope)
+    try:
+        generation = cache.get(key)
+        if generation is None:
+            cache.add(key, _initial_generation(), None)
+            generation = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Cache unavailable, skipping generation {scope}: {e}")
+        return None
+    return generation
+
+
+def get_value(key):
+    """读缓存；后端不可用时按未命中处理"""
+    try:
+        return get_cache().get(key)
+    except Exception as e:
+        logger.warning(f"Cache unavailable, skipping read of {key}: {e}")
+        return None
+
+
+def set_value(key, value, timeout):
+    try:
+        get_cache().set(key, value, timeout)
+    except Exception as e:
+        logger.warning(f"Cache unavailable, skipping write of {key}: {e}")
+
+
+def bump_generation(scope):
+    cache = get_cache()
+    key = _generation_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, _initial_generation(), None):
+            cache.incr(key)
+
+
+def incr_counter(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def bump(category_ids):
+    """题目写入：递增涉及分类的代数和 all 代数"""
+    for category_id in set(category_ids):
+        if category_id is not None:
+            bump_generation(f'category:{category_id}')
+    bump_generation('all')
+
+
+def bump_epoch():
+    """可能影响任意分类的变更（层级改名、试卷修改等）"""
+    bump_generation('epoch')
+
+
+def make_key(request):
+    """缓存键；取不到代数（缓存后端不可用）时返回 None，不使用缓存"""
+    params = request.query_params
+    canonical = sorted(
+        (name, sorted(v for v in params.getlist(name) if v != ''))
+        for name in params
+    )
+    canonical = [(name, values) for name, values in canonical if values]
+    category_id = params.get('category_id')
+    scope = f'category:{category_id}' if category_id else 'all'
+    generation = (get_generation('epoch'), get_generation(scope))
+    if None in generation:
+        return None
+    digest = hashlib.sha1(
+        json.dumps([request.get_host(), canonical], ensure_ascii=False).encode('utf-8')
+    ).hexdigest()
+    return f'{KEY_PREFIX}:{scope}:{generation[0]}.{generation[1]}:{digest}'
+
+
+def get_response(key):
+    data = get_value(key)
+    try:
+        incr_counter(f"{KEY_PREFIX}:stats:{'hits' if data is not None else 'misses'}")
+    except Exception as e:
+        logger.warning(f"Cache unavailable, skipping list cache stats: {e}")
+    return data
+
+
+def set_response(key, data):
+    set_value(key, data, get_timeout())
+
+
+def stats():
+    cache = get_cache()
+    values = cache.get_many([f'{KEY_PREFIX}:stats:{name}' for name in STATS_KEYS])
+    hits = values.get(f'{KEY_PREFIX}:stats:hits', 0)
+    misses = values.get(f'{KEY_PREFIX}:stats:misses', 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Exercise
+from core import fingerprints
+
+
+class Command(BaseCommand):
+    help = 'Backfill exercise content hashes used by imports with on_duplicate=skip|update'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category-id', type=int, help='Only backfill exercises in this category')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Exercises per batch')
+
+    def handle(self, *args, **options):
+        exercises = Exercise.objects.order_by('exercise_id')
+        if options['category_id']:
+            exercises = exercises.filter(category_id=options['category_id'])
+
+        batch_size = options['batch_size']
+        total = 0
+        last_id = 0
+        # 按主键分段，避免一次性加载全部 id
+        while True:
+            batch_ids = list(exercises.filter(exercise_id__gt=last_id).values_list('exercise_id', flat=True)[:batch_size])
+            if not batch_ids:
+                break
+            fingerprints.refresh_content_hashes(batch_ids)
+            total += len(batch_ids)
+            last_id = batch_ids[-1]
+            self.stdout.write(f"Hashed {total} exercises")
+
+        self.stdout.write(self.style.SUCCESS(f'Content hashes backfilled for {total} exercises'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core import importing
+from core.testing import sample_exercises
+
+
+class Command(BaseCommand):
+    help = 'Import synthetic exercises inside a rolled-back transaction and report queries per row'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10, 100, 1000], help='Batch sizes to measure')
+        parser.add_argument('--keep', action='store_true', help='Commit the imported rows instead of rolling back')
+
+    def handle(self, *args, **options):
+        # 每行查询数与后端有关：不回填自增主键的后端（MySQL）批量插入后要多查一次主键
+        self.stdout.write(
+            f"Backend: {connection.vendor} "
+            f"(bulk insert returns pks: {connection.features.can_return_rows_from_bulk_insert})"
+        )
+        for rows in options['rows']:
+            data = sample_exercises(rows)
+            with transaction.atomic():
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as context:
+                    importing.Ingestion(rows).write(data)
+                elapsed = time.perf_counter() - start
+                if not options['keep']:
+                    transaction.set_rollback(True)
+            queries = len(context.captured_queries)
+            self.stdout.write(
+                f"{rows} rows: {queries} queries ({queries / rows:.2f}/row), "
+                f"{elapsed:.2f}s ({rows / elapsed:.0f} rows/s)"
+            )
@@ -1,179 +1,217 @@
 import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from core.models import (
-    Exercise, ExerciseStem, Question, ExerciseAnswer, ExerciseAnalysis,
-    ExerciseFrom, ExerciseImage, Category, Major, Chapter, ExamGroup,
-    Source, ExerciseType, School, Exam
-)
+from django.db import connections, transaction
+
+from core import importing
+from core.dimensions import DimensionResolver
+from core.models import Exercise
+from core.serializers import ExerciseWriteSerializer
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+def _init_worker():
+    # spawn/forkserver 启动的子进程需要重新初始化 Django；fork 时已初始化，这里只是空操作
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def partition(rows, workers):
+    """
+    把行分到 workers 个分区：带 exercise_id 的行按 id 取模（同一 id 总在同一分区，文件内重复的 id 以最后一条为准），
+    没有 id 的行（新内容的常见情况，keep_ids=False 时全部如此）轮流分配，保证各分区行数均衡。
+    """
+    partitions = [[] for _ in range(workers)]
+    next_partition = 0
+    for data in rows:
+        exercise_id = data.get('exercise_id')
+        if exercise_id is None:
+            partitions[next_partition].append(data)
+            next_partition = (next_partition + 1) % workers
+        else:
+            partitions[hash(str(exercise_id)) % workers].append(data)
+    return partitions
+
+
+def drop_file_duplicates(rows, validated, dimensions, on_duplicate):
+    """
+    去掉文件内内容重复的行（skip 保留第一条，update 保留最后一条，与单进程导入的批内规则一致），返回 (剩余行, 去掉的行数)。
+    重复的行可能被分到不同分区，各分区只在自己的行里查重，彼此看不到，所以要在拆分前由主进程完成；
+    与库中已有题目的查重仍由各分区写入时进行。按 id 更新库中已有题目的行不参与查重。
+    """
+    if on_duplicate == 'create':
+        return rows, 0
+    ids = [data['exercise_id'] for data in validated if data.get('exercise_id') is not None]
+    existing = set()
+    for start in range(0, len(ids), 1000):
+        existing.update(
+            Exercise.objects.filter(exercise_id__in=ids[start:start + 1000]).values_list('exercise_id', flat=True)
+        )
+    groups = {}
+    for i, data in enumerate(validated):
+        if data.get('exercise_id') not in existing:
+            groups.setdefault(ExerciseWriteSerializer.content_hash(data, dimensions), []).append(i)
+    dropped = set()
+    for indexes in groups.values():
+        dropped.update(indexes[1:] if on_duplicate == 'skip' else indexes[:-1])
+    return [data for i, data in enumerate(rows) if i not in dropped], len(dropped)
+
+
+def ingest_partition(rows, batch_size, on_duplicate, keep_ids):
+    """导入一个分区（子进程入口，使用子进程自己的数据库连接），返回 (stats, errors)"""
+    ingestion = importing.Ingestion(batch_size, on_duplicate=on_duplicate, keep_ids=keep_ids, skip_invalid=True)
+    ingestion.run(rows)
+    return ingestion.stats, ingestion.errors
 
 
 class Command(BaseCommand):
-    help = 'Import exercise data from a JSON file into the database'
+    help = 'Import exercise data from a JSON or NDJSON file (optionally gzip-compressed) into the database'
+    keep_ids = True  # 沿用文件中的 exercise_id；为 False 时忽略，全部作为新题目由数据库分配 id
 
     def add_arguments(self, parser):
-        parser.add_argument('json_file', type=str, help='Path to the JSON file containing exercise data')
+        parser.add_argument('json_file', type=str, help='Path to the JSON or NDJSON file containing exercise data')
+        parser.add_argument(
+            '--ndjson', action='store_true', help='Parse the file as NDJSON (implied by a .ndjson / .jsonl extension)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Commit every N exercises and record a checkpoint; rerunning the same file resumes after it'
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and import from the start')
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Write in N worker processes after resolving shared dimensions once'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Exercises per batch insert')
+        parser.add_argument(
+            '--on-duplicate', choices=ExerciseWriteSerializer.ON_DUPLICATE_CHOICES, default='create',
+            help='What to do with exercises whose content already exists'
+        )
+
+    def ingestion(self, options, chunk_size=None):
+        return importing.Ingestion(
+            chunk_size or options['batch_size'], on_duplicate=options['on_duplicate'],
+            keep_ids=self.keep_ids, skip_invalid=True,
+        )
+
+    def items(self, f, ndjson):
+        items = importing.iter_items(f, ndjson)
+        if self.keep_ids:
+            return items
+        return ({**item, 'exercise_id': None} if isinstance(item, dict) else item for item in items)
 
     def handle(self, *args, **options):
         json_file = options['json_file']
 
-        # 读取 JSON 文件
+        if options['workers'] and options['chunk_size']:
+            self.stdout.write(self.style.ERROR("--workers cannot be combined with --chunk-size"))
+            return
+        ndjson = options['ndjson'] or importing.is_ndjson(json_file)
+
+        # 流式读取 JSON 数组 / NDJSON（可 gzip 压缩），单个对象视为一条
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                exercises_data = json.load(f)
+            with open(json_file, 'rb') as f:
+                if options['chunk_size']:
+                    ingestion = self.handle_chunked(f, json_file, options, ndjson)
+                elif options['workers']:
+                    ingestion = self.handle_parallel(self.items(f, ndjson), options)
+                else:
+                    # 整个文件一个事务：不合法的行跳过，文件格式错误时整体回滚
+                    ingestion = self.ingestion(options)
+                    with transaction.atomic():
+                        ingestion.run(self.items(f, ndjson))
         except FileNotFoundError:
             self.stdout.write(self.style.ERROR(f"File {json_file} not found"))
             return
-        except json.JSONDecodeError:
-            self.stdout.write(self.style.ERROR(f"Invalid JSON format in {json_file}"))
+        except (json.JSONDecodeError, UnicodeDecodeError, *importing.COMPRESSION_ERRORS) as e:
+            self.stdout.write(self.style.ERROR(f"Invalid JSON format in {json_file}: {e}"))
             return
 
-        # 如果数据是单个对象，转换为列表
-        if not isinstance(exercises_data, list):
-            exercises_data = [exercises_data]
-
-        # 使用事务确保数据一致性
+        if ingestion is not None:
+            self.report(ingestion, options['workers'] or 1)
+
+    def handle_parallel(self, items, options):
+        """
+        主进程先整批校验、一次性解析全部维度（避免多个进程并发创建同名维度）并去掉文件内内容重复的行，
+        再把题目分到 workers 个分区（见 partition），每个进程用自己的连接分块写入。
+        """
+        workers = options['workers']
+        ingestion = self.ingestion(options)
+        rows, validated = [], []
+        for chunk in importing.iter_chunks(items, ingestion.chunk_size):
+            serializer, valid, errors = ingestion.validate(chunk, ingestion.stats['rows'])
+            ingestion.add_errors(errors, len(chunk) - len(valid))
+            ingestion.stats['rows'] += len(chunk)
+            if valid:
+                rows.extend(valid)
+                validated.extend(serializer.validated_data)
         with transaction.atomic():
-            for data in exercises_data:
-                try:
-                    self.import_exercise(data)
-                    self.stdout.write(self.style.SUCCESS(f"Successfully imported exercise {data['exercise_id']}"))
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"Error importing exercise {data['exercise_id']}: {str(e)}"))
-                    continue
-
-        self.stdout.write(self.style.SUCCESS('All exercises imported successfully'))
-
-    def import_exercise(self, data):
-        # 1. 创建或获取外键依赖的实例
-        category, _ = Category.objects.get_or_create(category_name=data['category'])
-        major, _ = Major.objects.get_or_create(major_name=data['major'], category=category)
-        chapter, _ = Chapter.objects.get_or_create(chapter_name=data['chapter'], major=major)
-        source, _ = Source.objects.get_or_create(source_name=data['source'])
-        exercise_type, _ = ExerciseType.objects.get_or_create(type_name=data['type'])
-
-        # 处理 ExamGroup（允许为空）
-        exam_group = None
-        if data.get('examgroup'):
-            exam_group, _ = ExamGroup.objects.get_or_create(
-                examgroup_name=data['examgroup'],
-                chapter=chapter
-            )
-
-        # 处理 School 和 Exam
-        exercise_from_data = data['exerciseFrom']
-        school = None
-        if exercise_from_data.get('fromSchool'):
-            school, _ = School.objects.get_or_create(name=exercise_from_data['fromSchool'])
-
-        exam, _ = Exam.objects.get_or_create(
-            category=category,
-            school=school,
-            from_school=exercise_from_data.get('fromSchool', ''),
-            exam_time=exercise_from_data.get('examTime', ''),
-            exam_code=exercise_from_data.get('examCode', ''),
-            exam_full_name=exercise_from_data.get('examFullName', ''),
-        )
-
-        # 2. 创建 Exercise 实例
-        exercise, created = Exercise.objects.get_or_create(
-            exercise_id=data['exercise_id'],
-            defaults={
-                'exercise_type': exercise_type,
-                'category': category,
-                'major': major,
-                'chapter': chapter,
-                'exam_group': exam_group,
-                'source': source,
-                'level': data.get('level', 1),  # 默认值为 1
-                'score': data.get('score', 0),  # 默认值为 0
-            }
+            dimensions = DimensionResolver(validated)
+        self.stdout.write(f"Validated {len(rows)} exercises and resolved dimensions in {ingestion.elapsed:.1f}s")
+        rows, dropped = drop_file_duplicates(rows, validated, dimensions, options['on_duplicate'])
+        ingestion.stats['skipped'] += dropped
+
+        partitions = partition(rows, workers)
+
+        args = (options['batch_size'], options['on_duplicate'], self.keep_ids)
+        if workers == 1:
+            results = [ingest_partition(partitions[0], *args)]
+        else:
+            # 子进程不能复用父进程的数据库连接
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                results = list(pool.map(ingest_partition, partitions, *(repeat(arg) for arg in args)))
+
+        for stats, errors in results:
+            ingestion.merge(stats, errors)
+        return ingestion
+
+    def handle_chunked(self, f, json_file, options, ndjson):
+        """每 chunk_size 条提交一次并记录检查点，中断后重新执行同一命令从检查点继续"""
+        checkpoint = importing.get_checkpoint(
+            importing.file_sha256(f), filename=os.path.basename(json_file), restart=options['restart']
         )
-
-        # 3. 创建 ExerciseStem
-        stem, _ = ExerciseStem.objects.get_or_create(
-            exercise=exercise,
-            stem_content=data['stem']
-        )
-        exercise.stem = stem
-        exercise.save()
-
-        # 4. 创建 Question
-        for q_data in data.get('questions', []):
-            Question.objects.get_or_create(
-                exercise=exercise,
-                question_order=q_data['questionOrder'],
-                defaults={
-                    'question_stem': q_data.get('questionStem', ''),
-                    'question_answer': q_data['questionAnswer'],
-                    'question_analysis': q_data.get('questionAnalysis'),
-                }
-            )
-
-        # 5. 创建 ExerciseAnswer（最后一个为主答案）
-        for ans_data in data.get('answer', []):
-            answer, _ = ExerciseAnswer.objects.get_or_create(
-                exercise=exercise,
-                answer_content=ans_data['answer_content'],
-                mark=ans_data['mark'],
-                defaults={
-                    'from_model': ans_data.get('from_model', ''),
-                    'render_type': ans_data.get('render_type', ''),
-                }
-            )
-        # 设置最后一个为主答案
-        if data.get('answer'):
-            last_answer = data['answer'][-1]
-            exercise.answer = ExerciseAnswer.objects.get(
-                exercise=exercise,
-                answer_content=last_answer['answer_content'],
-                mark=last_answer['mark']
-            )
-            exercise.save()
-
-        # 6. 创建 ExerciseAnalysis（最后一个为主解析）
-        for ana_data in data.get('analysis', []):
-            analysis, _ = ExerciseAnalysis.objects.get_or_create(
-                exercise=exercise,
-                analysis_content=ana_data['analysis_content'],
-                mark=ana_data['mark'],
-                defaults={
-                    'render_type': ana_data.get('render_type', ''),
-                }
-            )
-        # 设置最后一个为主解析
-        if data.get('analysis'):
-            last_analysis = data['analysis'][-1]
-            exercise.analysis = ExerciseAnalysis.objects.get(
-                exercise=exercise,
-                analysis_content=last_analysis['analysis_content'],
-                mark=last_analysis['mark']
+        if checkpoint.status == 'completed':
+            self.stdout.write(self.style.WARNING(
+                f"{json_file} was already imported ({checkpoint.rows_committed} exercises); use --restart to import again"
+            ))
+            return None
+        if checkpoint.rows_committed:
+            self.stdout.write(f"Resuming {json_file} after {checkpoint.rows_committed} committed exercises")
+
+        ingestion = self.ingestion(options, options['chunk_size'])
+        try:
+            count = importing.import_checkpointed(
+                self.items(f, ndjson), checkpoint, options['chunk_size'], write_chunk=ingestion.write
             )
-            exercise.save()
-
-        # 7. 创建 ExerciseFrom
-        exercise_from, _ = ExerciseFrom.objects.get_or_create(
-            exercise=exercise,
-            defaults={
-                'exam': exam,
-                'is_official_exercise': exercise_from_data.get('isOfficialExercise', 0),
-                'exercise_number': exercise_from_data.get('exerciseNumber', 1),
-                'material_name': exercise_from_data.get('materialName', ''),
-                'section': exercise_from_data.get('section', ''),
-                'page_number': exercise_from_data.get('pageNumber', 0),
-            }
-        )
-        exercise.exercise_from = exercise_from
-        exercise.save()
-
-        # 8. 创建 ExerciseImage
-        for img_data in data.get('image_links', []):
-            ExerciseImage.objects.get_or_create(
-                exercise=exercise,
-                image_link=img_data['image_link'],
-                defaults={
-                    'source_type': img_data['source_type'],
-                    'is_deprecated': img_data['is_deprecated'],
-                    'ocr_result': img_data.get('ocr_result', ''),
-                }
-            )
\ No newline at end of file
+        except (json.JSONDecodeError, UnicodeDecodeError, *importing.COMPRESSION_ERRORS) as e:
+            self.stdout.write(self.style.ERROR(
+                f"Invalid JSON format in {json_file}: {e} ({checkpoint.rows_committed} exercises committed)"
+            ))
+            return None
+        except importing.CheckpointConflict:
+            self.stdout.write(self.style.ERROR(f"{json_file} is being imported by another process"))
+            return None
+
+        self.stdout.write(self.style.SUCCESS(
+            f"All exercises imported successfully ({count} in this run, {checkpoint.rows_committed} total)"
+        ))
+        return ingestion
+
+    def report(self, ingestion, workers):
+        for error in ingestion.errors:
+            exercise_id = error.get('exercise_id', f"#{error['index']}")
+            self.stdout.write(self.style.ERROR(f"Error importing exercise {exercise_id}: {error['errors']}"))
+        stats = ingestion.stats
+        details = [f"{stats['failed']} failed"]
+        details += [f"{stats[key]} {key}" for key in ('skipped', 'updated') if stats[key]]
+        self.stdout.write(self.style.SUCCESS(f"Imported {stats['written']} exercises ({', '.join(details)})"))
+        self.stdout.write(f"{ingestion.summary()} with {workers} worker(s)")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Exercise, ExerciseReadModel
+from core import read_model
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the flattened exercise read model (exercise_read_model) in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category-id', type=int, help='Only rebuild exercises in this category')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Exercises per batch')
+
+    def handle(self, *args, **options):
+        exercises = Exercise.objects.order_by('exercise_id')
+        if options['category_id']:
+            exercises = exercises.filter(category_id=options['category_id'])
+        else:
+            # 全量重建时清理已不存在题目的残留行
+            ExerciseReadModel.objects.exclude(exercise_id__in=Exercise.objects.values('exercise_id')).delete()
+
+        batch_size = options['batch_size']
+        total = 0
+        last_id = 0
+        # 按主键分段，避免一次性加载全部 id
+        while True:
+            batch_ids = list(exercises.filter(exercise_id__gt=last_id).values_list('exercise_id', flat=True)[:batch_size])
+            if not batch_ids:
+                break
+            read_model.refresh_exercises(batch_ids)
+            total += len(batch_ids)
+            last_id = batch_ids[-1]
+            self.stdout.write(f"Refreshed {total} exercises")
+
+        self.stdout.write(self.style.SUCCESS(f'Read model rebuilt for {total} exercises'))
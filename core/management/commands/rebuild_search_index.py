@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Exercise
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the content search index (exercise_search_terms) for all or selected exercises'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category-id', type=int, help='Only rebuild exercises in this category')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Exercises per batch')
+
+    def handle(self, *args, **options):
+        exercises = Exercise.objects.order_by('exercise_id')
+        if options['category_id']:
+            exercises = exercises.filter(category_id=options['category_id'])
+
+        batch_size = options['batch_size']
+        total = 0
+        last_id = 0
+        # 按主键分段，避免一次性加载全部 id
+        while True:
+            batch_ids = list(exercises.filter(exercise_id__gt=last_id).values_list('exercise_id', flat=True)[:batch_size])
+            if not batch_ids:
+                break
+            search.reindex_exercises(batch_ids)
+            total += len(batch_ids)
+            last_id = batch_ids[-1]
+            self.stdout.write(f"Indexed {total} exercises")
+
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt for {total} exercises'))
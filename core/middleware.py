@@ -0,0 +1,123 @@
+# core/middleware.py
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST_RE = re.compile(r'\((?:\s*(?:%s|\?|\d+)\s*,)+\s*(?:%s|\?|\d+)\s*\)')
+
+# 每个视图最多保留的重复 SQL 指纹数
+MAX_DUPLICATES = 5
+# 没有匹配到视图的请求（404、扫描器）统一记在这个键下，不按路径分别计数
+UNRESOLVED = '<unresolved>'
+
+
+def fingerprint(sql):
+    """SQL 指纹：去掉字面量并折叠 IN 列表，同一模板不同参数视为同一条"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return ' '.join(sql.split())
+
+
+class QueryRecorder:
+    """挂到 connection.execute_wrapper 上，记录一次请求内的全部 SQL"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return [(sql, n) for sql, n in self.fingerprints.most_common() if n > 1]
+
+
+class QueryStatsStore:
+    """进程内按视图聚合的查询统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.views = defaultdict(lambda: {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_time_ms': 0.0, 'duplicates': Counter(),
+            })
+
+    def record(self, view_name, recorder):
+        with self._lock:
+            stats = self.views[view_name]
+            stats['requests'] += 1
+            stats['queries'] += recorder.count
+            stats['max_queries'] = max(stats['max_queries'], recorder.count)
+            stats['sql_time_ms'] += recorder.duration * 1000
+            for sql, n in recorder.duplicates():
+                stats['duplicates'][sql] += n
+
+    def snapshot(self):
+        with self._lock:
+            views = {}
+            for view_name, stats in self.views.items():
+                views[view_name] = {
+                    'requests': stats['requests'],
+                    'queries': stats['queries'],
+                    'avg_queries': round(stats['queries'] / stats['requests'], 2),
+                    'max_queries': stats['max_queries'],
+                    'sql_time_ms': round(stats['sql_time_ms'], 2),
+                    'avg_sql_time_ms': round(stats['sql_time_ms'] / stats['requests'], 2),
+                    'duplicates': [
+                        {'sql': sql, 'count': n} for sql, n in stats['duplicates'].most_common(MAX_DUPLICATES)
+                    ],
+                }
+            return {'pid': os.getpid(), 'views': views}
+
+
+query_stats = QueryStatsStore()
+
+
+class QueryStatsMiddleware:
+    """
+    按请求统计 SQL 条数、总耗时和重复查询指纹（可选开启：QUERY_STATS_ENABLED = True）。
+    DEBUG 下通过响应头 X-Query-Count / X-Query-Time-Ms / X-Query-Duplicates 返回；
+    生产环境按视图聚合到进程内，由 /api/metrics/queries/ 暴露。
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_STATS_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name or match._func_path) if match else UNRESOLVED
+        query_stats.record(view_name, recorder)
+
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time-Ms'] = f'{recorder.duration * 1000:.2f}'
+            response['X-Query-Duplicates'] = str(sum(n - 1 for _, n in recorder.duplicates()))
+        return response
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExerciseSearchTerm",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("term", models.CharField(max_length=32)),
+                ("weight", models.IntegerField(default=1)),
+                (
+                    "exercise",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_terms",
+                        to="core.exercise",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "exercise_search_terms",
+                "indexes": [
+                    models.Index(
+                        fields=["term", "exercise"],
+                        name="exercise_se_term_a65e93_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
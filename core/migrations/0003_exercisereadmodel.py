@@ -0,0 +1,56 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_exercisesearchterm"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExerciseReadModel",
+            fields=[
+                (
+                    "exercise",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="read_model",
+                        serialize=False,
+                        to="core.exercise",
+                    ),
+                ),
+                ("category_id", models.IntegerField(db_index=True, null=True)),
+                ("category_name", models.CharField(blank=True, max_length=100, null=True)),
+                ("major_id", models.IntegerField(db_index=True, null=True)),
+                ("major_name", models.CharField(blank=True, max_length=100, null=True)),
+                ("chapter_id", models.IntegerField(db_index=True, null=True)),
+                ("chapter_name", models.CharField(blank=True, max_length=100, null=True)),
+                ("exam_group_id", models.IntegerField(db_index=True, null=True)),
+                ("examgroup_name", models.CharField(blank=True, max_length=100, null=True)),
+                ("source_id", models.IntegerField(db_index=True, null=True)),
+                ("source_name", models.CharField(blank=True, max_length=100, null=True)),
+                ("exercise_type_id", models.IntegerField(db_index=True, null=True)),
+                ("type_name", models.CharField(blank=True, max_length=20, null=True)),
+                ("level", models.IntegerField(db_index=True, null=True)),
+                ("score", models.IntegerField(blank=True, db_index=True, null=True)),
+                ("exam_id", models.IntegerField(db_index=True, null=True)),
+                ("school_id", models.IntegerField(db_index=True, null=True)),
+                ("from_school", models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ("exam_time", models.CharField(blank=True, db_index=True, max_length=20, null=True)),
+                ("exam_code", models.CharField(blank=True, db_index=True, max_length=20, null=True)),
+                ("exam_full_name", models.CharField(blank=True, max_length=100, null=True)),
+                ("exercise_number", models.IntegerField(blank=True, db_index=True, null=True)),
+                ("stem_text", models.TextField(blank=True, null=True)),
+                ("answer_text", models.TextField(blank=True, null=True)),
+                ("analysis_text", models.TextField(blank=True, null=True)),
+                ("question_count", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(null=True)),
+            ],
+            options={
+                "db_table": "exercise_read_model",
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_exercisereadmodel"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExerciseAnswerFingerprint",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("answer_order", models.PositiveIntegerField()),
+                ("content_hash", models.CharField(max_length=40, null=True)),
+                (
+                    "exercise",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="answer_fingerprints",
+                        to="core.exercise",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "exercise_answer_fingerprints",
+                "unique_together": {("exercise", "answer_order")},
+                "indexes": [
+                    models.Index(
+                        fields=["exercise", "answer_order", "content_hash"],
+                        name="exercise_an_exercis_6173cd_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
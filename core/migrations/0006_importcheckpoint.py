@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_importjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportCheckpoint",
+            fields=[
+                ("checkpoint_id", models.AutoField(primary_key=True, serialize=False)),
+                ("file_hash", models.CharField(max_length=64, unique=True)),
+                ("filename", models.CharField(blank=True, max_length=255, null=True)),
+                ("rows_committed", models.PositiveIntegerField(default=0)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("running", "导入中"),
+                            ("completed", "已完成"),
+                            ("failed", "失败"),
+                        ],
+                        default="running",
+                        max_length=20,
+                    ),
+                ),
+                ("message", models.TextField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "import_checkpoints",
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_importcheckpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exercise",
+            name="content_hash",
+            field=models.CharField(blank=True, db_index=True, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="on_duplicate",
+            field=models.CharField(default="create", max_length=10),
+        ),
+        migrations.AddField(
+            model_name="importjob",
+            name="rows_skipped",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,70 @@
+from django.db import migrations
+from django.db.models import Count
+
+BATCH_SIZE = 2000
+EXAM_COLUMNS = ["school_id", "from_school", "exam_time", "exam_code", "exam_full_name"]
+
+
+def _name(obj, field):
+    return getattr(obj, field) if obj is not None else None
+
+
+def fill_read_model(apps, schema_editor):
+    # 列表默认读 exercise_read_model，上线时为还没有读模型行的题目补齐，避免列表为空
+    Exercise = apps.get_model("core", "Exercise")
+    ExerciseReadModel = apps.get_model("core", "ExerciseReadModel")
+    missing = Exercise.objects.filter(read_model__isnull=True).order_by("exercise_id")
+    last_id = 0
+    while True:
+        exercises = list(
+            missing.filter(exercise_id__gt=last_id)
+            .select_related(
+                "category", "major", "chapter", "exam_group", "source", "exercise_type",
+                "stem", "answer", "analysis", "exercise_from__exam",
+            )
+            .annotate(question_count=Count("questions"))[:BATCH_SIZE]
+        )
+        if not exercises:
+            break
+        rows = []
+        for exercise in exercises:
+            exercise_from = exercise.exercise_from
+            exam = exercise_from.exam if exercise_from else None
+            rows.append(ExerciseReadModel(
+                exercise_id=exercise.exercise_id,
+                category_id=exercise.category_id,
+                category_name=_name(exercise.category, "category_name"),
+                major_id=exercise.major_id,
+                major_name=_name(exercise.major, "major_name"),
+                chapter_id=exercise.chapter_id,
+                chapter_name=_name(exercise.chapter, "chapter_name"),
+                exam_group_id=exercise.exam_group_id,
+                examgroup_name=_name(exercise.exam_group, "examgroup_name"),
+                source_id=exercise.source_id,
+                source_name=_name(exercise.source, "source_name"),
+                exercise_type_id=exercise.exercise_type_id,
+                type_name=_name(exercise.exercise_type, "type_name"),
+                level=exercise.level,
+                score=exercise.score,
+                exam_id=_name(exam, "exam_id"),
+                exercise_number=_name(exercise_from, "exercise_number"),
+                stem_text=_name(exercise.stem, "stem_content"),
+                answer_text=_name(exercise.answer, "answer_content"),
+                analysis_text=_name(exercise.analysis, "analysis_content"),
+                question_count=exercise.question_count,
+                created_at=exercise.created_at,
+                **{column: _name(exam, column) for column in EXAM_COLUMNS},
+            ))
+        ExerciseReadModel.objects.bulk_create(rows, batch_size=1000)
+        last_id = exercises[-1].exercise_id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_exportjob"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_read_model, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+import hashlib
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def rebuild_fingerprints(apps, schema_editor):
+    # 答案指纹改为原样内容的哈希（与 core.fingerprints.fingerprint 一致），按题目分批重算全部行
+    # 历史迁移里的 ExerciseAnswer 没有 answer_order 字段（表中已有该列），答案直接用 SQL 读取
+    Exercise = apps.get_model("core", "Exercise")
+    ExerciseAnswerFingerprint = apps.get_model("core", "ExerciseAnswerFingerprint")
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    last_id = 0
+    while True:
+        batch_ids = list(
+            Exercise.objects.filter(exercise_id__gt=last_id).order_by("exercise_id")
+            .values_list("exercise_id", flat=True)[:BATCH_SIZE]
+        )
+        if not batch_ids:
+            break
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT {quote('exercise_id')}, {quote('answer_order')}, {quote('answer_content')} "
+                f"FROM {quote('exercise_answers')} "
+                f"WHERE {quote('answer_order')} IS NOT NULL AND {quote('exercise_id')} IN ({', '.join(['%s'] * len(batch_ids))}) "
+                f"ORDER BY {quote('answer_id')}",
+                batch_ids,
+            )
+            answers = cursor.fetchall()
+        rows = {}
+        for exercise_id, answer_order, content in answers:
+            if (exercise_id, answer_order) not in rows:
+                rows[(exercise_id, answer_order)] = ExerciseAnswerFingerprint(
+                    exercise_id=exercise_id,
+                    answer_order=answer_order,
+                    content_hash=hashlib.sha1(content.encode("utf-8")).hexdigest() if content is not None else None,
+                )
+        ExerciseAnswerFingerprint.objects.filter(exercise_id__in=batch_ids).delete()
+        ExerciseAnswerFingerprint.objects.bulk_create(rows.values(), batch_size=1000)
+        last_id = batch_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_fill_exercise_read_model"),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_fingerprints, migrations.RunPython.noop),
+    ]
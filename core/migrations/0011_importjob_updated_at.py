@@ -0,0 +1,17 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_rebuild_answer_fingerprints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importjob",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
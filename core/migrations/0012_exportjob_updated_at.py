@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_importjob_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="exportjob",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -20,6 +20,8 @@ class Exercise(models.Model):
     score = models.IntegerField(blank=True, null=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     text1 = models.TextField(blank=True, null=True)
+    # 题干 + 小题题干 + 试卷属性的规范化哈希（fingerprints.content_hash），导入查重用
+    content_hash = models.CharField(max_length=40, blank=True, null=True, db_index=True)
 
     
     class Meta:
@@ -73,6 +75,21 @@ class ExerciseAnswer(models.Model):
         
 
 
+class ExerciseAnswerFingerprint(models.Model):
+    # 答案指纹：每道题每个 answer_order 一行，保存答案原样内容的哈希，用于答案对比筛选；由 core.fingerprints 维护
+    id = models.BigAutoField(primary_key=True)
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='answer_fingerprints')
+    answer_order = models.PositiveIntegerField()
+    content_hash = models.CharField(max_length=40, null=True)
+
+    class Meta:
+        db_table = 'exercise_answer_fingerprints'
+        unique_together = ['exercise', 'answer_order']
+        indexes = [
+            models.Index(fields=['exercise', 'answer_order', 'content_hash']),
+        ]
+
+
 class ExerciseAnalysis(models.Model):
     analysis_id = models.AutoField(primary_key=True)
     exercise = models.ForeignKey(Exercise, related_name='analyses', null=True, on_delete=models.CASCADE)
@@ -104,6 +121,54 @@ class ExerciseFrom(models.Model):
 
 
 
+class ExerciseSearchTerm(models.Model):
+    # 内容检索倒排索引：每道题每个词项一行（中文按字符二元组切分），由 core.search 维护
+    id = models.BigAutoField(primary_key=True)
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=32)
+    weight = models.IntegerField(default=1)
+
+    class Meta:
+        db_table = 'exercise_search_terms'
+        indexes = [
+            models.Index(fields=['term', 'exercise']),
+        ]
+
+
+class ExerciseReadModel(models.Model):
+    # 题目列表读模型：每道题一行的扁平化宽表，列表/筛选直接查这张表，不再连表；由 core.read_model 维护
+    exercise = models.OneToOneField(Exercise, on_delete=models.CASCADE, primary_key=True, related_name='read_model')
+    category_id = models.IntegerField(null=True, db_index=True)
+    category_name = models.CharField(max_length=100, blank=True, null=True)
+    major_id = models.IntegerField(null=True, db_index=True)
+    major_name = models.CharField(max_length=100, blank=True, null=True)
+    chapter_id = models.IntegerField(null=True, db_index=True)
+    chapter_name = models.CharField(max_length=100, blank=True, null=True)
+    exam_group_id = models.IntegerField(null=True, db_index=True)
+    examgroup_name = models.CharField(max_length=100, blank=True, null=True)
+    source_id = models.IntegerField(null=True, db_index=True)
+    source_name = models.CharField(max_length=100, blank=True, null=True)
+    exercise_type_id = models.IntegerField(null=True, db_index=True)
+    type_name = models.CharField(max_length=20, blank=True, null=True)
+    level = models.IntegerField(null=True, db_index=True)
+    score = models.IntegerField(blank=True, null=True, db_index=True)
+    exam_id = models.IntegerField(null=True, db_index=True)
+    school_id = models.IntegerField(null=True, db_index=True)
+    from_school = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    exam_time = models.CharField(max_length=20, blank=True, null=True, db_index=True)
+    exam_code = models.CharField(max_length=20, blank=True, null=True, db_index=True)
+    exam_full_name = models.CharField(max_length=100, blank=True, null=True)
+    exercise_number = models.IntegerField(blank=True, null=True, db_index=True)
+    stem_text = models.TextField(blank=True, null=True)
+    answer_text = models.TextField(blank=True, null=True)
+    analysis_text = models.TextField(blank=True, null=True)
+    question_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = 'exercise_read_model'
+
+
 class ExerciseImage(models.Model):
     # 定义第一个字段的选择项
     SOURCE_TYPES = (
@@ -316,6 +381,89 @@ class UserActionLog(models.Model):
         return f"{self.user.username if self.user else 'Anonymous'} - {self.action_type} - {self.timestamp}"
 
 
+class ImportJob(models.Model):
+    """后台导入任务：上传内容先落盘，由 Celery / 线程 / 同步方式执行，按块更新进度"""
+    STATUS_CHOICES = (
+        ('pending', '排队中'),
+        ('running', '执行中'),
+        ('succeeded', '已完成'),
+        ('failed', '失败'),
+    )
 
+    job_id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    filename = models.CharField(max_length=255, blank=True, null=True)  # 原始文件名
+    file_path = models.CharField(max_length=500)  # 落盘后的路径
+    on_duplicate = models.CharField(max_length=10, default='create')  # 内容重复时的处理：skip / update / create
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    rows_parsed = models.PositiveIntegerField(default=0)
+    rows_validated = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    rows_failed = models.PositiveIntegerField(default=0)
+    rows_skipped = models.PositiveIntegerField(default=0)  # 按 on_duplicate=skip 跳过的重复行
+    errors = models.JSONField(default=list, blank=True)  # [{"index": 行号, "errors": {...}}]
+    message = models.TextField(blank=True, null=True)  # 任务级错误（如 JSON 格式错误）
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)  # 最近一次进度更新，用于识别中断的任务
+
+    class Meta:
+        db_table = 'import_jobs'
+
+    def __str__(self):
+        return f"ImportJob {self.job_id} ({self.status})"
+
+
+class ExportJob(models.Model):
+    """后台导出任务：按块流式写入临时文件，完成后改名为正式文件，通过下载接口取回"""
+    STATUS_CHOICES = ImportJob.STATUS_CHOICES
+
+    job_id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    ndjson = models.BooleanField(default=False)  # 输出格式：NDJSON / JSON 数组
+    gzip = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    rows_total = models.PositiveIntegerField(default=0)  # 开始执行时统计的题目数
+    rows_written = models.PositiveIntegerField(default=0)
+    file_path = models.CharField(max_length=500, blank=True, null=True)  # 完成后的文件路径
+    file_size = models.PositiveBigIntegerField(default=0)
+    message = models.TextField(blank=True, null=True)  # 失败原因
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)  # 最近一次进度更新，用于识别中断的任务
+
+    class Meta:
+        db_table = 'export_jobs'
+
+    def __str__(self):
+        return f"ExportJob {self.job_id} ({self.status})"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    分块导入的检查点：按文件内容哈希记录已提交的行数（即最后提交行的序号 + 1）。
+    每块数据与检查点在同一事务中提交，中断后用同一文件重新导入会跳过已提交的行。
+    """
+    STATUS_CHOICES = (
+        ('running', '导入中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    )
 
+    checkpoint_id = models.AutoField(primary_key=True)
+    file_hash = models.CharField(max_length=64, unique=True)  # 文件内容 SHA-256
+    filename = models.CharField(max_length=255, blank=True, null=True)
+    rows_committed = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    message = models.TextField(blank=True, null=True)  # 最近一次失败原因
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        db_table = 'import_checkpoints'
+
+    def __str__(self):
+        return f"ImportCheckpoint {self.filename or self.file_hash[:12]} ({self.rows_committed}, {self.status})"
@@ -0,0 +1,175 @@
+# core/pagination.py
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import F, Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import counting
+
+
+class EstimatedPage(Page):
+    """总数为估算值时的页：是否有下一页由多取的一行决定，不依赖 num_pages"""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class CountingPaginator(Paginator):
+    """
+    总数走 counting.get_count（缓存/估算），count_is_estimate 标记是否为估算值。
+    估算值只用于展示：此时不按 num_pages 校验页码，按 OFFSET 取 per_page + 1 行，
+    取不到行才算越界，有没有下一页看是否多取到一行。
+    """
+    count_is_estimate = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        count, self.count_is_estimate = counting.get_count(self.object_list)
+        return count
+
+    def validate_number(self, number):
+        self.count  # 先确定总数是否为估算值
+        if not self.count_is_estimate:
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(self.error_messages['invalid_page'])
+        if number < 1:
+            raise EmptyPage(self.error_messages['min_page'])
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        return EstimatedPage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
+
+
+class KeysetPagination(BasePagination):
+    """
+    游标（keyset）分页：cursor 为不透明令牌，编码上一页最后一行的 (排序字段值, 主键)。
+    每一页都是 WHERE (field, pk) > (last_value, last_pk) ORDER BY field, pk LIMIT n，
+    不做 OFFSET 扫描；只有在 include_total=true 时才执行 COUNT(*)。
+    排序字段可为 NULL，统一按 NULL 在前处理（与 MySQL 升序默认一致）。
+    """
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    total_query_param = 'include_total'
+
+    def __init__(self, pk_field='exercise_id'):
+        self.pk_field = pk_field
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, order_by, value, pk):
+        payload = json.dumps([order_by, value, pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, token, order_by):
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            cursor_order_by, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        except (ValueError, TypeError):
+            raise ValidationError({self.cursor_query_param: "Invalid cursor"})
+        # 外层结构正确但类型不对的游标（伪造或损坏）在构造查询条件时才会出错，这里提前拒绝
+        if not isinstance(pk, int) or isinstance(pk, bool) or (
+            value is not None and (isinstance(value, bool) or not isinstance(value, (str, int, float)))
+        ):
+            raise ValidationError({self.cursor_query_param: "Invalid cursor"})
+        if cursor_order_by != order_by:
+            raise ValidationError({self.cursor_query_param: "Cursor does not match order_by"})
+        return value, pk
+
+    def after(self, order_field, value, pk):
+        """构造 (order_field, pk) > (value, pk) 的条件，NULL 视为最小值"""
+        pk_field = self.pk_field
+        if order_field == pk_field:
+            return Q(**{f'{pk_field}__gt': pk})
+        if value is None:
+            return Q(**{f'{order_field}__isnull': True, f'{pk_field}__gt': pk}) | Q(**{f'{order_field}__isnull': False})
+        return Q(**{f'{order_field}__gt': value}) | Q(**{order_field: value, f'{pk_field}__gt': pk})
+
+    def paginate_queryset(self, queryset, request, order_field, order_by, view=None):
+        self.request = request
+        self.order_by = order_by
+        self.order_field = order_field
+        page_size = self.get_page_size(request)
+
+        include_total = request.query_params.get(self.total_query_param, '').lower() in ('1', 'true', 'yes')
+        self.total, self.total_is_estimate = counting.get_count(queryset) if include_total else (None, False)
+
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            value, pk = self.decode_cursor(token, order_by)
+            try:
+                queryset = queryset.filter(self.after(order_field, value, pk))
+            except (ValueError, TypeError, DjangoValidationError):
+                # 标量类型正确但与排序字段不符，如 level 的游标值为 "x"
+                raise ValidationError({self.cursor_query_param: "Invalid cursor"})
+
+        if order_field == self.pk_field:
+            queryset = queryset.order_by(self.pk_field)
+        else:
+            # 跨表排序字段（如 exercise_from__exercise_number）通过注解取回，避免再查一次关联对象
+            queryset = queryset.annotate(keyset_value=F(order_field)).order_by(
+                F(order_field).asc(nulls_first=True), self.pk_field
+            )
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+
+        self.next_cursor = None
+        if self.has_next and rows:
+            last = rows[-1]
+            pk = getattr(last, self.pk_field)
+            value = pk if order_field == self.pk_field else last.keyset_value
+            self.next_cursor = self.encode_cursor(order_by, value, pk)
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        body = {
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        }
+        if self.total is not None:
+            body['count'] = self.total
+            body['count_is_estimate'] = self.total_is_estimate
+        return Response(body)
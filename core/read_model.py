@@ -0,0 +1,109 @@
+# core/read_model.py
+from django.db import transaction
+from django.db.models import Count
+
+from . import fetch_plans
+from .models import Exercise, ExerciseReadModel
+
+REFRESH_BATCH_SIZE = 500
+
+# 层级维度 -> (读模型 id 列, 读模型名称列)
+DIMENSION_COLUMNS = {
+    'category': ('category_id', 'category_name'),
+    'major': ('major_id', 'major_name'),
+    'chapter': ('chapter_id', 'chapter_name'),
+    'exam_group': ('exam_group_id', 'examgroup_name'),
+    'source': ('source_id', 'source_name'),
+    'exercise_type': ('exercise_type_id', 'type_name'),
+}
+EXAM_COLUMNS = ['school_id', 'from_school', 'exam_time', 'exam_code', 'exam_full_name']
+
+
+def build_row(exercise):
+    """由已 select_related 的 Exercise 构造一行读模型"""
+    exercise_from = exercise.exercise_from
+    exam = exercise_from.exam if exercise_from else None
+    return ExerciseReadModel(
+        exercise_id=exercise.exercise_id,
+        category_id=exercise.category_id,
+        category_name=exercise.category.category_name if exercise.category else None,
+        major_id=exercise.major_id,
+        major_name=exercise.major.major_name if exercise.major else None,
+        chapter_id=exercise.chapter_id,
+        chapter_name=exercise.chapter.chapter_name if exercise.chapter else None,
+        exam_group_id=exercise.exam_group_id,
+        examgroup_name=exercise.exam_group.examgroup_name if exercise.exam_group else None,
+        source_id=exercise.source_id,
+        source_name=exercise.source.source_name if exercise.source else None,
+        exercise_type_id=exercise.exercise_type_id,
+        type_name=exercise.exercise_type.type_name if exercise.exercise_type else None,
+        level=exercise.level,
+        score=exercise.score,
+        exam_id=exam.exam_id if exam else None,
+        school_id=exam.school_id if exam else None,
+        from_school=exam.from_school if exam else None,
+        exam_time=exam.exam_time if exam else None,
+        exam_code=exam.exam_code if exam else None,
+        exam_full_name=exam.exam_full_name if exam else None,
+        exercise_number=exercise_from.exercise_number if exercise_from else None,
+        stem_text=exercise.stem.stem_content if exercise.stem else None,
+        answer_text=exercise.answer.answer_content if exercise.answer else None,
+        analysis_text=exercise.analysis.analysis_content if exercise.analysis else None,
+        question_count=exercise.question_count,
+        created_at=exercise.created_at,
+    )
+
+
+def refresh_exercises(exercise_ids):
+    """重建指定题目的读模型行（先删后插，按批处理）"""
+    exercise_ids = list(exercise_ids)
+    for start in range(0, len(exercise_ids), REFRESH_BATCH_SIZE):
+        batch_ids = exercise_ids[start:start + REFRESH_BATCH_SIZE]
+        exercises = Exercise.objects.filter(exercise_id__in=batch_ids).select_related(
+            'category', 'major', 'chapter', 'exam_group', 'source', 'exercise_type',
+            'stem', 'answer', 'analysis', 'exercise_from__exam'
+        ).annotate(question_count=Count('questions'))
+        rows = [build_row(exercise) for exercise in exercises]
+        with transaction.atomic():
+            ExerciseReadModel.objects.filter(exercise_id__in=batch_ids).delete()
+            ExerciseReadModel.objects.bulk_create(rows, batch_size=1000)
+
+
+def rename_dimension(dimension, pk, name):
+    """层级/来源/题型改名时批量改写冗余的名称列"""
+    id_column, name_column = DIMENSION_COLUMNS[dimension]
+    ExerciseReadModel.objects.filter(**{id_column: pk}).update(**{name_column: name})
+
+
+def clear_dimension(dimension, pk):
+    """层级被删除时，对应外键已被置空，读模型同步置空"""
+    id_column, name_column = DIMENSION_COLUMNS[dimension]
+    ExerciseReadModel.objects.filter(**{id_column: pk}).update(**{id_column: None, name_column: None})
+
+
+def refresh_exam(exam):
+    """试卷信息修改后同步冗余的试卷列；exam 为 None 的情况由 clear_exam 处理"""
+    ExerciseReadModel.objects.filter(exam_id=exam.exam_id).update(
+        **{column: getattr(exam, column) for column in EXAM_COLUMNS}
+    )
+
+
+def clear_exam(exam_id):
+    ExerciseReadModel.objects.filter(exam_id=exam_id).update(
+        exam_id=None, **{column: None for column in EXAM_COLUMNS}
+    )
+
+
+def clear_school(school_id):
+    """学校被删除时，试卷的 school 外键已被置空（SET_NULL 走批量 update，不触发信号），读模型同步置空"""
+    ExerciseReadModel.objects.filter(school_id=school_id).update(school_id=None)
+
+
+def load_exercises(rows, queryset=None):
+    """按读模型分页结果的顺序取回完整 Exercise 对象，供 ExerciseSerializer 序列化"""
+    ids = [row.exercise_id for row in rows]
+    if queryset is None:
+        queryset = fetch_plans.apply(Exercise.objects.all(), 'list')
+    exercises = queryset.filter(exercise_id__in=ids)
+    by_id = {exercise.exercise_id: exercise for exercise in exercises}
+    return [by_id[pk] for pk in ids if pk in by_id]
@@ -0,0 +1,126 @@
+# core/search.py
+import operator
+import re
+from collections import defaultdict
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+
+from .models import Exercise, ExerciseSearchTerm, Question
+
+# 各字段命中权重：题干 > 小问 > 答案/解析
+FIELD_WEIGHTS = {
+    'stem': 3,
+    'question': 2,
+    'answer': 1,
+    'analysis': 1,
+}
+MAX_TERM_LENGTH = 32
+REINDEX_BATCH_SIZE = 500
+
+_CJK = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_TOKEN_RE = re.compile(f'[{_CJK}]+|[a-z0-9_]+')
+_CJK_RE = re.compile(f'[{_CJK}]')
+
+
+def tokenize(text):
+    """切分词项：中文连续片段按字符二元组切分（单字片段保留单字），英文/数字按整词"""
+    if not text:
+        return []
+    terms = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                terms.append(run)
+            else:
+                terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        elif len(run) > 1 or run.isdigit():
+            terms.append(run[:MAX_TERM_LENGTH])
+    return terms
+
+
+def query_terms(search):
+    """
+    查询串的去重词项；返回空列表表示无法走索引，由调用方退回 icontains：
+    例如只有一个英文字母，或含单个汉字的片段（索引里只有二元组，单字查不到）。
+    """
+    terms = []
+    for run in _TOKEN_RE.findall(search.lower()):
+        if _CJK_RE.match(run) and len(run) == 1:
+            return []
+    for term in tokenize(search):
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def _term_q(term):
+    """中文二元组精确匹配；英文/数字按前缀匹配，func 可命中 function"""
+    if _CJK_RE.match(term):
+        return Q(term=term)
+    return Q(term__startswith=term)
+
+
+def build_terms(exercise, questions):
+    """计算一道题的 {term: weight}"""
+    weights = defaultdict(int)
+    fields = [
+        ('stem', [exercise.stem.stem_content if exercise.stem else None]),
+        ('question', [text for q in questions for text in (q['question_stem'], q['question_answer'])]),
+        ('answer', [exercise.answer.answer_content if exercise.answer else None]),
+        ('analysis', [exercise.analysis.analysis_content if exercise.analysis else None]),
+    ]
+    for field, texts in fields:
+        seen = set()
+        for text in texts:
+            seen.update(tokenize(text))
+        for term in seen:
+            weights[term] += FIELD_WEIGHTS[field]
+    return weights
+
+
+def reindex_exercises(exercise_ids):
+    """重建指定题目的索引行（先删后插，按批处理）"""
+    exercise_ids = list(exercise_ids)
+    for start in range(0, len(exercise_ids), REINDEX_BATCH_SIZE):
+        batch_ids = exercise_ids[start:start + REINDEX_BATCH_SIZE]
+        exercises = Exercise.objects.filter(exercise_id__in=batch_ids).select_related('stem', 'answer', 'analysis')
+        questions = defaultdict(list)
+        question_rows = Question.objects.filter(exercise_id__in=batch_ids).values(
+            'exercise_id', 'question_stem', 'question_answer'
+        )
+        for q in question_rows:
+            questions[q['exercise_id']].append(q)
+
+        rows = []
+        for exercise in exercises:
+            for term, weight in build_terms(exercise, questions[exercise.exercise_id]).items():
+                rows.append(ExerciseSearchTerm(exercise_id=exercise.exercise_id, term=term, weight=weight))
+
+        with transaction.atomic():
+            ExerciseSearchTerm.objects.filter(exercise_id__in=batch_ids).delete()
+            ExerciseSearchTerm.objects.bulk_create(rows, batch_size=1000)
+
+
+def matching_terms(terms):
+    """每个查询词项都有命中的题目，按 exercise_id 分组并给出 rank"""
+    conditions = [_term_q(term) for term in terms]
+    matched = {f'matched_{i}': Count('id', filter=condition) for i, condition in enumerate(conditions)}
+    return (
+        ExerciseSearchTerm.objects.filter(reduce(operator.or_, conditions))
+        .values('exercise_id')
+        .annotate(rank=Sum('weight'), **matched)
+        .filter(**{f'{name}__gt': 0 for name in matched})
+    )
+
+
+def apply_content_search(queryset, terms, pk_field='exercise_id'):
+    """按索引过滤查询集并注解 search_rank，用于相关度排序"""
+    rank = Subquery(
+        ExerciseSearchTerm.objects.filter(reduce(operator.or_, map(_term_q, terms)), exercise_id=OuterRef(pk_field))
+        .values('exercise_id')
+        .annotate(rank=Sum('weight'))
+        .values('rank')[:1]
+    )
+    return queryset.filter(**{f'{pk_field}__in': matching_terms(terms).values('exercise_id')}).annotate(search_rank=rank)
@@ -1,15 +1,21 @@
 # core/serializers.py
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import Group
-from django.db import transaction
-from django.db.models import Max
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.db.models.functions import Substr
 
 from .models import (
     Category, Major, Chapter, ExamGroup, Exercise, ExerciseStem, Question,
     ExerciseAnswer, ExerciseAnalysis, ExerciseType, Source, ExerciseFrom, Exam, School,
-    User, RolePermission, UserActionLog, Role, Source, ExerciseImage
+    User, RolePermission, UserActionLog, Role, Source, ExerciseImage, ImportJob, ExportJob
 )
+from . import fetch_plans, fingerprints, sync
+from .dimensions import DimensionResolver
+from .validation import BatchValidator
 import traceback
 import logging
 
@@ -60,6 +66,11 @@ class QuestionSerializer(serializers.ModelSerializer):
         model = Question
         fields = [ 'question_order', 'question_stem', 'question_answer']
 
+class QuestionWriteSerializer(QuestionSerializer):
+    """导入格式的小题：另外接受 question_analysis"""
+    class Meta(QuestionSerializer.Meta):
+        fields = QuestionSerializer.Meta.fields + ['question_analysis']
+
 class ExerciseAnswerSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExerciseAnswer
@@ -152,7 +163,11 @@ class ExerciseFromSerializer(serializers.ModelSerializer):
                     'exam_full_name': exam_full_name
                 }
                 exam_data = {k: v for k, v in exam_data.items() if v is not None}
-                if exam_data:
+                dimensions = self.context.get('dimensions')
+                if exam_data and dimensions is not None:
+                    # 批量写入时试卷/学校已由 DimensionResolver 预先解析
+                    exam = dimensions.exam_for(exam_data, exercise.category if exercise else None)
+                elif exam_data:
                     if from_school:
                         school, _ = School.objects.get_or_create(name=from_school)
                         exam_data['school'] = school
@@ -186,11 +201,23 @@ class SourceSerializer(serializers.ModelSerializer):
 
 
 class ExerciseSerializer(serializers.ModelSerializer):
+    """
+    列表/详情的题目序列化器。支持按需裁剪：
+    fields=exercise_id,stem_preview,category_name 只输出指定字段；
+    expand=answers,analyses,images 额外输出该题的全部答案/解析/图片（批量预取）。
+    配合 prepare_queryset 使用，未请求的关联表不 JOIN、不预取，大文本列延迟加载。
+    """
     stem = serializers.CharField(source='stem.stem_content', read_only=True)  # 只读
+    stem_preview = serializers.CharField(read_only=True, allow_null=True)  # 由 prepare_queryset 注解
     questions = QuestionSerializer(many=True, read_only=True)
     answer = ExerciseAnswerSerializer(read_only=True)
     analysis = ExerciseAnalysisSerializer(read_only=True)
 
+    # 可展开的一对多关系
+    answers = ExerciseAnswerSerializer(many=True, read_only=True)
+    analyses = ExerciseAnalysisSerializer(many=True, read_only=True)
+    images = ExerciseImageSerializer(source='exercise_images', many=True, read_only=True)
+
     
     from_school = serializers.CharField(source='exercise_from.exam.from_school', read_only=True, allow_null=True)
     exam_time = serializers.CharField(source='exercise_from.exam.exam_time', read_only=True, allow_null=True)
@@ -205,19 +232,83 @@ class ExerciseSerializer(serializers.ModelSerializer):
 
     
 
+    # 不传 fields 时的输出，与原来保持一致
+    DEFAULT_FIELDS = [
+        'exercise_id',
+         'level', 'score', 'stem', 'questions', 'answer', 'analysis',
+        'from_school', 'exam_time', 'exam_code',
+        'exam_full_name', 'category_name', 'major_name', 'chapter_name', 'examgroup_name',
+        'source_name', 'type_name'
+    ]
+    EXPANDABLE = ['answers', 'analyses', 'images']
+    STEM_PREVIEW_LENGTH = 100
+
+    # 字段 -> 需要 select_related 的关联
+    FIELD_RELATIONS = {
+        'stem': 'stem', 'answer': 'answer', 'analysis': 'analysis',
+        'from_school': 'exercise_from__exam', 'exam_time': 'exercise_from__exam',
+        'exam_code': 'exercise_from__exam', 'exam_full_name': 'exercise_from__exam',
+        'category_name': 'category', 'major_name': 'major', 'chapter_name': 'chapter',
+        'examgroup_name': 'exam_group', 'source_name': 'source', 'type_name': 'exercise_type',
+    }
+    # 字段 -> 需要预取的关联（见 fetch_plans.PREFETCHES）
+    FIELD_PREFETCHES = ('questions', 'answers', 'analyses', 'images')
+
     class Meta:
         model = Exercise
         fields = [
             'exercise_id', 
-             'level', 'score', 'stem', 'questions', 'answer', 'analysis',
+             'level', 'score', 'stem', 'stem_preview', 'questions', 'answer', 'analysis',
             'from_school', 'exam_time', 'exam_code', 
             'exam_full_name', 'category_name', 'major_name', 'chapter_name', 'examgroup_name',
-            'source_name', 'type_name'
+            'source_name', 'type_name', 'answers', 'analyses', 'images'
         ]
         read_only_fields = ['exercise_id']
 
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.selected_fields(fields, expand)
+        for name in list(self.fields):
+            if name not in selected:
+                self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, fields=None, expand=None):
+        return list(fields or cls.DEFAULT_FIELDS) + [name for name in expand or () if name not in (fields or ())]
+
+    @classmethod
+    def parse_selection(cls, fields_param, expand_param):
+        """解析 fields= / expand= 查询参数（逗号分隔），未知字段抛 ValueError"""
+        fields = [name.strip() for name in (fields_param or '').split(',') if name.strip()] or None
+        expand = [name.strip() for name in (expand_param or '').split(',') if name.strip()]
+        if fields:
+            unknown = [name for name in fields if name not in cls.Meta.fields or name in cls.EXPANDABLE]
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        unknown = [name for name in expand if name not in cls.EXPANDABLE]
+        if unknown:
+            raise ValueError(f"Unknown expand: {', '.join(unknown)} (allowed: {', '.join(cls.EXPANDABLE)})")
+        return fields, expand
+
+    @classmethod
+    def fetch_plan(cls, fields=None, expand=None):
+        """按所选字段生成取数方案；默认字段与 fetch_plans 的 list 方案一致"""
+        selected = cls.selected_fields(fields, expand)
+        return fetch_plans.FetchPlan(
+            'fields',
+            select=[cls.FIELD_RELATIONS[name] for name in selected if name in cls.FIELD_RELATIONS],
+            prefetch=[name for name in cls.FIELD_PREFETCHES if name in selected],
+        )
+
+    @classmethod
+    def prepare_queryset(cls, queryset, fields=None, expand=None):
+        """只 JOIN / 预取所选字段用到的关联，延迟加载未用到的大文本列"""
+        selected = cls.selected_fields(fields, expand)
+        queryset = cls.fetch_plan(fields, expand).apply(queryset)
+        if 'stem_preview' in selected:
+            queryset = queryset.annotate(stem_preview=Substr('stem__stem_content', 1, cls.STEM_PREVIEW_LENGTH))
+        return queryset
 
-    
 
     def validate(self, data):
         logger.debug(f'before validate data {data}')
@@ -244,15 +335,62 @@ class ExerciseSerializer(serializers.ModelSerializer):
 
 
 
+def _back_pointers(model, objects, last):
+    """
+    {exercise_id: 该题第一条/最后一条 model 行的主键}。
+    bulk_create 已回填主键时直接按创建顺序取；不回填（MySQL）时每张表一次聚合查询补齐。
+    """
+    if not objects:
+        return {}
+    if all(obj.pk is not None for obj in objects):
+        mapping = {}
+        for obj in objects:
+            if last or obj.exercise_id not in mapping:
+                mapping[obj.exercise_id] = obj.pk
+        return mapping
+    pk_name = model._meta.pk.attname
+    aggregate = Max(pk_name) if last else Min(pk_name)
+    exercise_ids = {obj.exercise_id for obj in objects}
+    return dict(
+        model.objects.filter(exercise_id__in=exercise_ids).values('exercise_id')
+        .annotate(pointer=aggregate).values_list('exercise_id', 'pointer')
+    )
+
+
+def _bulk_create_exercises(exercises):
+    """
+    批量插入题目并回填主键。后端不回填自增主键时（MySQL），插入前后各按本批的 content_hash 查一次，
+    新出现的行按主键（即插入）顺序依次对应同一哈希的题目；同一事务内的快照读看不到其他事务并发插入的行。
+    """
+    pending = [exercise for exercise in exercises if exercise.exercise_id is None]
+    if connection.features.can_return_rows_from_bulk_insert or not pending:
+        Exercise.objects.bulk_create(exercises, batch_size=500)
+        return
+    hashes = {exercise.content_hash for exercise in pending}
+    known = set(Exercise.objects.filter(content_hash__in=hashes).values_list('exercise_id', flat=True))
+    Exercise.objects.bulk_create(exercises, batch_size=500)
+    known.update(exercise.exercise_id for exercise in exercises if exercise.exercise_id is not None)
+    new_ids = {}
+    for pk, content_hash in (
+        Exercise.objects.filter(content_hash__in=hashes).order_by('exercise_id').values_list('exercise_id', 'content_hash')
+    ):
+        if pk not in known:
+            new_ids.setdefault(content_hash, []).append(pk)
+    new_ids = {content_hash: iter(pks) for content_hash, pks in new_ids.items()}
+    for exercise in pending:
+        exercise.exercise_id = next(new_ids[exercise.content_hash])
+
+
 class ExerciseWriteSerializer(serializers.ModelSerializer):
     category = serializers.CharField()
-    major = serializers.CharField(allow_null=True)
-    chapter = serializers.CharField(allow_null=True)
-    examgroup = serializers.CharField(allow_null=True)
-    source = serializers.CharField(allow_null=True)
+    # 层级与来源可以省略（旧导出格式常缺少 examgroup），与传 null 相同
+    major = serializers.CharField(allow_null=True, required=False)
+    chapter = serializers.CharField(allow_null=True, required=False)
+    examgroup = serializers.CharField(allow_null=True, required=False)
+    source = serializers.CharField(allow_null=True, required=False)
     type = serializers.CharField()
     stem = serializers.CharField(allow_null=True)
-    questions = QuestionSerializer(many=True, required=False)
+    questions = QuestionWriteSerializer(many=True, required=False)
     answer = ExerciseAnswerSerializer(many=True, required=False)
     analysis = ExerciseAnalysisSerializer(many=True, required=False)
     exercise_from = ExerciseFromSerializer(required=False, allow_null=True)
@@ -266,11 +404,6 @@ class ExerciseWriteSerializer(serializers.ModelSerializer):
             'level', 'score', 'stem', 'questions', 'answer', 'analysis', 'exercise_from', 'image_links'
         ]
 
-    def to_internal_value(self, data):
-        # Log raw input data for debugging
-        # logger.debug(f"Raw input data: {data}")
-        return super().to_internal_value(data)
-
     def validate(self, data):
         # logger.debug(f'Validated data: {data}')
         errors = {}
@@ -285,149 +418,146 @@ class ExerciseWriteSerializer(serializers.ModelSerializer):
         # if not data.get('stem') and not data.get('questions'):
         #     errors['stem'] = "Either stem or questions must be provided."
 
-        # Validate exercise_id if provided
-        if 'exercise_id' in data and data['exercise_id'] is not None:
-            try:
-                Exercise.objects.get(exercise_id=data['exercise_id'])
-                logger.debug(f"Found exercise ID {data['exercise_id']} for update")
-            except Exercise.DoesNotExist:
-                logger.warning(f"Exercise ID {data['exercise_id']} not found, will create new exercise")
-                # Optional: Raise error instead
-                # errors['exercise_id'] = f"Exercise ID {data['exercise_id']} does not exist"
+        # exercise_id 是否存在在 create 中整批查询（不存在时新建），这里不再逐条查库
 
         if errors:
             raise serializers.ValidationError(errors)
         return data
 
+    ON_DUPLICATE_CHOICES = ('create', 'skip', 'update')
+
+    @staticmethod
+    def content_hash(data, dimensions):
+        """按导入数据计算 fingerprints.content_hash；试卷按写入时的规则解析，结果与写入后按库中数据重算的一致"""
+        exercise_from = data.get('exercise_from') or {}
+        exam = exercise_from.get('exam')
+        if exam is None and exercise_from.get('exam_write'):
+            exam = dict(exercise_from['exam_write'])
+            if not exam.get('from_school') and exam.get('school_write'):
+                exam['from_school'] = exam['school_write']['name']
+        elif exam is None:
+            exam = dimensions.exam_for(exercise_from, dimensions.taxonomy(data)['category'])
+        questions = [(q.get('question_order'), q.get('question_stem', '')) for q in data.get('questions') or []]
+        return fingerprints.content_hash(data.get('stem'), fingerprints.ordered_question_stems(questions), exam)
+
+    def resolve_duplicates(self, data_list, existing):
+        """
+        context['on_duplicate']：create（默认）照常新建；skip 跳过库中或本批前面已有相同内容的题目；
+        update 改为覆盖库中内容相同的题目（本批内重复的以最后一条为准）。
+        带已存在 exercise_id 的数据始终按 id 更新，不参与查重。整批哈希一次索引查询。
+        """
+        on_duplicate = self.context.get('on_duplicate', 'create')
+        self.duplicate_stats = {'skipped': 0, 'updated': 0}
+        if on_duplicate == 'create':
+            return data_list
+
+        fresh = [i for i, data in enumerate(data_list) if data.get('exercise_id') not in existing]
+        matches = {}
+        for exercise in Exercise.objects.filter(
+            content_hash__in={data_list[i]['content_hash'] for i in fresh}
+        ).order_by('exercise_id'):
+            matches.setdefault(exercise.content_hash, exercise)
+
+        groups = {}
+        for i in fresh:
+            groups.setdefault(data_list[i]['content_hash'], []).append(i)
+        keep = set(range(len(data_list))) - set(fresh)
+        for content_hash, indexes in groups.items():
+            match = matches.get(content_hash)
+            if on_duplicate == 'skip':
+                if match is None:
+                    keep.add(indexes[0])
+                continue
+            keep.add(indexes[-1])
+            if match is not None:
+                data_list[indexes[-1]]['exercise_id'] = match.exercise_id
+                existing[match.exercise_id] = match
+                self.duplicate_stats['updated'] += 1
+
+        self.duplicate_stats['skipped'] = len(data_list) - len(keep)
+        if self.duplicate_stats['skipped'] or self.duplicate_stats['updated']:
+            logger.info(f"Duplicate exercises (on_duplicate={on_duplicate}): {self.duplicate_stats}")
+        return [data for i, data in enumerate(data_list) if i in keep]
+
     def create(self, validated_data):
         data_list = validated_data if isinstance(validated_data, list) else [validated_data]
         logger.debug(f"Calling create with {len(data_list)} items")
 
         with transaction.atomic():
-            # 预加载外键对象
-            # categories = {c.category_name: c for c in Category.objects.all()}
-            # majors = {m.major_name: m for m in Major.objects.all()}
-            # chapters = {c.chapter_name: c for c in Chapter.objects.all()}
-            # exam_groups = {e.examgroup_name: e for e in ExamGroup.objects.all()}
-            # sources = {s.source_name: s for s in Source.objects.all()}
-            # exercise_types = {t.type_name: t for t in ExerciseType.objects.all()}
-            # schools = {s.name: s for s in School.objects.all()}
+            # 预先解析整批数据用到的全部维度：每张表一次查询 + 缺失行 bulk_create
+            dimensions = DimensionResolver(data_list)
 
             # 分离更新和创建
             updates = []
             creations = []
             exercise_id_to_data = {}
+            existing = Exercise.objects.in_bulk(
+                [data['exercise_id'] for data in data_list if data.get('exercise_id') is not None]
+            )
+            for data in data_list:
+                data['content_hash'] = self.content_hash(data, dimensions)
+            data_list = self.resolve_duplicates(data_list, existing)
+            keep_ids = self.context.get('keep_ids', False)
             for data in data_list:
                 exercise_id = data.pop('exercise_id', None)
                 exercise_id_to_data[exercise_id] = data
                 if exercise_id is not None:
-                    try:
-                        exercise = Exercise.objects.get(exercise_id=exercise_id)
-                        updates.append((exercise, data))
-                    except Exercise.DoesNotExist:
+                    if exercise_id in existing:
+                        updates.append((existing[exercise_id], data))
+                    elif keep_ids:
+                        creations.append((exercise_id, data))
+                    else:
+                        logger.warning(f"Exercise ID {exercise_id} not found, will create new exercise")
                         creations.append((exercise_id, data))
                 else:
                     creations.append((None, data))
-
-            # 处理创建
+            if keep_ids:
+                # 沿用 exercise_id 时，同一批里重复的 id 以最后一条为准（与按 id 更新的结果一致）
+                last = {exercise_id: data for exercise_id, data in creations if exercise_id is not None}
+                creations = [
+                    (exercise_id, data) for exercise_id, data in creations
+                    if exercise_id is None or last[exercise_id] is data
+                ]
+
+            # 处理创建：外部提供的 exercise_id 默认忽略，由数据库自动生成；context['keep_ids'] 时沿用
             created_exercises = []
-            for _ignored_id, data in creations:
-                try:
-                    # 外部提供的 exercise_id 一律忽略，由数据库自动生成
-                    category_name = data.pop('category')
-                    category, _ = Category.objects.get_or_create(category_name=category_name)
-
-                    major_name = data.pop('major', None)
-                    major = None
-                    if major_name:
-                        major, _ = Major.objects.get_or_create(major_name=major_name, category=category)
-
-                    chapter_name = data.pop('chapter', None)
-                    chapter = None
-                    if chapter_name and major:
-                        chapter, _ = Chapter.objects.get_or_create(chapter_name=chapter_name, major=major)
-
-                    examgroup_name = data.pop('examgroup', None)
-                    exam_group = None
-                    if examgroup_name and chapter:
-                        exam_group, _ = ExamGroup.objects.get_or_create(examgroup_name=examgroup_name, chapter=chapter)
-
-                    source_name = data.pop('source', None)
-                    source = None
-                    if source_name:
-                        source, _ = Source.objects.get_or_create(source_name=source_name)
-
-                    type_name = data.pop('type')
-                    exercise_type, _ = ExerciseType.objects.get_or_create(type_name=type_name)
-
-                    exercise_data = {
-                        'category': category,
-                        'major': major,
-                        'chapter': chapter,
-                        'exam_group': exam_group,
-                        'source': source,
-                        'exercise_type': exercise_type,
-                        'level': data.pop('level', None),
-                        'score': data.pop('score', None),
-                    }
-
-                    # 直接创建，让数据库生成自增主键
-                    exercise = Exercise.objects.create(**exercise_data)
-                    created_exercises.append(exercise)
-
-                    # 保存映射，后续处理关联对象
-                    exercise_id_to_data[exercise.exercise_id] = data
-                except Exception as e:
-                    logger.error(f"Failed to create exercise: {str(e)}")
-                    continue
-
-            # 处理更新
+            created_data = []
+            for exercise_id, data in creations:
+                exercise_data = dimensions.taxonomy(data)
+                if keep_ids and exercise_id is not None:
+                    exercise_data['exercise_id'] = exercise_id
+                for field in ('category', 'major', 'chapter', 'examgroup', 'source', 'type'):
+                    data.pop(field, None)
+                exercise_data['level'] = data.pop('level', 1)  # 与模型默认值一致
+                exercise_data['score'] = data.pop('score', None)
+                exercise_data['content_hash'] = data.pop('content_hash')
+                created_exercises.append(Exercise(**exercise_data))
+                created_data.append(data)
+            _bulk_create_exercises(created_exercises)
+            # 保存映射，后续处理关联对象
+            for exercise, data in zip(created_exercises, created_data):
+                exercise_id_to_data[exercise.exercise_id] = data
+
+            # 处理更新：属性一次 bulk_update，旧的关联行按表一次删除
             updated_exercises = []
             for exercise, data in updates:
-                try:
-                    logger.debug(f"Updating exercise ID {exercise.exercise_id}")
-                    category_name = data.pop('category')
-                    category, _ = Category.objects.get_or_create(category_name=category_name)
-                    major_name = data.pop('major', None)
-                    major = None
-                    if major_name:
-                        major, _ = Major.objects.get_or_create(major_name=major_name, category=category)
-                    chapter_name = data.pop('chapter', None)
-                    chapter = None
-                    if chapter_name and major:
-                        chapter, _ = Chapter.objects.get_or_create(chapter_name=chapter_name, major=major)
-                    examgroup_name = data.pop('examgroup', None)
-                    exam_group = None
-                    if examgroup_name and chapter:
-                        exam_group, _ = ExamGroup.objects.get_or_create(examgroup_name=examgroup_name, chapter=chapter)
-                    source_name = data.pop('source', None)
-                    source = None
-                    if source_name:
-                        source, _ = Source.objects.get_or_create(source_name=source_name)
-                    type_name = data.pop('type')
-                    exercise_type, _ = ExerciseType.objects.get_or_create(type_name=type_name)
-
-                    exercise.category = category
-                    exercise.major = major
-                    exercise.chapter = chapter
-                    exercise.exam_group = exam_group
-                    exercise.source = source
-                    exercise.exercise_type = exercise_type
-                    exercise.level = data.pop('level', None)
-                    exercise.score = data.pop('score', None)
-                    exercise.save()
-
-                    ExerciseStem.objects.filter(exercise=exercise).delete()
-                    Question.objects.filter(exercise=exercise).delete()
-                    ExerciseAnswer.objects.filter(exercise=exercise).delete()
-                    ExerciseAnalysis.objects.filter(exercise=exercise).delete()
-                    ExerciseFrom.objects.filter(exercise=exercise).delete()
-                    ExerciseImage.objects.filter(exercise=exercise).delete()
-
-                    updated_exercises.append(exercise)
-                except Exception as e:
-                    logger.error(f"Failed to update exercise_id={exercise.exercise_id}: {str(e)}")
-                    continue
+                logger.debug(f"Updating exercise ID {exercise.exercise_id}")
+                for field, value in dimensions.taxonomy(data).items():
+                    setattr(exercise, field, value)
+                for field in ('category', 'major', 'chapter', 'examgroup', 'source', 'type'):
+                    data.pop(field, None)
+                exercise.level = data.pop('level', exercise.level)
+                exercise.score = data.pop('score', None)
+                exercise.content_hash = data.pop('content_hash')
+                updated_exercises.append(exercise)
+            if updated_exercises:
+                Exercise.objects.bulk_update(
+                    updated_exercises,
+                    ['category', 'major', 'chapter', 'exam_group', 'source', 'exercise_type', 'level', 'score', 'content_hash'],
+                    batch_size=500,
+                )
+                for model in (ExerciseStem, Question, ExerciseAnswer, ExerciseAnalysis, ExerciseFrom, ExerciseImage):
+                    model.objects.filter(exercise__in=updated_exercises).delete()
 
             all_exercises = created_exercises + updated_exercises
             all_data = [exercise_id_to_data.get(ex.exercise_id, {}) for ex in all_exercises]
@@ -442,6 +572,7 @@ class ExerciseWriteSerializer(serializers.ModelSerializer):
             analyses_to_create = []
             exercise_froms_to_create = []
             images_to_create = []
+            exercise_from_serializer = ExerciseFromSerializer(context={'dimensions': dimensions})
 
             for exercise, data in zip(all_exercises, all_data):
                 logger.debug(f"Processing related objects for exercise_id={exercise.exercise_id}")
@@ -456,30 +587,26 @@ class ExerciseWriteSerializer(serializers.ModelSerializer):
                     stems_to_create.append(ExerciseStem(exercise=exercise, stem_content=stem_content))
 
                 if questions_data:
-                    question_serializer = QuestionSerializer(data=questions_data, many=True)
-                    if question_serializer.is_valid():
-                        validated_questions = question_serializer.validated_data
-                        seen_orders = set()
-                        for q in validated_questions:
-                            q_order = q.get('question_order')
-                            if q_order is not None:
-                                if q_order in seen_orders:
-                                    logger.warning(
-                                        f"Duplicate question_order {q_order} for exercise_id={exercise.exercise_id}"
-                                    )
-                                    continue
-                                seen_orders.add(q_order)
-                            questions_to_create.append(
-                                Question(
-                                    exercise=exercise,
-                                    question_order=q.get('question_order'),
-                                    question_stem=q.get('question_stem', ''),
-                                    question_answer=q.get('question_answer', ''),
-                                    question_analysis=q.get('question_analysis')
+                    # questions 已在整批校验时校验过，直接使用
+                    seen_orders = set()
+                    for q in questions_data:
+                        q_order = q.get('question_order')
+                        if q_order is not None:
+                            if q_order in seen_orders:
+                                logger.warning(
+                                    f"Duplicate question_order {q_order} for exercise_id={exercise.exercise_id}"
                                 )
+                                continue
+                            seen_orders.add(q_order)
+                        questions_to_create.append(
+                            Question(
+                                exercise=exercise,
+                                question_order=q.get('question_order'),
+                                question_stem=q.get('question_stem', ''),
+                                question_answer=q.get('question_answer', ''),
+                                question_analysis=q.get('question_analysis')
                             )
-                    else:
-                        logger.error(f"Question validation errors for exercise_id={exercise.exercise_id}: {question_serializer.errors}")
+                        )
 
                 if answers_data:
                     answers_to_create.extend([ExerciseAnswer(exercise=exercise, **a) for a in answers_data])
@@ -488,18 +615,10 @@ class ExerciseWriteSerializer(serializers.ModelSerializer):
 
                 if exercise_from_data:
                     logger.debug(f"ExerciseFrom data for exercise_id={exercise.exercise_id}: {exercise_from_data}")
-                    exercise_from_serializer = ExerciseFromSerializer(data=exercise_from_data)
-                    if exercise_from_serializer.is_valid():
-                        validated_from_data = exercise_from_serializer.validated_data
-                        validated_from_data['exercise'] = exercise
-                        exercise_from = exercise_from_serializer.create(validated_from_data)
-                        if not exercise_from.exercise:
-                            logger.error(f"ExerciseFrom missing exercise for exercise_id={exercise.exercise_id}")
-                            exercise_from.exercise = exercise
-                        exercise_froms_to_create.append(exercise_from)
-                        logger.info(f"Created ExerciseFrom for exercise_id={exercise.exercise_id}, exam_id={exercise_from.exam.exam_id if exercise_from.exam else 'None'}")
-                    else:
-                        logger.error(f"ExerciseFrom validation errors for exercise_id={exercise.exercise_id}: {exercise_from_serializer.errors}")
+                    # exercise_from 同样已校验过，只需解析试卷并构造对象
+                    exercise_from = exercise_from_serializer.create({**exercise_from_data, 'exercise': exercise})
+                    exercise_froms_to_create.append(exercise_from)
+                    logger.info(f"Created ExerciseFrom for exercise_id={exercise.exercise_id}, exam_id={exercise_from.exam.exam_id if exercise_from.exam else 'None'}")
 
                 if image_links_data:
                     images_to_create.extend([ExerciseImage(exercise=exercise, **img) for img in image_links_data])
@@ -523,18 +642,21 @@ class ExerciseWriteSerializer(serializers.ModelSerializer):
             if images_to_create:
                 ExerciseImage.objects.bulk_create(images_to_create, batch_size=100)
 
+            # 回填 stem/answer/analysis/exercise_from 外键：直接用内存里刚创建的对象，
+            # 与原来逐题 first()/last() 查询的结果一致（题干、来源取第一条，答案、解析取最后一条），
+            # 最后一次 bulk_update 写回
+            pointers = {
+                'stem': _back_pointers(ExerciseStem, stems_to_create, last=False),
+                'answer': _back_pointers(ExerciseAnswer, answers_to_create, last=True),
+                'analysis': _back_pointers(ExerciseAnalysis, analyses_to_create, last=True),
+                'exercise_from': _back_pointers(ExerciseFrom, exercise_froms_to_create, last=False),
+            }
             for exercise in all_exercises:
-                stem = ExerciseStem.objects.filter(exercise=exercise).first()
-                answer = ExerciseAnswer.objects.filter(exercise=exercise).last()
-                analysis = ExerciseAnalysis.objects.filter(exercise=exercise).last()
-                exercise_from = ExerciseFrom.objects.filter(exercise=exercise).first()
-
-                exercise.stem = stem
-                exercise.answer = answer
-                exercise.analysis = analysis
-                exercise.exercise_from = exercise_from
-                exercise.save(update_fields=['stem', 'answer', 'analysis', 'exercise_from'])
-                exercise.refresh_from_db()
+                for field, mapping in pointers.items():
+                    setattr(exercise, f'{field}_id', mapping.get(exercise.exercise_id))
+            Exercise.objects.bulk_update(all_exercises, [f'{field}_id' for field in pointers], batch_size=500)
+
+            sync.exercises_changed([exercise.exercise_id for exercise in all_exercises])
 
             logger.info(f"Processed {len(all_exercises)} exercises: {len(created_exercises)} created, {len(updated_exercises)} updated")
             return all_exercises
@@ -542,10 +664,29 @@ class ExerciseWriteSerializer(serializers.ModelSerializer):
 class BulkExerciseSerializer(serializers.ListSerializer):
     child = ExerciseWriteSerializer()
 
+    def to_internal_value(self, data):
+        # JSON 列表走编译后的整批校验（validation.BatchValidator），表单数据、partial 等情况仍走 DRF
+        if (
+            not getattr(settings, 'IMPORT_COMPILED_VALIDATION', True) or not isinstance(data, list) or self.partial
+            or not self.allow_empty or self.max_length is not None or self.min_length is not None
+        ):
+            return super().to_internal_value(data)
+        validated, errors = BatchValidator(self.child).validate(data)
+        if errors:
+            if not api_settings.LIST_SERIALIZER_ERRORS_AS_DICT:
+                errors = [errors.get(index, {}) for index in range(len(data))]
+            raise serializers.ValidationError(errors)
+        return validated
+
     def create(self, validated_data_list):
         logger.debug(f"Calling BulkExerciseSerializer.create with {len(validated_data_list)} items")
         return self.child.create(validated_data_list)
 
+    @property
+    def duplicate_stats(self):
+        """save() 后按 on_duplicate 跳过/覆盖的条数"""
+        return getattr(self.child, 'duplicate_stats', {'skipped': 0, 'updated': 0})
+
 
 
 
@@ -657,4 +798,29 @@ class UserActionLogSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = UserActionLog
-        fields = ['id', 'user', 'user_id', 'action_type', 'model_name', 'object_id', 'details', 'timestamp', 'ip_address']
\ No newline at end of file
+        fields = ['id', 'user', 'user_id', 'action_type', 'model_name', 'object_id', 'details', 'timestamp', 'ip_address']
+
+
+# 后台导入任务序列化器
+class ImportJobSerializer(serializers.ModelSerializer):
+    user = serializers.SlugRelatedField(slug_field='username', read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'job_id', 'user', 'filename', 'status', 'rows_parsed', 'rows_validated', 'rows_written', 'rows_failed',
+            'rows_skipped', 'on_duplicate', 'errors', 'message', 'created_at', 'started_at', 'finished_at',
+            'updated_at'
+        ]
+
+
+# 后台导出任务序列化器
+class ExportJobSerializer(serializers.ModelSerializer):
+    user = serializers.SlugRelatedField(slug_field='username', read_only=True)
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'job_id', 'user', 'category', 'ndjson', 'gzip', 'status', 'rows_total', 'rows_written', 'file_size',
+            'message', 'created_at', 'started_at', 'finished_at', 'updated_at'
+        ]
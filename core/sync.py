@@ -0,0 +1,109 @@
+# core/sync.py
+"""
+题目写入后的派生数据同步入口。
+所有写路径（单条 PUT/POST、批量更新、批量创建/导入、管理命令）统一调用这里，
+新增的派生表/缓存只需在此处挂接。
+"""
+import logging
+
+from django.db import transaction
+
+from . import counting, export_cache, fingerprints, list_cache, read_model, search, taxonomy
+from .models import Exercise, ExerciseAnswerFingerprint, ExerciseReadModel, ExerciseSearchTerm
+
+logger = logging.getLogger(__name__)
+
+
+def exercises_changed(exercise_ids, content=True):
+    """题目新增或修改后调用；content=False 表示只改了层级/难度/分值等属性，不涉及文本"""
+    exercise_ids = [int(i) for i in exercise_ids]
+    if not exercise_ids:
+        return
+    if content:
+        search.reindex_exercises(exercise_ids)
+        fingerprints.refresh_exercises(exercise_ids)
+        fingerprints.refresh_content_hashes(exercise_ids)
+    # 读模型里旧的分类（题目可能被移到别的分类）+ 刷新后的新分类
+    category_ids = _category_ids(exercise_ids)
+    read_model.refresh_exercises(exercise_ids)
+    category_ids |= _category_ids(exercise_ids)
+    _after_commit(list_cache.bump, category_ids)
+    _after_commit(export_cache.invalidate, category_ids)
+    _bump_counts(Exercise, ExerciseReadModel, ExerciseSearchTerm, ExerciseAnswerFingerprint)
+    logger.debug(f"Synced derived data for {len(exercise_ids)} exercises (content={content})")
+
+
+def exercises_deleted(category_ids):
+    """题目删除后调用；读模型/索引行随外键级联删除，这里只需失效缓存"""
+    _after_commit(list_cache.bump, set(category_ids))
+    _after_commit(export_cache.invalidate, set(category_ids))
+    _bump_counts(Exercise, ExerciseReadModel)
+
+
+def dimension_created(dimension):
+    """新增层级节点，只影响层级树"""
+    _after_commit(taxonomy.bump_version)
+
+
+def dimension_changed(dimension, pk, name):
+    """Category/Major/Chapter/ExamGroup 等改名"""
+    read_model.rename_dimension(dimension, pk, name)
+    _bump_counts(ExerciseReadModel)
+    _after_commit(list_cache.bump_epoch)
+    _after_commit(export_cache.invalidate)
+    _after_commit(taxonomy.bump_version)
+
+
+def dimension_deleted(dimension, pk):
+    read_model.clear_dimension(dimension, pk)
+    _bump_counts(ExerciseReadModel)
+    _after_commit(list_cache.bump_epoch)
+    _after_commit(export_cache.invalidate)
+    _after_commit(taxonomy.bump_version)
+
+
+def exam_changed(exam):
+    read_model.refresh_exam(exam)
+    fingerprints.refresh_exam_content_hashes(exam.pk)
+    _bump_counts(ExerciseReadModel)
+    _after_commit(list_cache.bump_epoch)
+    _after_commit(export_cache.invalidate)
+
+
+def exam_deleted(exam_id):
+    read_model.clear_exam(exam_id)
+    _bump_counts(ExerciseReadModel)
+    _after_commit(list_cache.bump_epoch)
+    _after_commit(export_cache.invalidate)
+
+
+def school_changed(school):
+    """学校改名；读模型只冗余 school_id，from_school 是试卷自己的字段，这里只让缓存的列表/导出重新生成"""
+    _after_commit(list_cache.bump_epoch)
+    _after_commit(export_cache.invalidate)
+
+
+def school_deleted(school_id):
+    read_model.clear_school(school_id)
+    _bump_counts(ExerciseReadModel)
+    _after_commit(list_cache.bump_epoch)
+    _after_commit(export_cache.invalidate)
+
+
+def _category_ids(exercise_ids):
+    return set(
+        ExerciseReadModel.objects.filter(exercise_id__in=exercise_ids)
+        .values_list('category_id', flat=True).distinct()
+    )
+
+
+def _after_commit(func, *args):
+    # 缓存失效放到事务提交之后，避免其他请求在提交前把旧数据重新写回缓存
+    transaction.on_commit(lambda: func(*args))
+
+
+def _bump_counts(*models):
+    # 批量写不触发 post_save，这里显式让计数缓存失效；提交前后各一次，
+    # 避免其他请求在提交前按旧数据重新缓存计数
+    counting.bump_models(*models)
+    _after_commit(counting.bump_models, *models)
@@ -1,26 +1,15 @@
 # tasks.py
 from celery import shared_task
-from core.models import Exercise, Category
-import json
-from django.core.serializers.json import DjangoJSONEncoder
-import os
+from core import exporting, importing
+
 
 @shared_task
-def export_exercises_by_category(category_id, user_id):
-    category = Category.objects.get(category_id=category_id)
-    exercises = Exercise.objects.filter(category=category).select_related(
-        'exercise_type', 'category', 'major', 'chapter', 'exam_group', 'source', 'stem', 'answer', 'analysis', 'exercise_from'
-    ).prefetch_related('questions', 'answers', 'analyses', 'exercise_from__exam', 'exerciseimage_set')
+def export_exercises_by_category(job_id):
+    """后台分类导出任务（EXPORT_JOB_MODE = 'celery' 时由 exporting.submit_job 投递）"""
+    exporting.run_job(job_id)
 
-    export_data = []
-    for exercise in exercises:
-        exercise_data = {
-            # 同上，省略具体字段
-        }
-        export_data.append(exercise_data)
 
-    filename = f"media/exports/exercises_category_{category_id}.json"
-    os.makedirs(os.path.dirname(filename), exist_ok=True)
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(export_data, f, ensure_ascii=False, cls=DjangoJSONEncoder)
-    return filename
\ No newline at end of file
+@shared_task
+def run_import_job(job_id):
+    """后台导入任务（IMPORT_JOB_MODE = 'celery' 时由 importing.submit_job 投递）"""
+    importing.run_job(job_id)
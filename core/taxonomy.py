@@ -0,0 +1,108 @@
+# core/taxonomy.py
+"""
+Category → Major → Chapter → ExamGroup 整棵层级树。
+固定 4 条查询取出四层（带题目数量时再加 1 条分组统计），在内存里拼树；
+结果缓存在进程内（按最近使用保留 MAX_CACHED_TREES 棵），版本号放在共享的 Django 缓存中，
+任一进程的 crud 写入递增版本号即可让所有进程失效；缓存不是进程间共享的（见 list_cache.is_shared）时不做进程内缓存。
+"""
+import threading
+from collections import OrderedDict, defaultdict
+
+from django.db.models import Count
+
+from . import list_cache
+from .models import Category, Chapter, ExamGroup, ExerciseReadModel, Major
+
+MAX_CACHED_TREES = 256
+
+_tree_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def bump_version():
+    list_cache.bump_generation('taxonomy')
+
+
+def clear_local_cache():
+    with _lock:
+        _tree_cache.clear()
+
+
+def _exercise_counts(category_id):
+    """一条分组查询得到每个节点的题目数"""
+    rows = ExerciseReadModel.objects.all()
+    if category_id is not None:
+        rows = rows.filter(category_id=category_id)
+    counts = {level: defaultdict(int) for level in ('category', 'major', 'chapter', 'exam_group')}
+    grouped = rows.values('category_id', 'major_id', 'chapter_id', 'exam_group_id').annotate(total=Count('exercise_id'))
+    for row in grouped:
+        for level in counts:
+            if row[f'{level}_id'] is not None:
+                counts[level][row[f'{level}_id']] += row['total']
+    return counts
+
+
+def build_tree(category_id=None, with_counts=False):
+    categories = Category.objects.order_by('category_id')
+    majors = Major.objects.order_by('major_id')
+    chapters = Chapter.objects.order_by('chapter_id')
+    exam_groups = ExamGroup.objects.order_by('examgroup_id')
+    if category_id is not None:
+        categories = categories.filter(category_id=category_id)
+        majors = majors.filter(category_id=category_id)
+        chapters = chapters.filter(major__category_id=category_id)
+        exam_groups = exam_groups.filter(chapter__major__category_id=category_id)
+
+    counts = _exercise_counts(category_id) if with_counts else None
+
+    def node(level, pk, fields):
+        if counts is not None:
+            fields['exercise_count'] = counts[level].get(pk, 0)
+        return fields
+
+    groups_by_chapter = defaultdict(list)
+    for pk, name, chapter_pk in exam_groups.values_list('examgroup_id', 'examgroup_name', 'chapter_id'):
+        groups_by_chapter[chapter_pk].append(node('exam_group', pk, {'examgroup_id': pk, 'examgroup_name': name}))
+
+    chapters_by_major = defaultdict(list)
+    for pk, name, major_pk in chapters.values_list('chapter_id', 'chapter_name', 'major_id'):
+        chapters_by_major[major_pk].append(node('chapter', pk, {
+            'chapter_id': pk, 'chapter_name': name, 'examgroups': groups_by_chapter[pk],
+        }))
+
+    majors_by_category = defaultdict(list)
+    for pk, name, category_pk in majors.values_list('major_id', 'major_name', 'category_id'):
+        majors_by_category[category_pk].append(node('major', pk, {
+            'major_id': pk, 'major_name': name, 'chapters': chapters_by_major[pk],
+        }))
+
+    return [
+        node('category', pk, {'category_id': pk, 'category_name': name, 'majors': majors_by_category[pk]})
+        for pk, name in categories.values_list('category_id', 'category_name')
+    ]
+
+
+def get_tree(category_id=None, with_counts=False):
+    """带版本校验的进程内缓存；带数量的树还依赖题目写入代数"""
+    if not list_cache.is_shared():
+        return build_tree(category_id, with_counts)
+    version = (list_cache.get_generation('taxonomy'), list_cache.get_generation('epoch'), list_cache.get_generation('all') if with_counts else 0)
+    if None in version:
+        # 缓存后端不可用，无法确认缓存的树是否最新
+        return build_tree(category_id, with_counts)
+    cache_key = (category_id, with_counts)
+    with _lock:
+        cached = _tree_cache.get(cache_key)
+        if cached is not None and cached[0] == version:
+            _tree_cache.move_to_end(cache_key)
+            return cached[1]
+    tree = build_tree(category_id, with_counts)
+    if not tree:
+        # 不存在的分类不缓存，避免任意 category_id 撑大缓存
+        return tree
+    with _lock:
+        _tree_cache[cache_key] = (version, tree)
+        _tree_cache.move_to_end(cache_key)
+        while len(_tree_cache) > MAX_CACHED_TREES:
+            _tree_cache.popitem(last=False)
+    return tree
@@ -0,0 +1,35 @@
+# core/testing.py
+"""测试辅助：为接口设置 SQL 条数上限，N+1 回归会直接让测试失败"""
+from contextlib import contextmanager
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+
+    @contextmanager
+    def assertMaxQueries(self, limit, using='default'):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > limit:
+            queries = '\n'.join(f"{i}. {q['sql']}" for i, q in enumerate(context.captured_queries, start=1))
+            self.fail(f"{executed} queries executed, budget is {limit}:\n{queries}")
+
+
+def sample_exercises(count, offset=0):
+    """生成导入用的题目数据（含小题、多个答案、解析、来源、图片），供导入测试和 benchmark_import 使用"""
+    return [{
+        'category': f'分类{i % 2}', 'major': f'专业{i % 3}', 'chapter': '第一章', 'examgroup': '题组',
+        'source': '真题', 'type': '选择题', 'level': 1 + i % 5, 'score': 5,
+        'stem': f'题干 {offset + i}：已知函数 f(x) = x^2 + {i}',
+        'questions': [{'question_order': 1, 'question_stem': '小题一', 'question_answer': 'A'}],
+        'answer': [
+            {'answer_content': f'答案 {i}', 'answer_order': 1},
+            {'answer_content': f'备选答案 {i}', 'answer_order': 2},
+        ],
+        'analysis': [{'analysis_content': f'解析 {i}'}],
+        'exercise_from': {'from_school': f'学校{i % 2}', 'exam_time': '2023', 'exercise_number': i + 1},
+        'image_links': [{'image_link': f'https://img.example.com/{offset + i}.png', 'source_type': 'stem'}],
+    } for i in range(count)]
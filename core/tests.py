@@ -1,7 +1,35 @@
-from django.test import TestCase
+import copy
+import csv
+import gzip
+import json
+import os
+import tempfile
+import unittest
+import zipfile
+from datetime import timedelta
+from io import BytesIO, StringIO, TextIOWrapper
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
-from core.models import Category, Major, Chapter, ExamGroup
+from core.models import (
+    Category, Major, Chapter, ExamGroup, Exercise, ExerciseStem, ExerciseAnalysis, ExerciseFrom, Exam, Question,
+    ExerciseReadModel, ExerciseAnswer, ExerciseImage, User, ImportCheckpoint, ImportJob, School, Source, ExerciseType,
+    ExportJob
+)
+from core import columnar, counting, export_cache, exporting, fetch_plans, fingerprints, importing, list_cache, search, sync, taxonomy
+from core.serializers import BulkExerciseSerializer, ExerciseSerializer
+from core.management.commands import import_exercises
+from core.middleware import fingerprint, query_stats
+from core.pagination import KeysetPagination
+from core.testing import QueryBudgetMixin, sample_exercises
 
 class CategoryCRUDTestCase(TestCase):
     def setUp(self):
@@ -127,4 +155,1630 @@ class ExamGroupCRUDTestCase(TestCase):
         examgroup = ExamGroup.objects.create(examgroup_name='Midterm Exam', chapter=self.chapter)
         response = self.client.delete(f'/api/crud/examgroups/{examgroup.examgroup_id}/')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(ExamGroup.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(ExamGroup.objects.count(), 0)
+
+class ExerciseCursorPaginationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(category_name='Mathematics')
+        for i in range(7):
+            Exercise.objects.create(category=self.category, level=(i % 3) + 1, score=None if i % 2 else i)
+        sync.exercises_changed(Exercise.objects.values_list('exercise_id', flat=True))
+
+    def collect(self, order_by):
+        ids = []
+        response = self.client.get('/api/exercises/', {'pagination': 'cursor', 'page_size': 3, 'order_by': order_by})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(row['exercise_id'] for row in response.data['results'])
+            if not response.data['next_cursor']:
+                return ids
+            response = self.client.get('/api/exercises/', {
+                'cursor': response.data['next_cursor'], 'page_size': 3, 'order_by': order_by
+            })
+
+    def test_cursor_walks_every_order_by(self):
+        for order_by in ['id', 'level', 'score', 'exam.exercise_number']:
+            ids = self.collect(order_by)
+            self.assertEqual(len(ids), 7)
+            self.assertEqual(sorted(ids), sorted(Exercise.objects.values_list('exercise_id', flat=True)))
+
+    def test_cursor_order_matches_field(self):
+        ids = self.collect('score')
+        scores = [Exercise.objects.get(exercise_id=i).score for i in ids]
+        self.assertEqual(scores[:3], [None, None, None])
+        self.assertEqual(scores[3:], sorted(scores[3:]))
+
+    def test_include_total(self):
+        response = self.client.get('/api/exercises/', {'pagination': 'cursor', 'include_total': 'true'})
+        self.assertEqual(response.data['count'], 7)
+
+    def test_cursor_for_other_order_rejected(self):
+        response = self.client.get('/api/exercises/', {'pagination': 'cursor', 'page_size': 3})
+        response = self.client.get('/api/exercises/', {'cursor': response.data['next_cursor'], 'order_by': 'level'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_mistyped_cursor_rejected(self):
+        paginator = KeysetPagination()
+        cursors = [
+            ('id', {'a': 1}, 'x'), ('level', {'a': 1}, 1), ('level', [1], 1), ('level', 1, True),
+            ('level', 'x', 1), ('score', 'x', 1),
+        ]
+        for order_by, value, pk in cursors:
+            cursor = paginator.encode_cursor(order_by, value, pk)
+            response = self.client.get('/api/exercises/', {'cursor': cursor, 'order_by': order_by})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, (order_by, value, pk))
+            self.assertEqual(response.data['cursor'], 'Invalid cursor')
+
+
+class ExerciseContentSearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(category_name='Mathematics')
+        self.derivative = self.create_exercise('已知函数，求导数')
+        self.integral = self.create_exercise('计算定积分', analysis='利用导数的定义')
+        self.other = self.create_exercise('矩阵的秩')
+        sync.exercises_changed([self.derivative.exercise_id, self.integral.exercise_id, self.other.exercise_id])
+
+    def create_exercise(self, stem, analysis=None):
+        exercise = Exercise.objects.create(category=self.category)
+        exercise.stem = ExerciseStem.objects.create(exercise=exercise, stem_content=stem)
+        if analysis:
+            exercise.analysis = ExerciseAnalysis.objects.create(exercise=exercise, analysis_content=analysis)
+        exercise.save()
+        return exercise
+
+    def search(self, text):
+        response = self.client.get('/api/exercises/', {'search': text, 'search_type': 'content'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['exercise_id'] for row in response.data['results']]
+
+    def test_tokenize_uses_bigrams(self):
+        self.assertEqual(search.tokenize('求导数 ABC'), ['求导', '导数', 'abc'])
+
+    def test_ranked_by_field_weight(self):
+        self.assertEqual(self.search('导数'), [self.derivative.exercise_id, self.integral.exercise_id])
+
+    def test_all_terms_required(self):
+        self.assertEqual(self.search('求导数'), [self.derivative.exercise_id])
+
+    def test_single_character_falls_back_to_icontains(self):
+        self.assertEqual(search.query_terms('导'), [])
+        self.assertEqual(search.query_terms('秩 矩阵'), [])
+        self.assertEqual(sorted(self.search('导')), [self.derivative.exercise_id, self.integral.exercise_id])
+        self.assertEqual(self.search('秩'), [self.other.exercise_id])
+
+    def test_english_prefix_match(self):
+        function = self.create_exercise('Find the derivative of the function')
+        sync.exercises_changed([function.exercise_id])
+        self.assertEqual(self.search('func'), [function.exercise_id])
+        self.assertEqual(self.search('func deriv'), [function.exercise_id])
+        self.assertEqual(self.search('func 导数'), [])
+
+    def test_index_follows_updates(self):
+        self.derivative.stem.stem_content = '矩阵乘法'
+        self.derivative.stem.save()
+        sync.exercises_changed([self.derivative.exercise_id])
+        self.assertEqual(self.search('矩阵'), [self.derivative.exercise_id, self.other.exercise_id])
+        self.assertEqual(self.search('求导'), [])
+
+
+class ExerciseReadModelTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(category_name='Mathematics')
+        self.major = Major.objects.create(major_name='Algebra', category=self.category)
+        self.exam = Exam.objects.create(category=self.category, from_school='清华大学', exam_time='2020', exam_code='601')
+        self.exercise = Exercise.objects.create(category=self.category, major=self.major, level=2)
+        self.exercise.exercise_from = ExerciseFrom.objects.create(exercise=self.exercise, exam=self.exam, exercise_number=3)
+        self.exercise.stem = ExerciseStem.objects.create(exercise=self.exercise, stem_content='求极限')
+        self.exercise.save()
+        Question.objects.create(exercise=self.exercise, question_order=1, question_answer='1')
+        Question.objects.create(exercise=self.exercise, question_order=2, question_answer='2')
+        self.other = Exercise.objects.create(category=self.category)
+        sync.exercises_changed([self.exercise.exercise_id, self.other.exercise_id])
+
+    def test_row_is_flattened(self):
+        row = ExerciseReadModel.objects.get(exercise_id=self.exercise.exercise_id)
+        self.assertEqual(row.category_name, 'Mathematics')
+        self.assertEqual(row.major_name, 'Algebra')
+        self.assertEqual(row.from_school, '清华大学')
+        self.assertEqual(row.exercise_number, 3)
+        self.assertEqual(row.stem_text, '求极限')
+        self.assertEqual(row.question_count, 2)
+
+    def test_list_filters_on_read_model(self):
+        response = self.client.get('/api/exercises/', {'exam_school': '清华'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        result = response.data['results'][0]
+        self.assertEqual(result['exercise_id'], self.exercise.exercise_id)
+        self.assertEqual(result['stem'], '求极限')
+        self.assertEqual(len(result['questions']), 2)
+
+    def test_rename_and_delete_propagate(self):
+        sync.dimension_changed('major', self.major.major_id, 'Linear Algebra')
+        self.assertEqual(ExerciseReadModel.objects.get(exercise_id=self.exercise.exercise_id).major_name, 'Linear Algebra')
+        self.exam.exam_time = '2021'
+        self.exam.save()
+        sync.exam_changed(self.exam)
+        self.assertEqual(self.client.get('/api/exercises/', {'exam_time': '2021'}).data['count'], 1)
+
+    def test_school_delete_propagates(self):
+        school = School.objects.create(name='清华大学')
+        Exam.objects.filter(pk=self.exam.pk).update(school=school)
+        sync.exam_changed(Exam.objects.get(pk=self.exam.pk))
+        self.assertEqual(ExerciseReadModel.objects.filter(school_id=school.pk).count(), 1)
+        self.client.force_authenticate(User.objects.create_superuser(username='admin', password='x'))
+        epoch = list_cache.get_generation('epoch')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/schools/{school.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(ExerciseReadModel.objects.filter(school_id=school.pk).exists())
+        self.assertGreater(list_cache.get_generation('epoch'), epoch)
+
+    def test_delete_exercise_removes_row(self):
+        self.other.delete()
+        self.assertFalse(ExerciseReadModel.objects.filter(exercise_id=self.other.exercise_id).exists())
+
+    def test_rebuild_command(self):
+        ExerciseReadModel.objects.all().delete()
+        call_command('rebuild_read_model', stdout=StringIO())
+        self.assertEqual(ExerciseReadModel.objects.count(), 2)
+
+
+class ExerciseListCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.math = Category.objects.create(category_name='Mathematics')
+        self.physics = Category.objects.create(category_name='Physics')
+        self.exercise = Exercise.objects.create(category=self.math, level=1)
+        Exercise.objects.create(category=self.physics, level=1)
+        sync.exercises_changed(Exercise.objects.values_list('exercise_id', flat=True))
+
+    def get(self, **params):
+        return self.client.get('/api/exercises/', params).data
+
+    def test_hit_and_miss_counted(self):
+        self.get(category_id=self.math.category_id, level=1)
+        self.get(level=1, category_id=self.math.category_id)
+        self.assertEqual(self.client.get('/api/metrics/exercise-list-cache/').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+        stats = self.client.get('/api/metrics/exercise-list-cache/').data
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_write_invalidates_only_its_category(self):
+        math_key = {'category_id': self.math.category_id}
+        physics_key = {'category_id': self.physics.category_id}
+        self.get(**math_key)
+        self.get(**physics_key)
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Exercise.objects.filter(pk=self.exercise.pk).update(level=5)
+            sync.exercises_changed([self.exercise.exercise_id], content=False)
+        self.assertEqual(self.get(**math_key)['results'][0]['level'], 5)
+        self.assertEqual(self.get()['count'], 2)
+        self.get(**physics_key)
+        stats = list_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 5))
+
+    @override_settings(CACHE_SINGLE_PROCESS=False)
+    def test_disabled_on_process_local_cache(self):
+        self.assertFalse(list_cache.is_shared())
+        self.get(level=1)
+        # 不执行提交回调，相当于其他 worker 看不到代数递增
+        Exercise.objects.filter(pk=self.exercise.pk).update(level=5)
+        sync.exercises_changed([self.exercise.exercise_id], content=False)
+        self.assertEqual(self.get(level=1)['count'], 1)
+        self.assertEqual(list_cache.stats()['misses'], 0)
+
+    def test_unreachable_cache_falls_back_to_database(self):
+        broken = mock.Mock(**{f'{name}.side_effect': ConnectionError('cache down') for name in ('get', 'add', 'set', 'incr')})
+        with mock.patch('core.list_cache.get_cache', return_value=broken):
+            self.assertEqual(self.get(category_id=self.math.category_id)['count'], 1)
+            self.assertEqual(self.get()['count'], 2)
+            self.assertEqual(export_cache._version('all'), None)
+        broken.set.assert_not_called()
+
+    def test_delete_invalidates(self):
+        self.assertEqual(self.get(category_id=self.math.category_id)['count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.exercise.delete()
+            sync.exercises_deleted([self.math.category_id])
+        self.assertEqual(self.get(category_id=self.math.category_id)['count'], 0)
+
+
+class TaxonomyTreeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        taxonomy.clear_local_cache()
+        self.client = APIClient()
+        self.category = Category.objects.create(category_name='Mathematics')
+        for m in range(3):
+            major = Major.objects.create(major_name=f'Major {m}', category=self.category)
+            for c in range(3):
+                chapter = Chapter.objects.create(chapter_name=f'Chapter {m}.{c}', major=major)
+                ExamGroup.objects.create(examgroup_name=f'Group {m}.{c}', chapter=chapter)
+        self.chapter = Chapter.objects.first()
+        Exercise.objects.create(category=self.category, major=self.chapter.major, chapter=self.chapter)
+        sync.exercises_changed(Exercise.objects.values_list('exercise_id', flat=True))
+
+    def test_whole_tree_in_constant_queries(self):
+        # 版本号读取走缓存，数据库只有四层各一条 + 统计一条
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/taxonomy-tree/', {'with_counts': 'true'})
+        tree = response.data
+        self.assertEqual(len(tree), 1)
+        self.assertEqual(tree[0]['exercise_count'], 1)
+        self.assertEqual(len(tree[0]['majors']), 3)
+        self.assertEqual(len(tree[0]['majors'][0]['chapters'][0]['examgroups']), 1)
+        self.assertEqual(tree[0]['majors'][0]['chapters'][0]['exercise_count'], 1)
+
+    def test_cached_until_crud_write(self):
+        self.client.get('/api/taxonomy-tree/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/taxonomy-tree/')
+        with self.captureOnCommitCallbacks(execute=True):
+            sync.dimension_changed('category', self.category.category_id, 'Maths')
+            Category.objects.filter(pk=self.category.pk).update(category_name='Maths')
+        self.assertEqual(self.client.get('/api/taxonomy-tree/').data[0]['category_name'], 'Maths')
+
+    def test_local_cache_bounded(self):
+        for category_id in range(1000, 1010):
+            self.assertEqual(self.client.get('/api/taxonomy-tree/', {'category_id': category_id}).status_code, 404)
+        self.assertEqual(len(taxonomy._tree_cache), 0)
+        with mock.patch('core.taxonomy.MAX_CACHED_TREES', 2):
+            for params in ({}, {'with_counts': 'true'}, {'category_id': self.category.category_id}):
+                self.client.get('/api/taxonomy-tree/', params)
+        self.assertEqual(list(taxonomy._tree_cache), [(None, True), (self.category.category_id, False)])
+
+    @override_settings(CACHE_SINGLE_PROCESS=False)
+    def test_not_cached_on_process_local_cache(self):
+        self.client.get('/api/taxonomy-tree/')
+        with self.assertNumQueries(4):
+            self.client.get('/api/taxonomy-tree/')
+
+    def test_rooted_at_category(self):
+        other = Category.objects.create(category_name='Physics')
+        response = self.client.get('/api/taxonomy-tree/', {'category_id': other.category_id})
+        self.assertEqual(response.data, [{'category_id': other.category_id, 'category_name': 'Physics', 'majors': []}])
+        self.assertEqual(self.client.get('/api/taxonomy-tree/', {'category_id': 999}).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AnswerComparisonTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(category_name='Mathematics')
+        self.same = self.create_exercise(['x = 1', 'x = 1', ' x  =  2'])
+        self.spaced = self.create_exercise(['x = 2', ' x  =  2'])
+        self.different = self.create_exercise(['x = 1', 'x = 3', 'x = 1'])
+        self.missing = self.create_exercise(['x = 1'])
+        sync.exercises_changed(Exercise.objects.values_list('exercise_id', flat=True))
+
+    def create_exercise(self, answers):
+        exercise = Exercise.objects.create(category=self.category)
+        for order, content in enumerate(answers, start=1):
+            ExerciseAnswer.objects.create(exercise=exercise, answer_content=content, answer_order=order)
+        return exercise
+
+    def filter(self, conditions):
+        response = self.client.get('/api/exercises/', {'answer_comparison': json.dumps(conditions)})
+        return response, [row['exercise_id'] for row in response.data.get('results', [])]
+
+    def test_equal_compares_exact_content(self):
+        _, ids = self.filter([{'index1': 1, 'index2': 2, 'operator': 'equal'}])
+        self.assertEqual(ids, [self.same.exercise_id])
+        _, ids = self.filter([{'index1': 1, 'index2': 3, 'operator': 'equal'}])
+        self.assertEqual(ids, [self.different.exercise_id])
+
+    def test_not_equal_includes_missing(self):
+        _, ids = self.filter([{'index1': 1, 'index2': 2, 'operator': 'not_equal'}])
+        self.assertEqual(ids, [self.spaced.exercise_id, self.different.exercise_id, self.missing.exercise_id])
+
+    def test_index_not_capped(self):
+        ExerciseAnswer.objects.create(exercise=self.different, answer_content='x = 3', answer_order=7)
+        sync.exercises_changed([self.different.exercise_id])
+        _, ids = self.filter([{'index1': 2, 'index2': 7, 'operator': 'equal'}])
+        self.assertEqual(ids, [self.different.exercise_id])
+
+    def test_invalid_index(self):
+        response, _ = self.filter([{'index1': 0, 'index2': 2}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ExerciseDataMixin:
+    """8 道带小题、两个答案、解析、来源和图片的题目（同一分类、同一试卷），供列表和导出测试使用（不含测试方法）"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(category_name='Mathematics')
+        exam = Exam.objects.create(category=self.category, exam_full_name='2023 期末')
+        for i in range(8):
+            exercise = Exercise.objects.create(category=self.category, level=1)
+            exercise.stem = ExerciseStem.objects.create(exercise=exercise, stem_content=f'题干 {i}')
+            exercise.answer = ExerciseAnswer.objects.create(exercise=exercise, answer_content=f'答案 {i}')
+            exercise.analysis = ExerciseAnalysis.objects.create(exercise=exercise, analysis_content=f'解析 {i}')
+            exercise.save()
+            ExerciseFrom.objects.create(exercise=exercise, exam=exam, exercise_number=i)
+            Question.objects.create(exercise=exercise, question_stem=f'小题 {i}')
+            ExerciseAnswer.objects.create(exercise=exercise, answer_content=f'备选答案 {i}', answer_order=2)
+            ExerciseImage.objects.create(exercise=exercise, image_link=f'https://img.example.com/{i}.png')
+        sync.exercises_changed(Exercise.objects.values_list('exercise_id', flat=True))
+
+
+class ExerciseListQueryBudgetTestCase(ExerciseDataMixin, QueryBudgetMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        query_stats.reset()
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        # COUNT + 分页 + 加载题目 + 预取小题
+        for page_size in (2, 8):
+            cache.clear()
+            with self.assertMaxQueries(4):
+                response = APIClient().get('/api/exercises/', {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+
+    @override_settings(EXERCISE_LIST_USE_READ_MODEL=False)
+    def test_legacy_list_queries_do_not_grow_with_page_size(self):
+        for page_size in (2, 8):
+            cache.clear()
+            with self.assertMaxQueries(3):
+                response = APIClient().get('/api/exercises/', {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+
+    @override_settings(QUERY_STATS_ENABLED=True, DEBUG=True)
+    def test_middleware_headers_and_stats(self):
+        client = APIClient()
+        response = client.get('/api/exercises/')
+        self.assertEqual(int(response['X-Query-Count']), 4)
+        self.assertEqual(response['X-Query-Duplicates'], '0')
+        client.get('/api/no-such-page/')
+        client.get('/wp-login.php')
+        self.assertEqual(client.get('/api/metrics/queries/').status_code, status.HTTP_401_UNAUTHORIZED)
+        client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+        stats = client.get('/api/metrics/queries/').data['views']
+        self.assertEqual(stats['<unresolved>']['requests'], 2)
+        self.assertEqual(stats['exercise-list']['requests'], 1)
+        self.assertEqual(stats['exercise-list']['max_queries'], 4)
+
+    def test_fingerprint_ignores_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id = 1 AND name = 'a'"),
+            fingerprint("SELECT * FROM t WHERE id = 25 AND name = 'bb'"),
+        )
+        self.assertEqual(fingerprint("WHERE id IN (1, 2, 3)"), fingerprint("WHERE id IN (4, 5)"))
+
+    def test_fields_selection(self):
+        response = APIClient().get('/api/exercises/', {'fields': 'exercise_id,stem_preview,category_name'})
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'exercise_id', 'stem_preview', 'category_name'})
+        self.assertEqual(row['stem_preview'], '题干 0')
+        self.assertEqual(row['category_name'], 'Mathematics')
+
+    def test_expand_is_batched(self):
+        # 默认 4 条 + 答案/解析/图片各一次预取，与页大小无关
+        for page_size in (2, 8):
+            cache.clear()
+            with self.assertMaxQueries(7):
+                response = APIClient().get(
+                    '/api/exercises/', {'page_size': page_size, 'expand': 'answers,analyses,images'}
+                )
+            row = response.data['results'][0]
+            self.assertEqual(len(row['answers']), 2)
+            self.assertEqual(len(row['analyses']), 1)
+            self.assertEqual(row['images'][0]['image_link'], 'https://img.example.com/0.png')
+            self.assertIn('stem', row)
+
+    def test_fetch_plan_query_counts(self):
+        exercises = Exercise.objects.order_by('exercise_id')
+        with self.assertNumQueries(fetch_plans.get_plan('list').query_count):
+            data = ExerciseSerializer(fetch_plans.apply(exercises, 'list'), many=True).data
+        self.assertEqual(len(data), 8)
+        with self.assertNumQueries(fetch_plans.get_plan('detail').query_count):
+            data = ExerciseSerializer(
+                fetch_plans.apply(exercises, 'detail'), many=True, expand=ExerciseSerializer.EXPANDABLE
+            ).data
+        self.assertEqual(len(data[0]['answers']), 2)
+
+    def test_serializer_plans_match_named_plans(self):
+        plan = ExerciseSerializer.fetch_plan()
+        self.assertEqual((plan.select, plan.prefetch), (fetch_plans.get_plan('list').select, ('questions',)))
+        plan = ExerciseSerializer.fetch_plan(expand=ExerciseSerializer.EXPANDABLE)
+        detail = fetch_plans.get_plan('detail')
+        self.assertEqual((plan.select, plan.prefetch), (detail.select, detail.prefetch))
+
+    def test_detail_endpoint(self):
+        exercise = Exercise.objects.order_by('exercise_id').first()
+        with self.assertMaxQueries(fetch_plans.get_plan('detail').query_count):
+            response = APIClient().get(f'/api/exercises/{exercise.exercise_id}/', {'expand': 'answers,images'})
+        self.assertEqual(response.data['exercise_id'], exercise.exercise_id)
+        self.assertEqual(len(response.data['answers']), 2)
+        self.assertEqual(APIClient().get('/api/exercises/999999/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unknown_field_rejected(self):
+        response = APIClient().get('/api/exercises/', {'fields': 'exercise_id,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = APIClient().get('/api/exercises/', {'expand': 'questions'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ExportTestCase(ExerciseDataMixin, TestCase):
+    def test_export_queries_per_chunk(self):
+        # 每块主表 1 条 + 每张子表 1 条；最后一块满时再多一条空查询确认结束
+        per_chunk = 1 + len(exporting.CHILDREN)
+        for size, queries in ((4, 2 * per_chunk + 1), (5, 2 * per_chunk), (100, per_chunk)):
+            with self.settings(EXPORT_CHUNK_SIZE=size), self.assertNumQueries(queries):
+                output = b''.join(exporting.json_stream(exporting.iter_batches(
+                    Exercise.objects.filter(category=self.category).order_by('-exercise_id')
+                )))
+            records = json.loads(output)
+            self.assertEqual([r['stem'] for r in records], [f'题干 {i}' for i in range(8)])
+
+    def test_export_record_format(self):
+        exercise = Exercise.objects.order_by('exercise_id').first()
+        exercise.exercise_from = ExerciseFrom.objects.get(exercise=exercise)
+        exercise.save()
+        bare = Exercise.objects.create(level=3)
+        records = [r for batch in exporting.iter_batches(Exercise.objects.all()) for r in batch]
+        self.assertEqual(len(records), 9)
+        self.assertEqual(records[0], {
+            'exercise_id': exercise.exercise_id, 'category': 'Mathematics', 'major': None, 'chapter': None,
+            'examgroup': None, 'source': None, 'type': None, 'level': 1, 'score': None, 'stem': '题干 0',
+            'questions': [
+                {'question_order': None, 'question_stem': '小题 0', 'question_answer': None, 'question_analysis': None}
+            ],
+            'answer': [
+                {'answer_content': '答案 0', 'mark': None, 'from_model': None, 'render_type': None, 'answer_order': None},
+                {'answer_content': '备选答案 0', 'mark': None, 'from_model': None, 'render_type': None, 'answer_order': 2},
+            ],
+            'analysis': [{'analysis_content': '解析 0', 'mark': None, 'render_type': None}],
+            'exercise_from': {
+                'is_official_exercise': None, 'from_school': None, 'exam_time': None, 'exam_code': None,
+                'exam_full_name': '2023 期末', 'exercise_number': 0, 'material_name': None, 'section': None,
+                'page_number': None,
+            },
+            'image_links': [
+                {'image_link': 'https://img.example.com/0.png', 'source_type': 'stem', 'is_deprecated': False, 'ocr_result': None}
+            ],
+        })
+        # 没有来源、题干、子表的题目取默认值
+        self.assertEqual(records[-1]['exercise_id'], bare.exercise_id)
+        self.assertEqual((records[-1]['stem'], records[-1]['questions'], records[-1]['image_links']), (None, [], []))
+        self.assertEqual(records[-1]['exercise_from'], {
+            'is_official_exercise': 0, 'from_school': '', 'exam_time': '', 'exam_code': '', 'exam_full_name': '',
+            'exercise_number': 0, 'material_name': '', 'section': '', 'page_number': 0,
+        })
+
+    def test_export_without_orjson(self):
+        exercises = Exercise.objects.all()
+        expected = b''.join(exporting.ndjson_stream(exporting.iter_batches(exercises)))
+        with mock.patch('core.exporting.orjson', None):
+            self.assertEqual(b''.join(exporting.ndjson_stream(exporting.iter_batches(exercises))), expected)
+            output = b''.join(exporting.json_stream(exporting.iter_batches(exercises, 3)))
+        self.assertEqual([r['stem'] for r in json.loads(output)], [f'题干 {i}' for i in range(8)])
+
+
+class ColumnarExportTestCase(ExerciseDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+
+    def read_zip(self, data):
+        archive = zipfile.ZipFile(BytesIO(data))
+        self.assertIsNone(archive.testzip())
+        return archive
+
+    def read_csv(self, archive, name):
+        return list(csv.DictReader(TextIOWrapper(archive.open(name), encoding='utf-8', newline='')))
+
+    def test_columnar_csv_export(self):
+        exercise = Exercise.objects.order_by('exercise_id').first()
+        exercise.exercise_from = ExerciseFrom.objects.get(exercise=exercise)
+        exercise.save()
+        with self.settings(EXPORT_CHUNK_SIZE=3):  # 每张表都跨多个块
+            archive = self.read_zip(b''.join(columnar.zip_stream(Exercise.objects.filter(category=self.category))))
+        self.assertEqual(
+            archive.namelist(),
+            ['schema.json'] + [f'{table}.csv' for table in ('exercises', 'questions', 'answers', 'analyses', 'images', 'exams')]
+        )
+        types = json.loads(archive.read('schema.json'))
+        self.assertIn({'name': 'level', 'type': 'int'}, types['exercises'])
+
+        exercises = self.read_csv(archive, 'exercises.csv')
+        self.assertEqual(list(exercises[0]), [column['name'] for column in types['exercises']])
+        self.assertEqual([row['stem'] for row in exercises], [f'题干 {i}' for i in range(8)])
+        self.assertEqual((exercises[0]['category'], exercises[0]['level'], exercises[0]['score']), ('Mathematics', '1', ''))
+        exams = self.read_csv(archive, 'exams.csv')
+        self.assertEqual([(row['exam_id'], row['exam_full_name']) for row in exams], [(exercises[0]['exam_id'], '2023 期末')])
+        answers = self.read_csv(archive, 'answers.csv')
+        self.assertEqual(len(answers), 16)
+        self.assertEqual({row['exercise_id'] for row in answers}, {row['exercise_id'] for row in exercises})
+        self.assertEqual(len(self.read_csv(archive, 'images.csv')), 8)
+
+        # 子表只包含筛选后的题目
+        archive = self.read_zip(b''.join(columnar.zip_stream(Exercise.objects.filter(exercise_id=exercise.exercise_id))))
+        self.assertEqual([row['question_stem'] for row in self.read_csv(archive, 'questions.csv')], ['小题 0'])
+        self.assertEqual(self.read_csv(archive, 'images.csv')[0]['is_deprecated'], 'False')
+
+    @unittest.skipUnless(columnar.pyarrow, 'pyarrow is not installed')
+    def test_columnar_parquet_export(self):
+        archive = self.read_zip(b''.join(columnar.zip_stream(Exercise.objects.all(), 'parquet')))
+        table = columnar.pyarrow.parquet.read_table(BytesIO(archive.read('answers.parquet')), columns=['answer_order'])
+        self.assertEqual(table.num_rows, 16)
+        self.assertEqual(str(table.schema.field('answer_order').type), 'int64')
+
+    def test_columnar_export_view(self):
+        category_id = self.category.category_id
+        response = self.client.get(f'/api/export-exercises/?category_id={category_id}&columnar=csv')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertRegex(response['Content-Disposition'], r'exercises_category_\d+_\d+_\d+\.csv\.zip')
+        answers = self.read_csv(self.read_zip(b''.join(response.streaming_content)), 'answers.csv')
+        self.assertEqual(
+            sorted(row['answer_content'] for row in answers),
+            sorted([f'答案 {i}' for i in range(8)] + [f'备选答案 {i}' for i in range(8)])
+        )
+
+        with mock.patch('core.columnar.pyarrow', None):
+            response = self.client.get(f'/api/export-exercises/?category_id={category_id}&columnar=parquet')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'columnar must be one of: csv')
+
+
+class PaginationCountTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(category_name='Mathematics')
+        for code in ('A1', 'A2', 'A3'):
+            Exam.objects.create(category=self.category, exam_code=code)
+
+    def test_exact_count_cached_and_invalidated(self):
+        response = self.client.get('/api/exams/')
+        self.assertEqual(response.data['count'], 3)
+        self.assertFalse(response.data['count_is_estimate'])
+        # 第二次不再执行 COUNT
+        with self.assertMaxQueries(10) as queries:
+            self.assertEqual(self.client.get('/api/exams/').data['count'], 3)
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(' in q['sql']])
+        Exam.objects.create(category=self.category, exam_code='A4')
+        self.assertEqual(self.client.get('/api/exams/').data['count'], 4)
+        Exam.objects.filter(exam_code='A1').delete()
+        self.assertEqual(self.client.get('/api/exams/').data['count'], 3)
+
+    def test_filters_cached_separately(self):
+        self.assertEqual(self.client.get('/api/exams/', {'exam_code': 'A1'}).data['count'], 1)
+        self.assertEqual(self.client.get('/api/exams/').data['count'], 3)
+
+    @override_settings(COUNT_ESTIMATE_THRESHOLD=1000)
+    def test_estimate_above_threshold(self):
+        with mock.patch.object(counting, 'estimate_count', return_value=250000):
+            response = self.client.get('/api/exams/')
+        self.assertEqual(response.data['count'], 250000)
+        self.assertTrue(response.data['count_is_estimate'])
+        self.assertEqual(len(response.data['results']), 3)
+
+    @override_settings(COUNT_ESTIMATE_THRESHOLD=1000)
+    def test_pages_do_not_trust_estimate(self):
+        for code in range(20):
+            Exam.objects.create(category=self.category, exam_code=f'B{code}')
+        with mock.patch.object(counting, 'estimate_count', return_value=1000):
+            # 估算偏高：最后一页没有 next，再往后是 404 而不是空页
+            response = self.client.get('/api/exams/', {'page': 3})
+            self.assertEqual((len(response.data['results']), response.data['next']), (3, None))
+            self.assertEqual(self.client.get('/api/exams/', {'page': 4}).status_code, status.HTTP_404_NOT_FOUND)
+        with mock.patch.object(counting, 'get_count', return_value=(5, True)):
+            # 估算偏低：超出估算页数的页仍然能取到
+            response = self.client.get('/api/exams/', {'page': 2})
+            self.assertEqual(len(response.data['results']), 10)
+            self.assertIsNotNone(response.data['next'])
+            self.assertEqual(response.data['count'], 5)
+
+    @override_settings(CACHE_SINGLE_PROCESS=False)
+    def test_count_not_cached_on_process_local_cache(self):
+        self.client.get('/api/exams/')
+        with self.assertMaxQueries(10) as queries:
+            self.client.get('/api/exams/')
+        self.assertTrue([q for q in queries.captured_queries if 'COUNT(' in q['sql']])
+
+    @override_settings(COUNT_ESTIMATE_THRESHOLD=1000)
+    def test_small_estimate_uses_exact_count(self):
+        with mock.patch.object(counting, 'estimate_count', return_value=10):
+            response = self.client.get('/api/exams/')
+        self.assertEqual(response.data['count'], 3)
+        self.assertFalse(response.data['count_is_estimate'])
+
+    def test_bulk_write_through_sync_invalidates(self):
+        exercise = Exercise.objects.create(category=self.category)
+        sync.exercises_changed([exercise.exercise_id])
+        self.assertEqual(self.client.get('/api/exercises/').data['count'], 1)
+        other = Exercise.objects.bulk_create([Exercise(category=self.category)])[0]
+        sync.exercises_changed([other.exercise_id])
+        response = self.client.get('/api/exercises/', {'page_size': 5})
+        self.assertEqual(response.data['count'], 2)
+
+
+class ImportTestMixin:
+    """导入相关测试共用的客户端和数据构造方法（不含测试方法，避免子类重复执行）"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+
+    def parse(self, text, read_size=3):
+        return list(importing.iter_json_array(BytesIO(text.encode('utf-8')), read_size=read_size))
+
+    def exercise(self, stem, **extra):
+        data = {
+            'category': '数学', 'major': None, 'chapter': None, 'examgroup': None,
+            'source': None, 'type': '选择题', 'stem': stem, 'level': 1,
+        }
+        data.update(extra)
+        return data
+
+    def upload(self, payload):
+        content = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        return self.client.post(
+            '/api/import-exercises/', {'file': SimpleUploadedFile('exercises.json', content)}, format='multipart'
+        )
+
+
+class StreamingImportTestCase(ImportTestMixin, TestCase):
+    def test_parse_across_chunk_boundaries(self):
+        items = [{'stem': '已知函数 f(x)=x²', 'n': 12345}, 67890, '中文', [1, 2], None]
+        for read_size in (1, 2, 7, 64 * 1024):
+            self.assertEqual(self.parse(json.dumps(items, ensure_ascii=False), read_size), items)
+
+    def test_large_element_decoded_a_logarithmic_number_of_times(self):
+        item = {'stem': '题' * 200000, 'n': list(range(1000))}
+        raw_decode = json.JSONDecoder.raw_decode
+        with mock.patch.object(json.JSONDecoder, 'raw_decode', autospec=True, side_effect=raw_decode) as decode:
+            self.assertEqual(self.parse(json.dumps([item], ensure_ascii=False), read_size=1024), [item])
+        self.assertLess(decode.call_count, 20)
+
+    def test_parse_bom_single_object_and_empty(self):
+        self.assertEqual(self.parse('\ufeff [ {"a": 1} ] \n'), [{'a': 1}])
+        self.assertEqual(self.parse('{"a": 1}'), [{'a': 1}])
+        self.assertEqual(self.parse('[ ]'), [])
+
+    def test_parse_errors(self):
+        for text in ('', '[{"a": 1} {"b": 2}]', '[{"a": 1},', '[1] 2', '{"a": '):
+            with self.assertRaises(json.JSONDecodeError, msg=text):
+                self.parse(text)
+
+    @override_settings(IMPORT_CHUNK_SIZE=2)
+    def test_import_in_chunks(self):
+        response = self.upload([self.exercise(f'题干 {i}') for i in range(5)])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(Exercise.objects.count(), 5)
+        self.assertEqual(ExerciseStem.objects.filter(stem_content='题干 4').count(), 1)
+
+    @override_settings(IMPORT_CHUNK_SIZE=2)
+    def test_invalid_chunk_rolls_back(self):
+        payload = [self.exercise(f'题干 {i}') for i in range(4)]
+        payload[3]['category'] = ''
+        response = self.upload(payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['details']], [3])
+        self.assertEqual(Exercise.objects.count(), 0)
+
+    def test_invalid_json_and_encoding(self):
+        self.assertEqual(self.upload(b'[{"category": ').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.upload('[]'.encode('utf-16')).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportJobTestCase(ImportTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.job_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            IMPORT_JOB_MODE='eager', IMPORT_JOB_DIR=self.job_dir, IMPORT_CHUNK_SIZE=2
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def upload_async(self, payload):
+        content = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        return self.client.post(
+            '/api/import-exercises/?async=true',
+            {'file': SimpleUploadedFile('exercises.json', content)}, format='multipart'
+        )
+
+    def test_file_job_reports_progress_and_row_errors(self):
+        payload = [self.exercise(f'题干 {i}') for i in range(5)]
+        payload[3]['type'] = ''
+        response = self.upload_async(payload)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = self.client.get(f"/api/import-jobs/{response.data['job_id']}/").data
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(
+            (job['rows_parsed'], job['rows_validated'], job['rows_written'], job['rows_failed']), (5, 4, 4, 1)
+        )
+        self.assertEqual(job['errors'][0]['index'], 3)
+        self.assertIn('type', job['errors'][0]['errors'])
+        self.assertEqual(Exercise.objects.count(), 4)
+        self.assertEqual(os.listdir(self.job_dir), [])
+
+    def test_bulk_create_job(self):
+        response = self.client.post(
+            '/api/exercises/bulk/?async=true', [self.exercise('题干 A'), self.exercise('题干 B')], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = ImportJob.objects.get(job_id=response.data['job_id'])
+        self.assertEqual((job.status, job.rows_written), ('succeeded', 2))
+
+    def test_invalid_file_fails_job(self):
+        response = self.upload_async(b'[{"category": "a"}, {')
+        job = ImportJob.objects.get(job_id=response.data['job_id'])
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('Invalid file', job.message)
+        self.assertEqual(job.rows_parsed, 0)
+        self.assertEqual(os.listdir(self.job_dir), [])
+
+    @override_settings(IMPORT_JOB_MODE='thread')
+    def test_stale_running_job_marked_failed(self):
+        with self.captureOnCommitCallbacks():
+            job_id = self.upload_async([self.exercise('题干')]).data['job_id']
+        # 模拟执行线程所在的 worker 被回收：任务停在 running，之后再没有进度
+        ImportJob.objects.filter(job_id=job_id).update(status='running')
+        self.assertEqual(self.client.get(f'/api/import-jobs/{job_id}/').data['status'], 'running')
+        ImportJob.objects.filter(job_id=job_id).update(updated_at=timezone.now() - timedelta(hours=1))
+        job = self.client.get(f'/api/import-jobs/{job_id}/').data
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('stopped making progress', job['message'])
+        self.assertEqual(os.listdir(self.job_dir), [])
+
+    def test_job_hidden_from_other_users(self):
+        job_id = self.upload_async([self.exercise('题干')]).data['job_id']
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='x'))
+        self.assertEqual(other.get(f'/api/import-jobs/{job_id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_anonymous_job_visible_only_to_staff(self):
+        job_id = self.upload_async([self.exercise('题干')]).data['job_id']
+        ImportJob.objects.filter(job_id=job_id).update(user=None)
+        user = APIClient()
+        user.force_authenticate(User.objects.create_user(username='other', password='x'))
+        for client in (APIClient(), user):
+            self.assertEqual(client.get(f'/api/import-jobs/{job_id}/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'/api/import-jobs/{job_id}/').status_code, status.HTTP_200_OK)
+
+    @override_settings(IMPORT_JOB_MODE='thread')
+    def test_thread_mode_starts_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.upload_async([self.exercise('题干')])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(ImportJob.objects.get(job_id=response.data['job_id']).status, 'pending')
+
+
+class CheckpointedImportTestCase(ImportTestMixin, TestCase):
+    def upload_chunked(self, payload, query='chunked=true'):
+        content = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        return self.client.post(
+            f'/api/import-exercises/?{query}', {'file': SimpleUploadedFile('exercises.json', content)}, format='multipart'
+        )
+
+    @override_settings(IMPORT_CHUNK_SIZE=2)
+    def test_failure_keeps_committed_chunks_and_resumes(self):
+        payload = [self.exercise(f'题干 {i}') for i in range(5)]
+        write = importing.Ingestion.write
+
+        def fail_second_chunk(ingestion, chunk, offset=0):
+            if offset == 2:
+                raise RuntimeError('database went away')
+            return write(ingestion, chunk, offset)
+
+        with mock.patch.object(importing.Ingestion, 'write', autospec=True, side_effect=fail_second_chunk):
+            response = self.upload_chunked(payload)
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(response.data['rows_committed'], 2)
+        self.assertEqual(Exercise.objects.count(), 2)
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual((checkpoint.status, checkpoint.rows_committed), ('failed', 2))
+
+        response = self.upload_chunked(payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['resumed_from'], response.data['count']), (2, 3))
+        self.assertEqual(Exercise.objects.count(), 5)
+        self.assertEqual(ExerciseStem.objects.filter(stem_content='题干 1').count(), 1)
+
+        # 已完成的文件再次上传不会重复写入，restart 时从头导入
+        self.assertEqual(self.upload_chunked(payload).data['count'], 0)
+        self.assertEqual(self.upload_chunked(payload, 'chunked=true&restart=true').data['count'], 5)
+        self.assertEqual(Exercise.objects.count(), 10)
+
+    @override_settings(IMPORT_CHUNK_SIZE=2)
+    def test_invalid_row_reports_committed_rows(self):
+        payload = [self.exercise(f'题干 {i}') for i in range(4)]
+        payload[3]['category'] = ''
+        response = self.upload_chunked(payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['details']], [3])
+        self.assertEqual((response.data['rows_committed'], Exercise.objects.count()), (2, 2))
+
+    def test_concurrent_import_conflicts(self):
+        checkpoint = importing.get_checkpoint('0' * 64)
+        ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(rows_committed=3)
+        with self.assertRaises(importing.CheckpointConflict):
+            importing.import_checkpointed(iter([self.exercise('题干')]), checkpoint, 2)
+        self.assertEqual(Exercise.objects.count(), 0)
+
+    def test_command_resumes_from_checkpoint(self):
+        rows = [{
+            'exercise_id': 9000 + i, 'category': '数学', 'major': '高数', 'chapter': '极限', 'source': '真题',
+            'type': '选择题', 'stem': f'题干 {i}', 'exerciseFrom': {'fromSchool': '某大学', 'examTime': '2020'},
+        } for i in range(3)]
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False)
+        self.addCleanup(os.remove, f.name)
+
+        with open(f.name, 'rb') as fileobj:
+            checkpoint = importing.get_checkpoint(importing.file_sha256(fileobj), filename='rows.json')
+        ImportCheckpoint.objects.filter(pk=checkpoint.pk).update(rows_committed=2, status='failed')
+        out = StringIO()
+        call_command('import_exercises', f.name, '--chunk-size', '2', stdout=out)
+        self.assertIn('Resuming', out.getvalue())
+        self.assertEqual(list(Exercise.objects.values_list('exercise_id', flat=True)), [9002])
+        checkpoint.refresh_from_db()
+        self.assertEqual((checkpoint.status, checkpoint.rows_committed), ('completed', 3))
+
+        out = StringIO()
+        call_command('import_exercises', f.name, '--chunk-size', '2', stdout=out)
+        self.assertIn('already imported', out.getvalue())
+
+
+class ImportCommandMixin:
+    """import_exercises 命令测试共用的数据构造和执行方法（不含测试方法）"""
+
+    def rows(self, n):
+        return [{
+            'exercise_id': 7000 + i, 'category': '数学', 'major': f'专业{i % 2}', 'chapter': '极限', 'source': '真题',
+            'type': '选择题', 'stem': f'题干 {i}', 'level': 2,
+            'questions': [{'questionOrder': 1, 'questionAnswer': 'A'}, {'questionOrder': 1, 'questionAnswer': 'B'}],
+            'answer': [{'answer_content': f'答案 {i}', 'mark': 'a'}, {'answer_content': f'答案 {i}', 'mark': 'b'}],
+            'analysis': [{'analysis_content': f'解析 {i}', 'mark': 'a'}],
+            'exerciseFrom': {'fromSchool': '某大学', 'examTime': '2020', 'exerciseNumber': i},
+            'image_links': [{'image_link': f'http://img/{i}.png', 'source_type': 'stem', 'is_deprecated': False}],
+        } for i in range(n)]
+
+    def run_command(self, rows, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False)
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        call_command('import_exercises', f.name, *args, stdout=out)
+        return out.getvalue()
+
+
+class ParallelImportCommandTestCase(ImportCommandMixin, TestCase):
+    def test_bulk_path_matches_sequential_import(self):
+        out = self.run_command(self.rows(4), '--workers', '1', '--batch-size', '3')
+        self.assertIn('exercises/s with 1 worker(s)', out)
+        exercise = Exercise.objects.select_related('stem', 'answer', 'analysis', 'exercise_from__exam').get(pk=7001)
+        self.assertEqual(
+            (exercise.stem.stem_content, exercise.answer.mark, exercise.analysis.analysis_content, exercise.level),
+            ('题干 1', 'b', '解析 1', 2)
+        )
+        self.assertEqual(exercise.exercise_from.exam.from_school, '某大学')
+        self.assertEqual(list(exercise.questions.values_list('question_answer', flat=True)), ['A'])
+        self.assertEqual(Exam.objects.count(), 1)
+        self.assertEqual(Major.objects.count(), 2)
+
+        # 再次导入走逐条合并逻辑，不重复创建
+        self.run_command(self.rows(4), '--workers', '1')
+        self.assertEqual((Exercise.objects.count(), ExerciseAnswer.objects.count(), ExerciseStem.objects.count()), (4, 8, 4))
+
+    def test_gzipped_ndjson(self):
+        with tempfile.NamedTemporaryFile(suffix='.ndjson.gz', delete=False) as f:
+            with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+                for row in self.rows(3):
+                    gz.write((json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.addCleanup(os.remove, f.name)
+        for args in ((), ('--workers', '1'), ('--chunk-size', '2')):
+            Exercise.objects.all().delete()
+            call_command('import_exercises', f.name, *args, stdout=StringIO())
+            self.assertEqual(Exercise.objects.count(), 3)
+
+    def test_bad_row_falls_back_to_row_by_row(self):
+        rows = self.rows(3)
+        del rows[1]['stem']
+        rows[2]['category'] = None
+        out = self.run_command(rows, '--workers', '1')
+        self.assertIn('Error importing exercise 7001', out)
+        self.assertIn('Error importing exercise 7002', out)
+        self.assertIn('Imported 1 exercises (2 failed)', out)
+        self.assertEqual(list(Exercise.objects.values_list('exercise_id', flat=True)), [7000])
+
+    def test_partition_spreads_rows_without_ids(self):
+        rows = [{'exercise_id': None, 'n': i} for i in range(6)] + [{'exercise_id': 5, 'n': 6}, {'exercise_id': 5, 'n': 7}]
+        partitions = import_exercises.partition(rows, 3)
+        self.assertEqual([len([row for row in part if row['exercise_id'] is None]) for part in partitions], [2, 2, 2])
+        self.assertEqual(len([part for part in partitions if {'exercise_id': 5, 'n': 6} in part and {'exercise_id': 5, 'n': 7} in part]), 1)
+
+    def test_file_duplicates_dropped_before_partitioning(self):
+        rows = self.rows(4)
+        rows[2]['stem'] = rows[0]['stem']
+        Exercise.objects.create(exercise_id=7003)  # 按 id 更新的行不参与查重
+        for on_duplicate, kept in (('skip', [7000, 7001, 7003]), ('update', [7001, 7002, 7003])):
+            with self.subTest(on_duplicate=on_duplicate), \
+                    mock.patch.object(import_exercises, 'ingest_partition', wraps=import_exercises.ingest_partition) as ingest:
+                out = self.run_command(rows, '--workers', '1', '--on-duplicate', on_duplicate)
+                self.assertEqual(sorted(row['exercise_id'] for row in ingest.call_args.args[0]), kept)
+                self.assertIn('1 skipped', out)
+            Exercise.objects.exclude(exercise_id=7003).delete()
+
+
+class IngestionTestCase(ImportCommandMixin, TestCase):
+    def write_rows(self, rows):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False)
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_normalize(self):
+        self.assertEqual(
+            importing.normalize({'exerciseFrom': {'fromSchool': 'A', 'examTime': '2020'}, 'questions': [{'questionOrder': 1}],
+                                 'image_links': [], 'stem': 'fromSchool'}),
+            {'exercise_from': {'from_school': 'A', 'exam_time': '2020'}, 'questions': [{'question_order': 1}],
+             'image_links': [], 'stem': 'fromSchool'}
+        )
+
+    def test_entry_points_share_engine(self):
+        rows = self.rows(2)
+        rows[0]['questions'][0]['questionAnalysis'] = '小题解析'
+        path = self.write_rows(rows)
+
+        call_command('load_exercises', path, stdout=StringIO())
+        self.assertEqual(sorted(Exercise.objects.values_list('exercise_id', flat=True)), [7000, 7001])
+        self.assertEqual(Question.objects.get(exercise_id=7000).question_analysis, '小题解析')
+
+        # 根目录的旧脚本：不沿用文件中的 exercise_id
+        from import_exercises import Command as ScriptCommand
+        out = StringIO()
+        call_command(ScriptCommand(), path, stdout=out)
+        self.assertIn('Imported 2 exercises (0 failed)', out.getvalue())
+        self.assertEqual(Exercise.objects.count(), 4)
+        self.assertEqual(Exercise.objects.filter(exercise_id__in=[7000, 7001]).count(), 2)
+
+    def test_repeated_id_in_file_keeps_last_row(self):
+        rows = self.rows(2)
+        rows[1]['exercise_id'] = 7000
+        out = self.run_command(rows, '--batch-size', '5')
+        self.assertIn('Imported 2 exercises', out)
+        exercise = Exercise.objects.select_related('stem').get()
+        self.assertEqual((exercise.exercise_id, exercise.stem.stem_content), (7000, '题干 1'))
+
+    def test_skip_invalid_stats(self):
+        rows = importing.normalize(self.rows(3))
+        rows[1]['type'] = None
+        ingestion = importing.Ingestion(2, skip_invalid=True, keep_ids=True)
+        stats = ingestion.run(rows)
+        self.assertEqual(stats, {'rows': 3, 'written': 2, 'skipped': 0, 'updated': 0, 'failed': 1})
+        self.assertEqual([(e['index'], e['exercise_id']) for e in ingestion.errors], [(1, 7001)])
+        self.assertIn('2 exercises in', ingestion.summary())
+        with self.assertRaises(importing.ChunkValidationError):
+            importing.Ingestion().write(rows)
+
+
+class CompiledValidationTestCase(ImportTestMixin, TestCase):
+    MUTATIONS = [
+        lambda row: row.update(category=''),
+        lambda row: row.pop('type'),
+        lambda row: row.update(level='3'),
+        lambda row: row.update(level=True),
+        lambda row: row.update(stem='  padded  '),
+        lambda row: row.update(stem='\x00'),
+        lambda row: row.update(stem='\ud800'),
+        lambda row: row.update(major=None),
+        lambda row: row.pop('major'),
+        lambda row: row.update(questions={'question_order': 1}),
+        lambda row: row.update(questions=[None, {'question_order': 'x'}]),
+        lambda row: row.update(answer=[{'mark': 'x' * 500}]),
+        lambda row: row.update(image_links=[{'source_type': 'nope', 'is_deprecated': 'yes'}]),
+        lambda row: row.update(exercise_from={'exam': 999999}),
+        lambda row: row.update(exercise_from='school'),
+    ]
+
+    def validate(self, rows, compiled):
+        with override_settings(IMPORT_COMPILED_VALIDATION=compiled):
+            serializer = BulkExerciseSerializer(data=copy.deepcopy(rows))
+            if serializer.is_valid():
+                return True, serializer.validated_data
+            return False, json.loads(json.dumps(serializer.errors))
+
+    def test_same_results_and_messages_as_drf(self):
+        exam = Exam.objects.create(from_school='某大学')
+        rows = sample_exercises(3)
+        rows[2]['exercise_from'] = {'exam': exam.pk}
+        self.assertEqual(self.validate(rows, True), self.validate(rows, False))
+        for mutate in self.MUTATIONS:
+            invalid = copy.deepcopy(rows)
+            mutate(invalid[1])
+            self.assertEqual(self.validate(invalid, True), self.validate(invalid, False))
+        self.assertEqual(self.validate([None, 'x'] + rows, True), self.validate([None, 'x'] + rows, False))
+
+    def test_relations_fetched_once_per_batch(self):
+        exams = [Exam.objects.create(exam_code=str(i)) for i in range(3)]
+        rows = sample_exercises(30)
+        for i, row in enumerate(rows):
+            row['exercise_from'] = {'exam': exams[i % 3].pk}
+        serializer = BulkExerciseSerializer(data=rows)
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data[4]['exercise_from']['exam'], exams[1])
+
+    def test_dry_run(self):
+        payload = [self.exercise(f'题干 {i}') for i in range(3)]
+        response = self.client.post('/api/import-exercises/?dry_run=true', {
+            'file': SimpleUploadedFile('exercises.json', json.dumps(payload).encode('utf-8'))
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['count'], response.data['valid'], response.data['invalid']), (3, 3, 0))
+
+        payload[1]['type'] = ''
+        response = self.client.post('/api/exercises/bulk/?dry_run=true', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.data['dry_run'])
+        self.assertEqual(response.data['details'][0]['index'], 1)
+        self.assertIn('type', response.data['details'][0]['errors'])
+        self.assertEqual(Exercise.objects.count(), 0)
+
+
+class DimensionResolverTestCase(TestCase):
+    DIMENSION_TABLES = ('categories', 'majors', 'chapters', 'exam_groups', 'sources', 'exercise_types', 'schools', 'exams')
+
+    def rows(self, n, offset=0):
+        return [{
+            'category': f'分类{i % 2}', 'major': f'专业{i % 3}', 'chapter': '第一章', 'examgroup': '题组',
+            'source': '真题', 'type': '选择题', 'stem': f'题干 {offset + i}', 'level': 1,
+            'exercise_from': {'from_school': f'学校{i % 2}', 'exam_time': '2023'},
+        } for i in range(n)]
+
+    def save(self, rows):
+        serializer = BulkExerciseSerializer(data=rows)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with CaptureQueriesContext(connection) as context:
+            exercises = serializer.save()
+        dimension_queries = [
+            q['sql'] for q in context.captured_queries
+            if any(f'FROM "{table}"' in q['sql'] or f'INTO "{table}"' in q['sql'] for table in self.DIMENSION_TABLES)
+        ]
+        return exercises, dimension_queries
+
+    def test_dimension_queries_do_not_grow_with_rows(self):
+        _, small = self.save(self.rows(6))
+        for model in (Exercise, Exam, School, ExamGroup, Chapter, Major, Category, Source, ExerciseType):
+            model.objects.all().delete()
+        _, large = self.save(self.rows(30, offset=100))
+        self.assertEqual(len(small), len(large), '\n'.join(large))
+        self.assertLessEqual(len(large), 2 * len(self.DIMENSION_TABLES))
+
+    def test_rows_are_shared_and_reused(self):
+        Category.objects.create(category_name='分类0')
+        exercises, _ = self.save(self.rows(6))
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(Major.objects.count(), 6)  # 每个分类下 3 个专业名
+        self.assertEqual(Chapter.objects.count(), 6)
+        self.assertEqual(Source.objects.count(), 1)
+        self.assertEqual(ExerciseType.objects.count(), 1)
+        self.assertEqual(School.objects.count(), 2)
+        self.assertEqual(Exam.objects.count(), 2)
+        exercise = Exercise.objects.select_related('category', 'major', 'exercise_from__exam').get(pk=exercises[3].pk)
+        self.assertEqual((exercise.category.category_name, exercise.major.major_name), ('分类1', '专业0'))
+        self.assertEqual(exercise.exercise_from.exam.from_school, '学校1')
+        self.assertEqual(exercise.exercise_from.exam.category_id, exercise.category_id)
+
+    def test_exam_matches_given_fields_only(self):
+        category = Category.objects.create(category_name='分类0')
+        school = School.objects.create(name='学校0')
+        existing = Exam.objects.create(
+            category=category, school=school, from_school='学校0', exam_time='2023', exam_code='A1'
+        )
+        exercises, _ = self.save(self.rows(1))
+        # 条件只有 from_school + exam_time，与 get_or_create 一样匹配到已有试卷
+        self.assertEqual(Exam.objects.count(), 1)
+        self.assertEqual(Exercise.objects.get(pk=exercises[0].pk).exercise_from.exam_id, existing.exam_id)
+
+
+class BulkWriteQueryCountTestCase(TestCase):
+    def save(self, rows):
+        serializer = BulkExerciseSerializer(data=rows)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with CaptureQueriesContext(connection) as context:
+            exercises = serializer.save()
+        # 读模型/检索词由 sync 刷新，SQLite 会按参数个数上限拆分其批量插入，不计入
+        queries = [
+            q['sql'] for q in context.captured_queries
+            if 'SAVEPOINT' not in q['sql'] and 'exercise_read_model' not in q['sql']
+            and 'exercise_search_terms' not in q['sql']
+        ]
+        return exercises, len(queries)
+
+    def test_create_query_count_is_constant(self):
+        _, warmup = self.save(sample_exercises(3))  # 首批包含维度表的新建
+        _, small = self.save(sample_exercises(5, offset=100))
+        _, large = self.save(sample_exercises(30, offset=200))
+        self.assertEqual(small, large)
+
+    def test_update_query_count_is_constant(self):
+        exercises, _ = self.save(sample_exercises(30))
+        rows = sample_exercises(30, offset=1000)
+        for row, exercise in zip(rows, exercises):
+            row['exercise_id'] = exercise.exercise_id
+        _, small = self.save(rows[:5])
+        _, large = self.save(rows[5:])
+        self.assertEqual(small, large)
+        self.assertEqual(Exercise.objects.count(), 30)
+
+    def test_create_without_returned_pks(self):
+        # 模拟 MySQL：bulk_create 不回填自增主键
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            _, warmup = self.save(sample_exercises(3))
+            _, small = self.save(sample_exercises(5, offset=100))
+            _, large = self.save(sample_exercises(30, offset=200))
+            # 与库中和本批内内容相同的题目各自拿到自己的主键
+            rows = sample_exercises(2, offset=100) + sample_exercises(2, offset=100)
+            for level, row in enumerate(rows, start=1):
+                row['level'] = level
+            exercises, _ = self.save(rows)
+        self.assertEqual(small, large)
+        self.assertEqual(len({exercise.exercise_id for exercise in exercises}), 4)
+        for level, exercise in enumerate(exercises, start=1):
+            saved = Exercise.objects.select_related('stem').get(pk=exercise.exercise_id)
+            self.assertEqual(saved.level, level)
+            self.assertEqual(saved.stem.exercise_id, saved.exercise_id)
+        self.assertEqual(Exercise.objects.count(), 42)
+
+    def test_back_pointers(self):
+        exercises, _ = self.save(sample_exercises(2))
+        exercise = Exercise.objects.select_related('stem', 'answer', 'analysis', 'exercise_from').get(
+            pk=exercises[1].pk
+        )
+        self.assertEqual(exercise.stem.stem_content, '题干 1：已知函数 f(x) = x^2 + 1')
+        self.assertEqual(exercise.answer.answer_content, '备选答案 1')  # 与原逻辑一致：最后一条答案
+        self.assertEqual(exercise.analysis.analysis_content, '解析 1')
+        self.assertEqual(exercise.exercise_from.exercise_number, 2)
+        self.assertEqual(exercise.exercise_from.exercise_id, exercise.exercise_id)
+        # 更新后指向新的关联行
+        row = sample_exercises(1, offset=50)[0]
+        row['exercise_id'] = exercise.exercise_id
+        self.save([row])
+        exercise.refresh_from_db()
+        self.assertEqual(exercise.stem.stem_content, '题干 50：已知函数 f(x) = x^2 + 0')
+        self.assertEqual(ExerciseStem.objects.filter(exercise=exercise).count(), 1)
+
+
+class ContentHashDedupTestCase(ImportTestMixin, TestCase):
+    def save(self, rows, on_duplicate='create'):
+        serializer = BulkExerciseSerializer(data=rows, context={'on_duplicate': on_duplicate})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.save(), serializer.duplicate_stats
+
+    def test_hash_matches_database(self):
+        rows = sample_exercises(3)
+        rows[0]['questions'] = [
+            {'question_order': 2, 'question_stem': '小题二'}, {'question_order': 1, 'question_stem': ' 小题  一 '},
+        ]
+        exercises, _ = self.save(rows)
+        hashes = [e.content_hash for e in exercises]
+        self.assertTrue(all(hashes))
+        Exercise.objects.update(content_hash=None)
+        fingerprints.refresh_content_hashes([e.pk for e in exercises])
+        self.assertEqual([Exercise.objects.get(pk=e.pk).content_hash for e in exercises], hashes)
+
+    def test_skip(self):
+        self.save(sample_exercises(3))
+        rows = sample_exercises(5)
+        rows.append(copy.deepcopy(rows[4]))  # 本批内重复
+        exercises, stats = self.save(rows, 'skip')
+        self.assertEqual(stats, {'skipped': 4, 'updated': 0})
+        self.assertEqual(len(exercises), 2)
+        self.assertEqual(Exercise.objects.count(), 5)
+
+    def test_update(self):
+        original, _ = self.save(sample_exercises(2))
+        rows = sample_exercises(2)
+        rows[0]['level'] = 5
+        rows[0]['analysis'] = [{'analysis_content': '新解析'}]
+        _, stats = self.save(rows, 'update')
+        self.assertEqual(stats, {'skipped': 0, 'updated': 2})
+        self.assertEqual(Exercise.objects.count(), 2)
+        exercise = Exercise.objects.select_related('analysis').get(pk=original[0].pk)
+        self.assertEqual(exercise.level, 5)
+        self.assertEqual(exercise.analysis.analysis_content, '新解析')
+
+    def test_create_keeps_duplicates(self):
+        self.save(sample_exercises(2))
+        _, stats = self.save(sample_exercises(2))
+        self.assertEqual(stats, {'skipped': 0, 'updated': 0})
+        self.assertEqual(Exercise.objects.count(), 4)
+
+    def test_exam_attributes_are_part_of_hash(self):
+        self.save(sample_exercises(1))
+        row = sample_exercises(1)[0]
+        row['exercise_from']['exam_time'] = '2024'
+        _, stats = self.save([row], 'skip')
+        self.assertEqual(stats['skipped'], 0)
+        self.assertEqual(Exercise.objects.count(), 2)
+
+    def test_one_hash_query_per_batch(self):
+        self.save(sample_exercises(30))
+        serializer = BulkExerciseSerializer(data=sample_exercises(30), context={'on_duplicate': 'skip'})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with CaptureQueriesContext(connection) as context:
+            serializer.save()
+        lookups = [q['sql'] for q in context.captured_queries if 'content_hash" IN' in q['sql']]
+        self.assertEqual(len(lookups), 1)
+
+    def test_api_on_duplicate(self):
+        payload = [self.exercise('题干 1'), self.exercise('题干 2')]
+        self.assertEqual(self.upload(payload).status_code, status.HTTP_201_CREATED)
+        response = self.client.post('/api/import-exercises/?on_duplicate=skip', {
+            'file': SimpleUploadedFile('exercises.json', json.dumps(payload).encode('utf-8'))
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['skipped'], 2)
+        self.assertEqual(Exercise.objects.count(), 2)
+
+        response = self.client.post('/api/exercises/bulk/?on_duplicate=merge', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class NdjsonFormatTestCase(ImportTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.settings_override = override_settings(EXPORT_CACHE_DIR=tempfile.mkdtemp())
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def upload_file(self, name, content, query=''):
+        return self.client.post(
+            f'/api/import-exercises/{query}', {'file': SimpleUploadedFile(name, content)}, format='multipart'
+        )
+
+    def ndjson(self, rows):
+        return ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode('utf-8')
+
+    def test_parse_ndjson(self):
+        content = '\ufeff{"a": 1}\r\n\n  {"b": "中文"}\n{"c": [1]}'.encode('utf-8')
+        self.assertEqual(list(importing.iter_ndjson(BytesIO(content))), [{'a': 1}, {'b': '中文'}, {'c': [1]}])
+        with self.assertRaisesRegex(json.JSONDecodeError, 'line 3'):
+            list(importing.iter_ndjson(BytesIO(b'{"a": 1}\n\n{"a": \n')))
+
+    def test_import_ndjson_and_gzip(self):
+        rows = [self.exercise(f'题干 {i}') for i in range(3)]
+        self.assertEqual(self.upload_file('a.ndjson', self.ndjson(rows)).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.upload_file('b.txt', self.ndjson(rows[:1]), '?ndjson=true').status_code, status.HTTP_201_CREATED)
+        response = self.upload_file('c.json.gz', gzip.compress(json.dumps(rows[:2]).encode('utf-8')))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Exercise.objects.count(), 6)
+
+        response = self.upload_file('d.jsonl', self.ndjson(rows) + b'{oops}\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('line 4', response.data['error'])
+        response = self.upload_file('e.ndjson.gz', gzip.compress(self.ndjson(rows))[:-8])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Exercise.objects.count(), 6)
+
+    def test_export_round_trip(self):
+        self.upload([self.exercise(f'题干 {i}', answer=[{'answer_content': f'答案 {i}', 'answer_order': 1}]) for i in range(12)])
+        category_id = Category.objects.get(category_name='数学').category_id
+
+        response = self.client.get(f'/api/export-exercises/?category_id={category_id}&ndjson=true')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['stem'] for line in lines], [f'题干 {i}' for i in range(12)])
+
+        response = self.client.get(f'/api/export-exercises-by-category/{category_id}/?gzip=true')
+        self.assertIn('.json.gz', response['Content-Disposition'])
+        records = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(len(records), 12)
+        self.assertEqual(records[0]['answer'][0]['answer_order'], 1)
+
+        # 导出内容可以直接再导入
+        Exercise.objects.all().delete()
+        self.assertEqual(self.upload_file('x.ndjson', '\n'.join(lines).encode('utf-8')).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Exercise.objects.count(), 12)
+
+    def test_json_export_skips_bad_records(self):
+        self.upload([self.exercise(f'题干 {i}') for i in range(11)])
+        record = exporting.build_record
+
+        def flaky(row, children):
+            if '题干 10' in row:
+                raise ValueError('broken')
+            return record(row, children)
+
+        category_id = Category.objects.get(category_name='数学').category_id
+        with mock.patch('core.exporting.build_record', side_effect=flaky):
+            response = self.client.get(f'/api/export-exercises/?category_id={category_id}')
+            records = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(records), 10)
+
+
+class ExportCompressionTestCase(ImportTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.settings_override = override_settings(EXPORT_CACHE_DIR=tempfile.mkdtemp())
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def test_negotiate_encoding(self):
+        with mock.patch('core.exporting.zstandard', None):
+            cases = {
+                'gzip, deflate, br': 'gzip', '': None, 'br': None, 'gzip;q=0': None, '*': 'gzip',
+                'identity;q=1, gzip;q=0.5': None, 'GZIP; q=0.8': 'gzip', 'zstd': None,
+            }
+            for header, expected in cases.items():
+                self.assertEqual(exporting.negotiate_encoding(header), expected, header)
+        with mock.patch('core.exporting.zstandard', mock.Mock()):
+            self.assertEqual(exporting.negotiate_encoding('gzip, zstd'), 'zstd')
+            self.assertEqual(exporting.negotiate_encoding('zstd;q=0.5, gzip'), 'gzip')
+
+    def test_compressed_export(self):
+        self.upload([self.exercise(f'题干 {i}') for i in range(12)])
+        category_id = Category.objects.get(category_name='数学').category_id
+        url = f'/api/export-exercises-by-category/{category_id}/'
+        plain = self.client.get(url)
+        body = b''.join(plain.streaming_content)
+
+        with mock.patch('core.exporting.zstandard', None):
+            for _ in range(2):  # 第二次读缓存文件
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+                self.assertEqual((response['Content-Encoding'], response['Content-Type']), ('gzip', 'application/json'))
+                self.assertIn('Accept-Encoding', response['Vary'])
+                self.assertIn('.json"', response['Content-Disposition'])
+                self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), body)
+            self.assertNotEqual(response['ETag'], plain['ETag'])
+
+            # .gz 下载与传输压缩共用缓存文件，但 ETag 不同，且不带 Content-Encoding
+            download = self.client.get(url, {'gzip': 'true'}, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(download.has_header('Content-Encoding'))
+            self.assertEqual(gzip.decompress(b''.join(download.streaming_content)), body)
+            self.assertNotEqual(download['ETag'], response['ETag'])
+
+            response = self.client.get(url, {'compress': 'none'}, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            response = self.client.get(f'/api/export-exercises/?category_id={category_id}&compress=gzip&ndjson=true')
+            lines = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8').splitlines()
+            self.assertEqual(len(lines), 12)
+            response = self.client.get(url, {'compress': 'zstd'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['error'], 'compress must be one of: gzip, none')
+
+    @unittest.skipUnless(exporting.zstandard, 'zstandard is not installed')
+    def test_zstd_export(self):
+        self.upload([self.exercise(f'题干 {i}') for i in range(3)])
+        category_id = Category.objects.get(category_name='数学').category_id
+        response = self.client.get(
+            f'/api/export-exercises-by-category/{category_id}/', HTTP_ACCEPT_ENCODING='gzip, zstd'
+        )
+        self.assertEqual(response['Content-Encoding'], 'zstd')
+        content = exporting.zstandard.ZstdDecompressor().decompressobj().decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(json.loads(content)), 3)
+
+
+class ExportCacheTestCase(ImportTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(EXPORT_CACHE_DIR=self.cache_dir)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def populate(self):
+        self.upload([self.exercise(f'题干 {i}') for i in range(5)])
+        self.upload([self.exercise('物理题', category='物理')])
+        self.math_id = Category.objects.get(category_name='数学').category_id
+        self.physics_id = Category.objects.get(category_name='物理').category_id
+
+    def export(self, category_id, **headers):
+        response = self.client.get(f'/api/export-exercises-by-category/{category_id}/', **headers)
+        return response, b''.join(response.streaming_content) if response.streaming else response.content
+
+    def cached_files(self):
+        return sorted(name for _, _, files in os.walk(self.cache_dir) for name in files)
+
+    def test_repeat_download_served_from_file(self):
+        self.populate()
+        response, body = self.export(self.math_id)
+        self.assertEqual(len(json.loads(body)), 5)
+        self.assertEqual(len(self.cached_files()), 1)
+        with mock.patch('core.exporting.export_stream', side_effect=AssertionError('re-exported')):
+            again, cached = self.export(self.math_id)
+            # 同一筛选条件走另一个视图也命中同一个文件
+            other = self.client.get(f'/api/export-exercises/?category_id={self.math_id}')
+            self.assertEqual(b''.join(other.streaming_content), body)
+        self.assertEqual(cached, body)
+        self.assertEqual(again['ETag'], response['ETag'])
+        self.assertEqual((again['Content-Length'], again['Accept-Ranges']), (str(len(body)), 'bytes'))
+
+    def test_if_none_match(self):
+        self.populate()
+        etag = self.export(self.math_id)[0]['ETag']
+        response, _ = self.export(self.math_id, HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        # gzip / NDJSON 是不同的文件，ETag 不同
+        response = self.client.get(f'/api/export-exercises-by-category/{self.math_id}/?gzip=true', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_range(self):
+        self.populate()
+        response, body = self.export(self.math_id)
+        etag = response['ETag']
+        response, part = self.export(self.math_id, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual((part, response['Content-Range']), (body[10:20], f'bytes 10-19/{len(body)}'))
+        self.assertEqual(self.export(self.math_id, HTTP_RANGE='bytes=-5')[1], body[-5:])
+        self.assertEqual(self.export(self.math_id, HTTP_RANGE='bytes=100-', HTTP_IF_RANGE=etag)[1], body[100:])
+        response, part = self.export(self.math_id, HTTP_RANGE=f'bytes={len(body)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(body)}')
+        # If-Range 不是当前版本、或多段范围：返回完整文件
+        for headers in ({'HTTP_RANGE': 'bytes=0-9', 'HTTP_IF_RANGE': '"old"'}, {'HTTP_RANGE': 'bytes=0-1,5-6'}):
+            response, full = self.export(self.math_id, **headers)
+            self.assertEqual((response.status_code, full), (status.HTTP_200_OK, body))
+
+    def test_write_invalidates_only_its_category(self):
+        self.populate()
+        math_etag = self.export(self.math_id)[0]['ETag']
+        physics_etag = self.export(self.physics_id)[0]['ETag']
+        self.assertEqual(len(self.cached_files()), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload([self.exercise('题干 5')])
+        self.assertEqual(len(self.cached_files()), 1)
+        response, body = self.export(self.math_id, HTTP_IF_NONE_MATCH=math_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(body)), 6)
+        response, _ = self.export(self.physics_id, HTTP_IF_NONE_MATCH=physics_etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_epoch_change_prunes_every_scope(self):
+        self.populate()
+        self.export(self.math_id)
+        self.export(self.physics_id)
+        b''.join(self.client.get(f'/api/export-exercises/?category_id={self.math_id}&ndjson=true').streaming_content)
+        self.assertEqual(len(self.cached_files()), 3)
+        # 其他进程写入的临时文件不受影响
+        tmp_path = os.path.join(self.cache_dir, 'all', '.writing.tmp')
+        os.makedirs(os.path.dirname(tmp_path), exist_ok=True)
+        open(tmp_path, 'wb').close()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sync.exam_changed(Exam.objects.create(exam_full_name='2024 期中'))
+        self.assertEqual(self.cached_files(), ['.writing.tmp'])
+
+    def test_invalidate_keeps_current_version(self):
+        self.populate()
+        self.export(self.math_id)
+        # 没有递增代数时文件仍是当前版本，不删除
+        export_cache.invalidate([self.math_id])
+        export_cache.invalidate()
+        self.assertEqual(len(self.cached_files()), 1)
+
+    @override_settings(CACHE_SINGLE_PROCESS=False)
+    def test_disabled_on_process_local_cache(self):
+        self.populate()
+        response, body = self.export(self.math_id)
+        self.assertEqual(len(json.loads(body)), 5)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(self.cached_files(), [])
+
+    def test_interrupted_export_not_cached(self):
+        self.populate()
+        with self.settings(EXPORT_CHUNK_SIZE=2):
+            response = self.client.get(f'/api/export-exercises-by-category/{self.math_id}/')
+            stream = iter(response.streaming_content)
+            next(stream)
+            next(stream)
+            response.close()
+        self.assertEqual(self.cached_files(), [])
+        self.assertEqual(len(json.loads(self.export(self.math_id)[1])), 5)
+        self.assertEqual(len(self.cached_files()), 1)
+
+
+class ExportJobTestCase(ImportTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.job_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            EXPORT_JOB_MODE='eager', EXPORT_JOB_DIR=self.job_dir, EXPORT_CACHE_DIR=tempfile.mkdtemp()
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def start(self, count=5, query=''):
+        self.upload([self.exercise(f'题干 {i}') for i in range(count)])
+        self.category_id = Category.objects.get(category_name='数学').category_id
+        return self.post(query)
+
+    def post(self, query=''):
+        return self.client.post(f'/api/export-exercises-by-category/{self.category_id}/{query}')
+
+    def test_export_job_round_trip(self):
+        with self.settings(EXPORT_CHUNK_SIZE=2):
+            response = self.start()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job_id']
+        self.assertTrue(response.data['download_url'].endswith(f'/api/export-jobs/{job_id}/download/'))
+
+        job = self.client.get(f'/api/export-jobs/{job_id}/').data
+        self.assertEqual((job['status'], job['rows_total'], job['rows_written']), ('succeeded', 5, 5))
+
+        # 与同步导出的内容一致
+        download = self.client.get(f'/api/export-jobs/{job_id}/download/')
+        body = b''.join(download.streaming_content)
+        sync_export = self.client.get(f'/api/export-exercises-by-category/{self.category_id}/')
+        self.assertEqual(body, b''.join(sync_export.streaming_content))
+        self.assertEqual((job['file_size'], download['Content-Length']), (len(body), str(len(body))))
+        self.assertIn(f'exercises_category_{self.category_id}_{job_id}.json', download['Content-Disposition'])
+
+        partial = self.client.get(f'/api/export-jobs/{job_id}/download/', HTTP_RANGE='bytes=5-')
+        self.assertEqual(partial.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(partial.streaming_content), body[5:])
+
+    def test_gzipped_ndjson_job(self):
+        job_id = self.start(3, '?ndjson=true&gzip=true').data['job_id']
+        download = self.client.get(f'/api/export-jobs/{job_id}/download/')
+        self.assertEqual(download['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(download.streaming_content)).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['stem'] for line in lines], ['题干 0', '题干 1', '题干 2'])
+
+    def test_failed_job(self):
+        with mock.patch('core.exporting.iter_batches', side_effect=RuntimeError('database went away')):
+            job_id = self.start().data['job_id']
+        job = ExportJob.objects.get(job_id=job_id)
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('database went away', job.message)
+        self.assertEqual(os.listdir(self.job_dir), [])
+        response = self.client.get(f'/api/export-jobs/{job_id}/download/')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['status'], 'failed')
+
+    @override_settings(EXPORT_JOB_MODE='thread')
+    def test_thread_mode_starts_after_commit(self):
+        self.start()
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.post()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(self.client.get(response.data['download_url']).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.get('/api/export-jobs/999999/').status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(EXPORT_JOB_MODE='thread')
+    def test_stale_running_job_marked_failed(self):
+        with self.captureOnCommitCallbacks():
+            job_id = self.start().data['job_id']
+        # 模拟执行线程所在的 worker 被回收：任务停在 running，留下写了一半的临时文件
+        ExportJob.objects.filter(job_id=job_id).update(status='running')
+        open(os.path.join(self.job_dir, f'.export-{job_id}.tmp'), 'wb').close()
+        self.assertEqual(self.client.get(f'/api/export-jobs/{job_id}/').data['status'], 'running')
+        ExportJob.objects.filter(job_id=job_id).update(updated_at=timezone.now() - timedelta(hours=1))
+        response = self.client.get(f'/api/export-jobs/{job_id}/download/')
+        self.assertEqual((response.status_code, response.data['status']), (status.HTTP_409_CONFLICT, 'failed'))
+        job = self.client.get(f'/api/export-jobs/{job_id}/').data
+        self.assertIn('stopped making progress', job['message'])
+        self.assertEqual(os.listdir(self.job_dir), [])
@@ -9,7 +9,9 @@ from .views import (
     RegisterView, LoginView, LogoutView, UserListView, UserDetailView, RoleListView, 
     RoleDetailView, RolePermissionListView, RolePermissionDetailView, UserActionLogListView,
     InitializeRolesView, ExportExercisesByCategoryView, ImportExercisesView,
-    BulkExerciseCreateView, UserActionLogDeleteView, ExportExercisesView, RefreshTokenView
+    BulkExerciseCreateView, UserActionLogDeleteView, ExportExercisesView, RefreshTokenView,
+    ExerciseListCacheStatsView, TaxonomyTree, QueryStatsView, ImportJobDetailView, ExportJobDetailView,
+    ExportJobDownloadView
 )
 
 urlpatterns = [
@@ -40,8 +42,11 @@ urlpatterns = [
     path('chapters/<int:major_id>/', ChapterListByMajor.as_view(), name='chapter-list-by-major'),
     # 根据 chapter_id 获取 examgroup 列表
     path('examgroups/<int:chapter_id>/', ExamGroupListByChapter.as_view(), name='examgroup-list-by-chapter'),
+    # 一次返回整棵 Category → Major → Chapter → ExamGroup 树
+    path('taxonomy-tree/', TaxonomyTree.as_view(), name='taxonomy-tree'),
     # 根据 category/major/chapter/examgroup 获取 exercise 列表
     path('exercises/', ExerciseList.as_view(), name='exercise-list'),
+    path('exercises/bulk/', BulkExerciseCreateView.as_view(), name='bulk-exercise-create'),  # 需在 exercise-detail 之前，否则被 <str:exercise_id> 匹配
     path('exercises/<str:exercise_id>/', ExerciseList.as_view(), name='exercise-detail'),  # 支持 PUT
     # 根据 exercise_id 获取答案列表
     path('answers/<str:exercise_id>/', AnswerListByExercise.as_view(), name='answer-list-by-exercise'),
@@ -77,10 +82,16 @@ urlpatterns = [
 
     path('export-exercises-by-category/<int:category_id>/', ExportExercisesByCategoryView.as_view(), name='export-exercises-by-category'),
     path('export-exercises/', ExportExercisesView.as_view(), name='export-exercises'),
+    path('export-jobs/<int:job_id>/', ExportJobDetailView.as_view(), name='export-job-detail'),
+    path('export-jobs/<int:job_id>/download/', ExportJobDownloadView.as_view(), name='export-job-download'),
     
     path('import-exercises/', ImportExercisesView.as_view(), name='import_exercises'),
-    path('exercises/bulk/', BulkExerciseCreateView.as_view(), name='bulk-exercise-create'),
+    path('import-jobs/<int:job_id>/', ImportJobDetailView.as_view(), name='import-job-detail'),
     path('user-action-logs/', UserActionLogListView.as_view(), name='user-action-log-list'),
     path('user-action-logs/<int:id>/', UserActionLogDeleteView.as_view(), name='user-action-log-delete'),
 
+    # 监控指标
+    path('metrics/exercise-list-cache/', ExerciseListCacheStatsView.as_view(), name='exercise-list-cache-stats'),
+    path('metrics/queries/', QueryStatsView.as_view(), name='query-stats'),
+
 ]
\ No newline at end of file
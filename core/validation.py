@@ -0,0 +1,334 @@
+# core/validation.py
+"""
+导入格式（ExerciseWriteSerializer）的批量校验。
+按序列化器的字段树编译出一组校验函数：每个字段的取值、空值规则、类型转换和校验器都预先确定，
+字符串/整数/布尔/选项字段直接内联判断，主键关联字段整批一次查询，
+整批数据一次遍历完成校验，不再为每条数据走一遍 DRF 嵌套序列化器的通用流程。
+
+快速路径只负责确认数据合法：某条数据有任何疑问（类型不符、校验器不通过等），
+都改用 DRF 对该条重新校验，所以校验结果和错误信息与逐条 DRF 校验完全一致。
+"""
+import math
+from collections.abc import Mapping
+
+from django.core import validators as django_validators
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import relations, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import SkipField, empty
+from rest_framework.validators import ProhibitSurrogateCharactersValidator
+
+SKIP = object()  # 字段缺省且无默认值，不写入结果
+EACH = object()  # 路径中的列表层
+
+
+class Invalid(Exception):
+    """快速路径无法确认数据合法，交给 DRF 重新校验"""
+
+
+def _compile_validator(validator):
+    """常见校验器内联成比较；需要上下文的校验器返回 None，该字段整体交给 DRF"""
+    limit = getattr(validator, 'limit_value', None)
+    if callable(limit):
+        limit = None
+
+    if isinstance(validator, django_validators.MaxLengthValidator) and limit is not None:
+        def check(value):
+            if len(value) > limit:
+                raise Invalid
+    elif isinstance(validator, django_validators.MinLengthValidator) and limit is not None:
+        def check(value):
+            if len(value) < limit:
+                raise Invalid
+    elif isinstance(validator, django_validators.MaxValueValidator) and limit is not None:
+        def check(value):
+            if value > limit:
+                raise Invalid
+    elif isinstance(validator, django_validators.MinValueValidator) and limit is not None:
+        def check(value):
+            if value < limit:
+                raise Invalid
+    elif isinstance(validator, django_validators.ProhibitNullCharactersValidator):
+        def check(value):
+            if '\x00' in str(value):
+                raise Invalid
+    elif isinstance(validator, ProhibitSurrogateCharactersValidator):
+        def check(value):
+            # 含代理字符的字符串无法编码为 UTF-8，比逐字符判断快得多
+            try:
+                str(value).encode('utf-8')
+            except UnicodeEncodeError:
+                raise Invalid
+    elif getattr(validator, 'requires_context', False):
+        return None
+    else:
+        def check(value):
+            try:
+                validator(value)
+            except (ValidationError, DjangoValidationError):
+                raise Invalid
+    return check
+
+
+def _drf(field):
+    """不做编译，直接调用字段自身的 run_validation"""
+    def convert(value, lookups):
+        try:
+            return field.run_validation(value)
+        except (ValidationError, DjangoValidationError, SkipField):
+            raise Invalid
+    return convert
+
+
+def _compile_leaf(field):
+    checks = [_compile_validator(validator) for validator in field.validators]
+    if any(check is None for check in checks):
+        return _drf(field)
+    field_type = type(field)
+
+    if field_type is serializers.CharField:
+        trim, allow_blank = field.trim_whitespace, field.allow_blank
+
+        def convert(value, lookups):
+            if type(value) is not str:
+                raise Invalid
+            if trim:
+                value = value.strip()
+            if not value:
+                if not allow_blank:
+                    raise Invalid
+                return ''
+            for check in checks:
+                check(value)
+            return value
+
+    elif field_type is serializers.IntegerField:
+        def convert(value, lookups):
+            if type(value) is not int:
+                raise Invalid
+            for check in checks:
+                check(value)
+            return value
+
+    elif field_type is serializers.FloatField:
+        def convert(value, lookups):
+            if type(value) not in (int, float) or not math.isfinite(value):
+                raise Invalid
+            value = float(value)
+            for check in checks:
+                check(value)
+            return value
+
+    elif field_type is serializers.BooleanField:
+        def convert(value, lookups):
+            if value is not True and value is not False:
+                raise Invalid
+            for check in checks:
+                check(value)
+            return value
+
+    elif field_type is serializers.ChoiceField:
+        choices, allow_blank = field.choice_strings_to_values, field.allow_blank
+
+        def convert(value, lookups):
+            if type(value) is not str:
+                raise Invalid
+            if value == '' and allow_blank:
+                return ''
+            try:
+                value = choices[value]
+            except KeyError:
+                raise Invalid
+            for check in checks:
+                check(value)
+            return value
+
+    else:
+        return _drf(field)
+    return convert
+
+
+class _Compiler:
+
+    def __init__(self):
+        self.relations = []  # [(路径, 主键关联字段)]，校验前整批查询
+
+    def field(self, field, path):
+        """返回 (source_attrs, read(data, lookups))"""
+        name = field.field_name
+        required, allow_null, default = field.required, field.allow_null, field.default
+        path = path + (name,)
+
+        if isinstance(field, serializers.ListSerializer):
+            convert = self.many(field, path + (EACH,))
+        elif isinstance(field, serializers.BaseSerializer):
+            convert = self.serializer(field, path)
+        elif type(field) is relations.PrimaryKeyRelatedField and field.pk_field is None:
+            convert = self.pk_relation(field, path)
+        else:
+            convert = _compile_leaf(field)
+
+        def read(data, lookups):
+            value = data.get(name, empty)
+            if value is empty:
+                if required:
+                    raise Invalid
+                if default is empty:
+                    return SKIP
+                return field.get_default()
+            if value is None:
+                if not allow_null:
+                    raise Invalid
+                return None
+            return convert(value, lookups)
+
+        return field.source_attrs, read
+
+    def serializer(self, serializer, path):
+        cls = type(serializer)
+        if (
+            not isinstance(serializer, serializers.Serializer)
+            or cls.to_internal_value is not serializers.Serializer.to_internal_value
+            or cls.run_validation is not serializers.Serializer.run_validation
+        ):
+            return _drf(serializer)
+
+        readers = []
+        for field in serializer._writable_fields:
+            source_attrs, read = self.field(field, path)
+            readers.append((source_attrs, read, getattr(serializer, 'validate_' + field.field_name, None)))
+        run_validators = bool(serializer.validators)
+        custom_validate = cls.validate is not serializers.Serializer.validate
+
+        def convert(data, lookups):
+            if not isinstance(data, Mapping):
+                raise Invalid
+            ret = {}
+            for source_attrs, read, validate_method in readers:
+                value = read(data, lookups)
+                if value is SKIP:
+                    continue
+                if validate_method is not None:
+                    try:
+                        value = validate_method(value)
+                    except (ValidationError, DjangoValidationError):
+                        raise Invalid
+                if len(source_attrs) == 1:
+                    ret[source_attrs[0]] = value
+                else:
+                    serializer.set_value(ret, source_attrs, value)
+            if run_validators or custom_validate:
+                try:
+                    if run_validators:
+                        serializer.run_validators(ret)
+                    ret = serializer.validate(ret)
+                except (ValidationError, DjangoValidationError):
+                    raise Invalid
+            return ret
+
+        return convert
+
+    def many(self, list_serializer, path):
+        cls = type(list_serializer)
+        if (
+            cls.to_internal_value is not serializers.ListSerializer.to_internal_value
+            or cls.run_validation is not serializers.ListSerializer.run_validation
+            or cls.validate is not serializers.ListSerializer.validate
+            or list_serializer.validators
+        ):
+            return _drf(list_serializer)
+
+        child = list_serializer.child
+        child_convert = self.serializer(child, path)
+        child_allow_null = child.allow_null
+        allow_empty = list_serializer.allow_empty
+        max_length, min_length = list_serializer.max_length, list_serializer.min_length
+
+        def convert(data, lookups):
+            if type(data) is not list:
+                raise Invalid
+            if not data and not allow_empty:
+                raise Invalid
+            if (max_length is not None and len(data) > max_length) or (min_length is not None and len(data) < min_length):
+                raise Invalid
+            ret = []
+            for item in data:
+                if item is None:
+                    if not child_allow_null:
+                        raise Invalid
+                    ret.append(None)
+                else:
+                    ret.append(child_convert(item, lookups))
+            return ret
+
+        return convert
+
+    def pk_relation(self, field, path):
+        index = len(self.relations)
+        self.relations.append((path, field))
+
+        def convert(value, lookups):
+            # 整数主键且在预取结果中才视为合法；字符串主键、不存在的主键交给 DRF 给出原来的错误
+            if type(value) is int:
+                obj = lookups[index].get(value)
+                if obj is not None:
+                    return obj
+            raise Invalid
+
+        return convert
+
+
+def _collect(data, path, values):
+    if not path:
+        if type(data) is int:
+            values.add(data)
+        return
+    step, rest = path[0], path[1:]
+    if step is EACH:
+        if type(data) is list:
+            for item in data:
+                _collect(item, rest, values)
+    elif isinstance(data, Mapping):
+        _collect(data.get(step), rest, values)
+
+
+class BatchValidator:
+    """
+    validator = BatchValidator(serializer)   # 编译一次，可反复校验多批
+    validated, errors = validator.validate(items)
+    errors 为 {位置: DRF 格式的错误}；有错误时 validated 只包含合法的条目。
+    """
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+        compiler = _Compiler()
+        self.convert = compiler.serializer(serializer, ())
+        self.relations = compiler.relations
+
+    def prefetch(self, items):
+        """整批数据中出现的关联主键，每个关联字段一次 in_bulk 查询"""
+        lookups = []
+        for path, field in self.relations:
+            values = set()
+            for item in items:
+                _collect(item, path, values)
+            lookups.append(field.get_queryset().in_bulk(values) if values else {})
+        return lookups
+
+    def validate(self, items):
+        lookups = self.prefetch(items)
+        validated, errors = [], {}
+        for index, item in enumerate(items):
+            try:
+                if item is None:
+                    raise Invalid
+                validated.append(self.convert(item, lookups))
+                continue
+            except Invalid:
+                pass
+            # 按 DRF 原有流程重新校验，得到一致的错误信息
+            try:
+                validated.append(self.serializer.run_validation(item))
+            except ValidationError as exc:
+                errors[index] = exc.detail
+        return validated, errors
@@ -21,10 +21,12 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.models import Group
 from django.db.models.functions import Cast
 from django.core.serializers.json import DjangoJSONEncoder
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
 from .models import User, RolePermission, UserActionLog, Role
 from .models import (
     Category, Major, Chapter, ExamGroup, Exercise, ExerciseAnswer, ExerciseAnalysis, Question, ExerciseStem,
-    ExerciseType, Source, ExerciseFrom, Exam, School, ExerciseImage
+    ExerciseType, Source, ExerciseFrom, Exam, School, ExerciseImage, ExerciseReadModel, ImportJob, ExportJob
 )
 from .serializers import (
     CategorySerializer, MajorSerializer, ChapterSerializer, ExamGroupSerializer,
@@ -32,8 +34,11 @@ from .serializers import (
     ExerciseTypeSerializer, SourceSerializer, BulkExerciseUpdateSerializer, ExamSerializer,
     SchoolSerializer, UserRegisterSerializer, UserLoginSerializer, UserSerializer,
     RoleSerializer, RolePermissionSerializer, UserActionLogSerializer, BulkExerciseSerializer,
-    ExerciseWriteSerializer
+    ExerciseWriteSerializer, ImportJobSerializer, ExportJobSerializer
 )
+from .pagination import CountingPaginator, KeysetPagination
+from .middleware import query_stats
+from . import columnar, export_cache, exporting, fingerprints, importing, list_cache, read_model, search as search_index, sync, taxonomy
 from functools import wraps
 from django.http import JsonResponse
 from uuid import uuid4
@@ -78,6 +83,12 @@ class StandardPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
+    django_paginator_class = CountingPaginator  # 总数走缓存，大表用估算值
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_is_estimate'] = self.page.paginator.count_is_estimate
+        return response
 
 
 
@@ -141,6 +152,53 @@ class ExamGroupListByChapter(APIView):
 
 
 
+# 列表筛选用到的跨表字段：读模型上是扁平列，原始表上需要连表
+EXERCISE_LIST_LOOKUPS = {
+    'read_model': {
+        'exam_id': 'exam_id',
+        'from_school': 'from_school',
+        'exam_time': 'exam_time',
+        'exam_code': 'exam_code',
+        'exam_full_name': 'exam_full_name',
+        'exercise_number': 'exercise_number',
+        'stem': 'stem_text',
+        'answer': 'answer_text',
+        'analysis': 'analysis_text',
+    },
+    'exercise': {
+        'exam_id': 'exercise_from__exam__exam_id',
+        'from_school': 'exercise_from__exam__from_school',
+        'exam_time': 'exercise_from__exam__exam_time',
+        'exam_code': 'exercise_from__exam__exam_code',
+        'exam_full_name': 'exercise_from__exam__exam_full_name',
+        'exercise_number': 'exercise_from__exercise_number',
+        'stem': 'stem__stem_content',
+        'answer': 'answer__answer_content',
+        'analysis': 'analysis__analysis_content',
+    },
+}
+
+
+class TaxonomyTree(APIView):
+    """
+    一次返回 Category → Major → Chapter → ExamGroup 整棵树，替代逐级调用四个列表接口。
+    可选参数：category_id 只返回该分类子树；with_counts=true 附带每个节点的题目数。
+    """
+
+    def get(self, request):
+        category_id = request.query_params.get('category_id')
+        with_counts = request.query_params.get('with_counts', '').lower() in ('1', 'true', 'yes')
+        if category_id is not None:
+            try:
+                category_id = int(category_id)
+            except ValueError:
+                return Response({"error": "category_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        tree = taxonomy.get_tree(category_id, with_counts)
+        if category_id is not None and not tree:
+            return Response({"error": "Category not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(tree)
+
+
 # 复用并扩展 ExerciseList，支持所有筛选条件
 class ExerciseList(APIView):
     # permission_classes = [IsAuthenticated]
@@ -148,7 +206,37 @@ class ExerciseList(APIView):
 
    
     #@require_permission('Exercise', 'read')
-    def get(self, request):
+    def get(self, request, exercise_id=None):
+        if exercise_id is not None:
+            return self.retrieve_exercise(request, exercise_id)
+        # 响应缓存：相同筛选条件 + 分页直接返回缓存结果，写入时按分类失效
+        if not list_cache.is_enabled():
+            return self.list_exercises(request)
+        cache_key = list_cache.make_key(request)
+        if cache_key is None:
+            return self.list_exercises(request)
+        data = list_cache.get_response(cache_key)
+        if data is not None:
+            return Response(data)
+        response = self.list_exercises(request)
+        if response.status_code == status.HTTP_200_OK:
+            list_cache.set_response(cache_key, response.data)
+        return response
+
+    def retrieve_exercise(self, request, exercise_id):
+        try:
+            fields, expand = ExerciseSerializer.parse_selection(
+                request.query_params.get('fields'), request.query_params.get('expand')
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            exercise = ExerciseSerializer.prepare_queryset(Exercise.objects.all(), fields, expand).get(exercise_id=exercise_id)
+        except (Exercise.DoesNotExist, ValueError):
+            return Response({"error": "Exercise not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ExerciseSerializer(exercise, fields=fields, expand=expand).data)
+
+    def list_exercises(self, request):
         # 获取查询参数
         category_id = request.query_params.get('category_id')
         major_id = request.query_params.get('major_id')
@@ -168,11 +256,25 @@ class ExerciseList(APIView):
         exam_code = request.query_params.get('exam_code')
         exam_full_name = request.query_params.get('exam_full_name')
         answer_comparison = request.query_params.get('answer_comparison')  # 新增答案对比参数
+        ranked = False
+
+        # 字段裁剪与关系展开：fields=exercise_id,stem_preview&expand=answers,images
+        try:
+            fields, expand = ExerciseSerializer.parse_selection(
+                request.query_params.get('fields'), request.query_params.get('expand')
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        detail_queryset = ExerciseSerializer.prepare_queryset(Exercise.objects.all(), fields, expand)
 
-        # 基础查询集
-        exercises = Exercise.objects.select_related(
-            'category', 'major', 'chapter', 'exam_group', 'source', 'exercise_type',
-        ).prefetch_related('questions')
+        # 基础查询集：默认查扁平读模型，分页后再按 id 取回完整题目
+        use_read_model = getattr(settings, 'EXERCISE_LIST_USE_READ_MODEL', True)
+        if use_read_model:
+            exercises = ExerciseReadModel.objects.all()
+            lookups = EXERCISE_LIST_LOOKUPS['read_model']
+        else:
+            exercises = detail_queryset
+            lookups = EXERCISE_LIST_LOOKUPS['exercise']
 
         # 层级筛选
         if category_id:
@@ -198,27 +300,34 @@ class ExerciseList(APIView):
 
         # 按 Exam 字段筛选
         if exam_id:
-            exercises = exercises.filter(exercise_from__exam__exam_id=exam_id)
+            exercises = exercises.filter(**{lookups['exam_id']: exam_id})
         if exam_school:
-            exercises = exercises.filter(exercise_from__exam__from_school__icontains=exam_school)
+            exercises = exercises.filter(**{f"{lookups['from_school']}__icontains": exam_school})
         if exam_time:
-            exercises = exercises.filter(exercise_from__exam__exam_time__icontains=exam_time)
+            exercises = exercises.filter(**{f"{lookups['exam_time']}__icontains": exam_time})
         if exam_code:
-            exercises = exercises.filter(exercise_from__exam__exam_code__icontains=exam_code)
+            exercises = exercises.filter(**{f"{lookups['exam_code']}__icontains": exam_code})
         if exam_full_name:
-            exercises = exercises.filter(exercise_from__exam__exam_full_name__icontains=exam_full_name)
+            exercises = exercises.filter(**{f"{lookups['exam_full_name']}__icontains": exam_full_name})
 
         # 搜索逻辑
         if search:
             if search_type == 'id':
                 exercises = exercises.filter(exercise_id=search)
             elif search_type == 'content':
-                exercises = exercises.filter(
-                    Q(stem__stem_content__icontains=search) |
-                    Q(questions__question_answer__icontains=search) |
-                    Q(answer__answer_content__icontains=search) |
-                    Q(analysis__analysis_content__icontains=search)
-                ).distinct()
+                terms = search_index.query_terms(search)
+                if terms:
+                    # 走倒排索引，按命中权重排序
+                    exercises = search_index.apply_content_search(exercises, terms)
+                    ranked = 'order_by' not in request.query_params
+                else:
+                    # 查询串切不出词项（如单个字母）时退回原来的全表模糊匹配
+                    exercises = exercises.filter(
+                        Q(**{f"{lookups['stem']}__icontains": search}) |
+                        Q(exercise_id__in=Question.objects.filter(question_answer__icontains=search).values('exercise_id')) |
+                        Q(**{f"{lookups['answer']}__icontains": search}) |
+                        Q(**{f"{lookups['analysis']}__icontains": search})
+                    )
 
         # 新增：答案对比筛选
         if answer_comparison:
@@ -228,43 +337,22 @@ class ExerciseList(APIView):
                     return Response({"error": "answer_comparison must be a list"}, status=status.HTTP_400_BAD_REQUEST)
 
                 for condition in conditions:
+                    if not isinstance(condition, dict):
+                        return Response({"error": "Each answer_comparison condition must be an object"}, status=status.HTTP_400_BAD_REQUEST)
                     index1 = condition.get("index1", 0)
                     index2 = condition.get("index2", 0)
                     operator = condition.get("operator", "equal")
 
-                    # 限制索引范围（1 到 5）
-                    if index1 < 1 or index2 < 1 or index1 > 5 or index2 > 5:
-                        return Response({"error": "Invalid index range (must be 1 to 5)"}, status=status.HTTP_400_BAD_REQUEST)
+                    # 索引为从 1 开始的 answer_order，不再限制上限
+                    if not isinstance(index1, int) or not isinstance(index2, int) or index1 < 1 or index2 < 1:
+                        return Response({"error": "Invalid index (must be a positive integer)"}, status=status.HTTP_400_BAD_REQUEST)
 
-                    # 子查询：获取 answer_order=index1 和 index2 的 answer_content
-                    answer1_content = Subquery(
-                        ExerciseAnswer.objects.filter(
-                            exercise=OuterRef('pk'),
-                            answer_order=index1
-                        ).values('answer_content')[:1]
-                    )
-                    answer2_content = Subquery(
-                        ExerciseAnswer.objects.filter(
-                            exercise=OuterRef('pk'),
-                            answer_order=index2
-                        ).values('answer_content')[:1]
-                    )
-
-                    # 动态构建过滤条件
+                    # 基于预先计算的答案指纹做索引连接，代替逐行比较 answer_content 的相关子查询
+                    same = fingerprints.same_answer(index1, index2)
                     if operator == "equal":
-                        exercises = exercises.annotate(
-                            answer1_content=answer1_content,
-                            answer2_content=answer2_content
-                        ).filter(
-                            answer1_content=F('answer2_content')  # 相等
-                        )
+                        exercises = exercises.filter(same)  # 相等
                     elif operator == "not_equal":
-                        exercises = exercises.annotate(
-                            answer1_content=answer1_content,
-                            answer2_content=answer2_content
-                        ).exclude(
-                            answer1_content=F('answer2_content')  # 不相等
-                        )
+                        exercises = exercises.filter(~same)  # 不相等
                     else:
                         return Response({"error": "Invalid operator (must be 'equal' or 'not_equal')"}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -277,15 +365,32 @@ class ExerciseList(APIView):
             'id': 'exercise_id',
             'level': 'level',
             'score': 'score',
-            'exam.exercise_number': 'exam_exercise_number'
+            'exam.exercise_number': lookups['exercise_number']
         }
-        order_field = valid_order_fields.get(order_by, 'exercise_id')
-        exercises = exercises.order_by(order_field)
+        if order_by not in valid_order_fields:
+            order_by = 'id'
+        order_field = valid_order_fields[order_by]
+
+        # 游标分页：传 cursor 或 pagination=cursor 时启用，深翻页与首页代价相同，且默认不做 COUNT
+        if 'cursor' in request.query_params or request.query_params.get('pagination') == 'cursor':
+            paginator = KeysetPagination()
+            page = paginator.paginate_queryset(exercises, request, order_field, order_by)
+            if use_read_model:
+                page = read_model.load_exercises(page, detail_queryset)
+            serializer = ExerciseSerializer(page, many=True, fields=fields, expand=expand)
+            return paginator.get_paginated_response(serializer.data)
+
+        if ranked:
+            exercises = exercises.order_by(F('search_rank').desc(), 'exercise_id')
+        else:
+            exercises = exercises.order_by(order_field, 'exercise_id')
 
         # 分页
         paginator = self.pagination_class()
         page = paginator.paginate_queryset(exercises, request)
-        serializer = ExerciseSerializer(page, many=True)
+        if use_read_model:
+            page = read_model.load_exercises(page, detail_queryset)
+        serializer = ExerciseSerializer(page, many=True, fields=fields, expand=expand)
         # log_user_action(request, 'read', 'Exercise')
         return paginator.get_paginated_response(serializer.data)
 
@@ -350,6 +455,7 @@ class ExerciseList(APIView):
                         )
 
             exercise.save()
+            sync.exercises_changed([exercise.exercise_id])
             serializer = ExerciseSerializer(exercise)
             details = request.data.get('details', [])
             log_user_action(request, 'update', 'Exercise', exercise_id, details=request.data)
@@ -370,6 +476,7 @@ class ExerciseList(APIView):
             try:
                 with transaction.atomic():
                     exercise = serializer.save()
+                    sync.exercises_changed([exercise.exercise_id])
                     logger.info(f"Exercise {exercise.exercise_id} created by user {request.user.username}")
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             except Exception as e:
@@ -387,7 +494,9 @@ class ExerciseList(APIView):
         try:
             exercise = Exercise.objects.get(exercise_id=exercise_id)
             with transaction.atomic():
+                category_id = exercise.category_id
                 exercise.delete()
+                sync.exercises_deleted([category_id])
                 logger.info(f"Exercise {exercise_id} deleted by user {request.user.username}")
             log_user_action(request=request, action_type='delete', model_name='Exercise', object_id=exercise_id)
             return Response({"message": f"成功删除练习题 {exercise_id}"}, status=status.HTTP_200_OK)
@@ -397,6 +506,22 @@ class ExerciseList(APIView):
             logger.error(f"Error deleting exercise {exercise_id}: {str(e)}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class ExerciseListCacheStatsView(APIView):
+    """ExerciseList 响应缓存命中/未命中计数，供监控抓取"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return Response(list_cache.stats())
+
+
+class QueryStatsView(APIView):
+    """按视图聚合的 SQL 条数/耗时/重复查询统计（需开启 QUERY_STATS_ENABLED）；包含 SQL 指纹，仅管理员可见"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request):
+        return Response(query_stats.snapshot())
+
+
 # 新增：题型列表
 class ExerciseTypeList(APIView):
     def get(self, request):
@@ -440,23 +565,113 @@ class AnalysisListByExercise(APIView):
 
 
 
+def is_flag(request, name):
+    return request.query_params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def is_async(request):
+    return is_flag(request, 'async')
+
+
+def get_on_duplicate(request):
+    """?on_duplicate=skip|update|create（默认 create）；取值不合法时返回 None"""
+    value = request.query_params.get('on_duplicate', 'create').lower()
+    return value if value in ExerciseWriteSerializer.ON_DUPLICATE_CHOICES else None
+
+
+def invalid_on_duplicate():
+    choices = ', '.join(ExerciseWriteSerializer.ON_DUPLICATE_CHOICES)
+    return Response({"error": f"on_duplicate must be one of: {choices}"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def get_export_encoding(request):
+    """?compress=gzip|zstd|none 显式指定时优先，否则按 Accept-Encoding 协商；返回 None 表示不压缩"""
+    compress = request.query_params.get('compress', '').lower()
+    if compress:
+        return None if compress in ('none', 'identity') else compress
+    return exporting.negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+
+
+def invalid_compress():
+    choices = ', '.join(exporting.available_encodings() + ('none',))
+    return Response({"error": f"compress must be one of: {choices}"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def import_job_accepted(request, job):
+    """后台导入已提交：返回任务 id 和状态查询地址"""
+    return Response({
+        "job_id": job.job_id,
+        "status": job.status,
+        "status_url": request.build_absolute_uri(f'/api/import-jobs/{job.job_id}/'),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def dry_run_response(report):
+    """dry_run=true：只返回校验报告，不写库；有不合法的行时返回 400"""
+    if report["invalid"]:
+        return Response({"error": "Invalid data", "dry_run": True, **report}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        "message": f"{report['count']} exercises are valid", "dry_run": True, **report
+    }, status=status.HTTP_200_OK)
+
+
+def can_view_job(request, job):
+    """任务只对创建者和管理员可见"""
+    # job_id 是自增的，可以被遍历；未登录提交的任务（user 为空）只有管理员能看
+    if request.user.is_staff:
+        return True
+    return job.user_id is not None and job.user_id == request.user.pk
+
+
+class ImportJobDetailView(APIView):
+    """后台导入任务进度：已解析/已校验/已写入/失败行数，结束后附逐行错误报告"""
+
+    def get(self, request, job_id):
+        try:
+            job = ImportJob.objects.select_related('user').get(job_id=job_id)
+        except ImportJob.DoesNotExist:
+            return Response({"error": "Import job not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not can_view_job(request, job):
+            return Response({"error": "Import job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ImportJobSerializer(importing.fail_if_stale(job)).data)
+
+
 class BulkExerciseCreateView(APIView):
     # permission_classes = [IsAuthenticated]
 
     
 
     def post(self, request):
-        
-        serializer = BulkExerciseSerializer(data=request.data, many=True)
-        if serializer.is_valid():
-            try:
-                exercises = serializer.save()
-                logger.info(f"Imported {len(exercises)} exercises by user {request.user.username}")
-                return Response({"message": f"成功导入 {len(exercises)} 道练习题"}, status=status.HTTP_201_CREATED)
-            except Exception as e:
-                logger.error(f"Error importing exercises: {str(e)}")
-                return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if is_flag(request, 'dry_run'):
+            if not isinstance(request.data, list):
+                return Response({"error": "Expected a list of exercises"}, status=status.HTTP_400_BAD_REQUEST)
+            return dry_run_response(importing.validate_items(request.data))
+
+        on_duplicate = get_on_duplicate(request)
+        if on_duplicate is None:
+            return invalid_on_duplicate()
+
+        if is_async(request):
+            if not isinstance(request.data, list):
+                return Response({"error": "Expected a list of exercises"}, status=status.HTTP_400_BAD_REQUEST)
+            job = importing.create_job(data=request.data, user=request.user, on_duplicate=on_duplicate)
+            return import_job_accepted(request, job)
+
+        if not isinstance(request.data, list):
+            return Response({"error": "Expected a list of exercises"}, status=status.HTTP_400_BAD_REQUEST)
+        ingestion = importing.Ingestion(on_duplicate=on_duplicate)
+        try:
+            ingestion.write(request.data)
+        except importing.ChunkValidationError as e:
+            return Response({"error": "Invalid data", "details": e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error importing exercises: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        stats = ingestion.stats
+        logger.info(f"Imported {stats['written']} exercises by user {request.user.username}: {ingestion.summary()}")
+        return Response({
+            "message": f"成功导入 {stats['rows']} 道练习题", "skipped": stats['skipped'], "updated": stats['updated']
+        }, status=status.HTTP_201_CREATED)
 
 
 
@@ -479,6 +694,7 @@ class BulkExerciseUpdate(APIView):
 
             try:
                 updated_count = Exercise.objects.filter(exercise_id__in=exercise_ids).update(**update_data)
+                sync.exercises_changed(exercise_ids, content=False)
                 # log_user_action(request, 'update', 'Exercise', exercise_ids)  # 可选：记录日志
                 return Response({
                     "message": f"Successfully updated {updated_count} exercises",
@@ -533,7 +749,8 @@ class SchoolDetail(APIView):
         school = self.get_object(pk)
         serializer = SchoolSerializer(school, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            school = serializer.save()
+            sync.school_changed(school)
             log_user_action(request, 'update', 'School', pk)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -543,6 +760,7 @@ class SchoolDetail(APIView):
         """删除学校"""
         school = self.get_object(pk)
         school.delete()
+        sync.school_deleted(pk)
         log_user_action(request, 'delete', 'School', pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -610,7 +828,8 @@ class ExamDetail(APIView):
         exam = self.get_object(pk)
         serializer = ExamSerializer(exam, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            exam = serializer.save()
+            sync.exam_changed(exam)
             log_user_action(request, 'update', 'Exam', pk, request.data)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -620,6 +839,7 @@ class ExamDetail(APIView):
         """删除试卷"""
         exam = self.get_object(pk)
         exam.delete()
+        sync.exam_deleted(pk)
         log_user_action(request, 'delete', 'Exam', pk)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -693,6 +913,7 @@ class CategoryCreate(APIView):
         serializer = CategorySerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
+            sync.dimension_created('category')
             log_user_action(request, 'create', 'Category', details=request.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -712,7 +933,8 @@ class CategoryDetail(APIView):
             category = Category.objects.get(category_id=category_id)
             serializer = CategorySerializer(category, data=request.data, partial=True)
             if serializer.is_valid():
-                serializer.save()
+                category = serializer.save()
+                sync.dimension_changed('category', category.category_id, category.category_name)
                 log_user_action(request, 'update', 'category', category_id, request.data)
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -724,6 +946,7 @@ class CategoryDetail(APIView):
         try:
             category = Category.objects.get(category_id=category_id)
             category.delete()
+            sync.dimension_deleted('category', category_id)
             log_user_action(request, 'delete', 'Category', category_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Category.DoesNotExist:
@@ -736,6 +959,7 @@ class MajorCreate(APIView):
         serializer = MajorSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
+            sync.dimension_created('major')
             log_user_action(request, 'create', 'Major', details=request.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -755,7 +979,8 @@ class MajorDetail(APIView):
             major = Major.objects.get(major_id=major_id)
             serializer = MajorSerializer(major, data=request.data, partial=True)
             if serializer.is_valid():
-                serializer.save()
+                major = serializer.save()
+                sync.dimension_changed('major', major.major_id, major.major_name)
                 log_user_action(request, 'update', 'Major', major_id, details=request.data)
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -767,6 +992,7 @@ class MajorDetail(APIView):
         try:
             major = Major.objects.get(major_id=major_id)
             major.delete()
+            sync.dimension_deleted('major', major_id)
             log_user_action(request, 'delete', 'Major', major_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Major.DoesNotExist:
@@ -779,6 +1005,7 @@ class ChapterCreate(APIView):
         serializer = ChapterSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
+            sync.dimension_created('chapter')
             log_user_action(request, 'create', 'Chapter')
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -798,7 +1025,8 @@ class ChapterDetail(APIView):
             chapter = Chapter.objects.get(chapter_id=chapter_id)
             serializer = ChapterSerializer(chapter, data=request.data, partial=True)
             if serializer.is_valid():
-                serializer.save()
+                chapter = serializer.save()
+                sync.dimension_changed('chapter', chapter.chapter_id, chapter.chapter_name)
                 log_user_action(request, 'update', 'Chapter', chapter_id, details=request.data)
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -810,6 +1038,7 @@ class ChapterDetail(APIView):
         try:
             chapter = Chapter.objects.get(chapter_id=chapter_id)
             chapter.delete()
+            sync.dimension_deleted('chapter', chapter_id)
             log_user_action(request, 'delete', 'Chapter', chapter_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except Chapter.DoesNotExist:
@@ -822,6 +1051,7 @@ class ExamGroupCreate(APIView):
         serializer = ExamGroupSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
+            sync.dimension_created('exam_group')
             log_user_action(request, 'create', 'ExamGroup')
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -841,7 +1071,8 @@ class ExamGroupDetail(APIView):
             examgroup = ExamGroup.objects.get(examgroup_id=examgroup_id)
             serializer = ExamGroupSerializer(examgroup, data=request.data, partial=True)
             if serializer.is_valid():
-                serializer.save()
+                examgroup = serializer.save()
+                sync.dimension_changed('exam_group', examgroup.examgroup_id, examgroup.examgroup_name)
                 log_user_action(request, 'update', 'ExamGroup', examgroup_id, details=request.data)
                 return Response(serializer.data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -853,6 +1084,7 @@ class ExamGroupDetail(APIView):
         try:
             examgroup = ExamGroup.objects.get(examgroup_id=examgroup_id)
             examgroup.delete()
+            sync.dimension_deleted('exam_group', examgroup_id)
             log_user_action(request, 'delete', 'ExmaGroup', examgroup_id)
             return Response(status=status.HTTP_204_NO_CONTENT)
         except ExamGroup.DoesNotExist:
@@ -1148,83 +1380,6 @@ class InitializeRolesView(APIView):
 class ExportExercisesByCategoryView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
-    def generate_json_stream(self, exercises):
-        """生成器函数，流式生成 JSON 数据"""
-        logger.info("Starting JSON stream generation")
-        yield '['
-        first = True
-        exercise_count = 0
-
-        for exercise in exercises:
-            try:
-                exercise_count += 1
-                logger.debug(f"Processing exercise: {exercise.exercise_id}")
-                if not first:
-                    yield ','
-                first = False
-
-                exercise_data = {
-                    "exercise_id": exercise.exercise_id,
-                    "category": exercise.category.category_name if exercise.category else None,
-                    "major": exercise.major.major_name if exercise.major else None,
-                    "chapter": exercise.chapter.chapter_name if exercise.chapter else None,
-                    "examgroup": exercise.exam_group.examgroup_name if exercise.exam_group else None,
-                    "source": exercise.source.source_name if exercise.source else None,
-                    "type": exercise.exercise_type.type_name if exercise.exercise_type else None,
-                    "level": exercise.level,
-                    "score": exercise.score,
-                    "stem": exercise.stem.stem_content if exercise.stem else None,
-                    "questions": [
-                        {
-                            "question_order": q.question_order,
-                            "question_stem": q.question_stem,
-                            "question_answer": q.question_answer,
-                            "question_analysis": q.question_analysis
-                        } for q in exercise.questions.all()
-                    ],
-                    "answer": [
-                        {
-                            "answer_content": a.answer_content,
-                            "mark": a.mark,
-                            "from_model": a.from_model,
-                            "render_type": a.render_type
-                        } for a in exercise.answers.all()
-                    ],
-                    "analysis": [
-                        {
-                            "analysis_content": a.analysis_content,
-                            "mark": a.mark,
-                            "render_type": a.render_type
-                        } for a in exercise.analyses.all()
-                    ],
-                    "exercise_from": {
-                        "is_official_exercise": exercise.exercise_from.is_official_exercise if exercise.exercise_from else 0,
-                        "from_school": exercise.exercise_from.exam.from_school if exercise.exercise_from and exercise.exercise_from.exam else "",
-                        "exam_time": exercise.exercise_from.exam.exam_time if exercise.exercise_from and exercise.exercise_from.exam else "",
-                        "exam_code": exercise.exercise_from.exam.exam_code if exercise.exercise_from and exercise.exercise_from.exam else "",
-                        "exam_full_name": exercise.exercise_from.exam.exam_full_name if exercise.exercise_from and exercise.exercise_from.exam else "",
-                        "exercise_number": exercise.exercise_from.exercise_number if exercise.exercise_from else 0,
-                        "material_name": exercise.exercise_from.material_name if exercise.exercise_from else "",
-                        "section": exercise.exercise_from.section if exercise.exercise_from else "",
-                        "page_number": exercise.exercise_from.page_number if exercise.exercise_from else 0
-                    },
-                    "image_links": [
-                        {
-                            "image_link": img.image_link,
-                            "source_type": img.source_type,
-                            "is_deprecated": img.is_deprecated,
-                            "ocr_result": img.ocr_result
-                        } for img in exercise.exercise_images.all()
-                    ]
-                }
-                yield json.dumps(exercise_data, ensure_ascii=False, cls=DjangoJSONEncoder)
-            except Exception as e:
-                logger.error(f"Error processing exercise {exercise.exercise_id}: {str(e)}")
-                continue
-
-        yield ']'
-        logger.info(f"Finished generating JSON stream, total exercises: {exercise_count}")
-
     def get(self, request, category_id):
         
         try:
@@ -1233,109 +1388,83 @@ class ExportExercisesByCategoryView(APIView):
             return Response({"error": "Category not found"}, status=404)
 
         
-        exercises = Exercise.objects.filter(category=category).order_by('exercise_id').select_related(
-                    'exercise_type', 'category', 'major', 'chapter', 'exam_group', 'source', 'stem', 'answer', 'analysis', 'exercise_from'
-                    ).prefetch_related(
-                    'questions', 'answers', 'analyses', 'exercise_from__exam', 'exercise_images'
-                    ).iterator(chunk_size=500)
+        encoding = get_export_encoding(request)
+        if encoding not in (None, *exporting.available_encodings()):
+            return invalid_compress()
+        exercises = Exercise.objects.filter(category=category)
 
-        total_exercises = Exercise.objects.filter(category=category).count()
+        total_exercises = exercises.count()
         logger.info(f"Exporting {total_exercises} exercises for category {category_id}")
 
-        response = StreamingHttpResponse(
-            self.generate_json_stream(exercises),
-            content_type='application/json'
+        # ?ndjson=true 每行一个对象，?gzip=true 下载 .gz 文件，否则按 Accept-Encoding / ?compress= 传输压缩；
+        # 数据未变时直接返回缓存文件（支持 ETag / Range）
+        response = export_cache.response(
+            request, exercises, {'category_id': category_id}, f'exercises_category_{category_id}',
+            ndjson=is_flag(request, 'ndjson'), gzip=is_flag(request, 'gzip'), encoding=encoding
         )
-        response['Content-Disposition'] = f'attachment; filename="exercises_category_{category_id}.json"'
         log_user_action(request, 'export')
         return response
 
+    def post(self, request, category_id):
+        """后台导出：参数同 GET，立即返回任务 id，完成后从下载地址取文件"""
+        try:
+            category = Category.objects.get(category_id=category_id)
+        except Category.DoesNotExist:
+            return Response({"error": "Category not found"}, status=404)
 
-class ExportExercisesView(APIView):
+        job = exporting.create_job(category, request.user, ndjson=is_flag(request, 'ndjson'), gzip=is_flag(request, 'gzip'))
+        log_user_action(request, 'export', 'ExportJob', object_id=job.job_id, details={'category_id': category_id})
+        return Response({
+            "job_id": job.job_id,
+            "status": job.status,
+            "status_url": request.build_absolute_uri(f'/api/export-jobs/{job.job_id}/'),
+            "download_url": request.build_absolute_uri(f'/api/export-jobs/{job.job_id}/download/'),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+def get_export_job(request, job_id):
+    """按 id 取导出任务；不存在或当前用户无权查看（见 can_view_job）时返回 None"""
+    try:
+        job = ExportJob.objects.select_related('user').get(job_id=job_id)
+    except ExportJob.DoesNotExist:
+        return None
+    return job if can_view_job(request, job) else None
+
+
+class ExportJobDetailView(APIView):
+    """后台导出任务进度：题目总数 / 已写入条数，完成后附文件大小"""
     permission_classes = [IsAuthenticated, IsAdminUser]
-    def generate_json_stream(self, exercises):
-        """生成器函数，流式生成 JSON 数据"""
-        logger.info("Starting JSON stream generation")
-        yield '['
-        batch = []
-        batch_size = 10  # 每批次处理 10 条记录
-        exercise_count = 0
-
-        for exercise in exercises:
-            try:
-                exercise_count += 1
-                logger.debug(f"Processing exercise: {exercise.exercise_id}")
-
-                exercise_data = {
-                    "exercise_id": exercise.exercise_id,
-                    "category": exercise.category.category_name if exercise.category else None,
-                    "major": exercise.major.major_name if exercise.major else None,
-                    "chapter": exercise.chapter.chapter_name if exercise.chapter else None,
-                    "examgroup": exercise.exam_group.examgroup_name if exercise.exam_group else None,
-                    "source": exercise.source.source_name if exercise.source else None,
-                    "type": exercise.exercise_type.type_name if exercise.exercise_type else None,
-                    "level": exercise.level,
-                    "score": exercise.score,
-                    "stem": exercise.stem.stem_content if exercise.stem else None,
-                    "questions": [
-                        {
-                            "question_order": q.question_order,
-                            "question_stem": q.question_stem,
-                            "question_answer": q.question_answer,
-                            "question_analysis": q.question_analysis
-                        } for q in exercise.questions.all()
-                    ],
-                    "answer": [
-                        {
-                            "answer_content": a.answer_content,
-                            "mark": a.mark,
-                            "from_model": a.from_model,
-                            "render_type": a.render_type,
-                            "answer_order": a.answer_order
-                        } for a in exercise.answers.all()
-                    ],
-                    "analysis": [
-                        {
-                            "analysis_content": a.analysis_content,
-                            "mark": a.mark,
-                            "render_type": a.render_type
-                        } for a in exercise.analyses.all()
-                    ],
-                    "exercise_from": {
-                        "is_official_exercise": exercise.exercise_from.is_official_exercise if exercise.exercise_from else 0,
-                        "from_school": exercise.exercise_from.exam.from_school if exercise.exercise_from and exercise.exercise_from.exam else "",
-                        "exam_time": exercise.exercise_from.exam.exam_time if exercise.exercise_from and exercise.exercise_from.exam else "",
-                        "exam_code": exercise.exercise_from.exam.exam_code if exercise.exercise_from and exercise.exercise_from.exam else "",
-                        "exam_full_name": exercise.exercise_from.exam.exam_full_name if exercise.exercise_from and exercise.exercise_from.exam else "",
-                        "exercise_number": exercise.exercise_from.exercise_number if exercise.exercise_from else 0,
-                        "material_name": exercise.exercise_from.material_name if exercise.exercise_from else "",
-                        "section": exercise.exercise_from.section if exercise.exercise_from else "",
-                        "page_number": exercise.exercise_from.page_number if exercise.exercise_from else 0
-                    },
-                    "image_links": [
-                        {
-                            "image_link": img.image_link,
-                            "source_type": img.source_type,
-                            "is_deprecated": img.is_deprecated,
-                            "ocr_result": img.ocr_result
-                        } for img in exercise.exercise_images.all()
-                    ]
-                }
-                batch.append(exercise_data)
-
-                if len(batch) >= batch_size:
-                    yield json.dumps(batch, ensure_ascii=False, cls=DjangoJSONEncoder)[1:-1]
-                    batch = []
-                    yield ',' if exercise_count < total_exercises else ''
 
-            except Exception as e:
-                logger.error(f"Error processing exercise {exercise.exercise_id}: {str(e)}")
-                continue
+    def get(self, request, job_id):
+        job = get_export_job(request, job_id)
+        if job is None:
+            return Response({"error": "Export job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ExportJobSerializer(exporting.fail_if_stale(job)).data)
 
-        if batch:  # 处理剩余的 batch
-            yield json.dumps(batch, ensure_ascii=False, cls=DjangoJSONEncoder)[1:-1]
-        yield ']'
-        logger.info(f"Finished generating JSON stream, total exercises: {exercise_count}")
+
+class ExportJobDownloadView(APIView):
+    """下载已完成的导出文件，支持 Range 断点续传"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def get(self, request, job_id):
+        job = get_export_job(request, job_id)
+        if job is None:
+            return Response({"error": "Export job not found"}, status=status.HTTP_404_NOT_FOUND)
+        job = exporting.fail_if_stale(job)
+        if job.status != 'succeeded':
+            return Response(
+                {"error": "Export job is not finished", "status": job.status}, status=status.HTTP_409_CONFLICT
+            )
+        content_type, ext = exporting.output_format(ndjson=job.ndjson, gzip=job.gzip)
+        response = export_cache.file_response(request, job.file_path, content_type, f'"export-job-{job.job_id}"')
+        if response is None:
+            return Response({"error": "Export file not found"}, status=status.HTTP_404_NOT_FOUND)
+        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(job.file_path)}"'
+        return response
+
+
+class ExportExercisesView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request):
         # 获取查询参数
@@ -1347,11 +1476,7 @@ class ExportExercisesView(APIView):
         exam_id = request.query_params.get('exam_id')
 
         # 构建查询集
-        exercises = Exercise.objects.select_related(
-            'exercise_type', 'category', 'major', 'chapter', 'exam_group', 'source', 'stem', 'answer', 'analysis', 'exercise_from'
-        ).prefetch_related(
-            'questions', 'answers', 'analyses', 'exercise_from__exam', 'exercise_images'
-        )
+        exercises = Exercise.objects.all()
 
         # 应用过滤条件
         filters_applied = False
@@ -1406,14 +1531,17 @@ class ExportExercisesView(APIView):
         # 如果没有任何过滤条件，返回错误
         if not filters_applied:
             return Response({"error": "At least one filter parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
+        encoding = get_export_encoding(request)
+        if encoding not in (None, *exporting.available_encodings()):
+            return invalid_compress()
+        columnar_format = request.query_params.get('columnar')
+        if columnar_format and columnar_format not in columnar.available_formats():
+            choices = ', '.join(columnar.available_formats())
+            return Response({"error": f"columnar must be one of: {choices}"}, status=status.HTTP_400_BAD_REQUEST)
 
         # 计算总数用于日志
-        global total_exercises
         total_exercises = exercises.count()
 
-        # 按 exercise_id 排序并转换为生成器
-        exercises = exercises.order_by('exercise_id').iterator(chunk_size=500)
-
         # 记录日志
         logger.info(f"Exporting {total_exercises} exercises with filters: "
                     f"category_id={category_id}, major_id={major_id}, chapter_id={chapter_id}, "
@@ -1434,14 +1562,22 @@ class ExportExercisesView(APIView):
         if exam_id:
             filename_parts.append(f"exam_{exam_id}")
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"exercises_{'_'.join(filename_parts)}_{timestamp}.json" if filename_parts else f"exercises_{timestamp}.json"
+        filename = f"exercises_{'_'.join(filename_parts)}_{timestamp}" if filename_parts else f"exercises_{timestamp}"
 
-        # 返回流式响应
-        response = StreamingHttpResponse(
-            self.generate_json_stream(exercises),
-            content_type='application/json'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # 返回流式响应：?ndjson=true 每行一个对象，?gzip=true 下载 .gz 文件，否则按 Accept-Encoding / ?compress= 传输压缩；
+        # 同一组筛选条件在数据未变时读缓存文件
+        filters = {
+            'category_id': category_id, 'major_id': major_id, 'chapter_id': chapter_id,
+            'examgroup_id': examgroup_id, 'school_id': school_id, 'exam_id': exam_id,
+        }
+        if columnar_format:
+            # ?columnar=csv|parquet：每个实体一张平铺表，打包为 zip，供分析按列读取
+            response = columnar.streaming_response(exercises, filename, columnar_format)
+        else:
+            response = export_cache.response(
+                request, exercises, filters, filename,
+                ndjson=is_flag(request, 'ndjson'), gzip=is_flag(request, 'gzip'), encoding=encoding
+            )
         log_user_action(request, 'export', 'Exercise', details={
             'category_id': category_id,
             'major_id': major_id,
@@ -1449,7 +1585,8 @@ class ExportExercisesView(APIView):
             'examgroup_id': examgroup_id,
             'school_id': school_id,
             'exam_id': exam_id,
-            'total_exercises': total_exercises
+            'total_exercises': total_exercises,
+            'columnar': columnar_format
         })
         return response
 
@@ -1463,59 +1600,130 @@ class ImportExercisesView(APIView):
         if not file_obj or not isinstance(file_obj, UploadedFile):
             logger.error("No valid file uploaded in request")
             return Response({"error": "No valid file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        # JSON 数组或 NDJSON（?ndjson=true 或 .ndjson / .jsonl 扩展名），均可 gzip 压缩
+        ndjson = is_flag(request, 'ndjson') or importing.is_ndjson(file_obj.name)
+
+        if is_flag(request, 'dry_run'):
+            try:
+                return dry_run_response(importing.validate_items(importing.iter_items(file_obj, ndjson)))
+            except UnicodeDecodeError:
+                return Response({"error": "File must be UTF-8 encoded"}, status=status.HTTP_400_BAD_REQUEST)
+            except json.JSONDecodeError as e:
+                return Response({"error": f"Invalid JSON format: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+            except importing.COMPRESSION_ERRORS as e:
+                return Response({"error": f"Invalid gzip file: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        on_duplicate = get_on_duplicate(request)
+        if on_duplicate is None:
+            return invalid_on_duplicate()
+
+        if is_async(request):
+            job = importing.create_job(fileobj=file_obj, user=request.user, on_duplicate=on_duplicate, ndjson=ndjson)
+            log_user_action(request, 'import', 'Exercise', job.job_id, details={'filename': file_obj.name, 'async': True})
+            return import_job_accepted(request, job)
+
+        if is_flag(request, 'chunked'):
+            return self.import_checkpointed(request, file_obj, on_duplicate, ndjson)
 
         try:
-            raw_data = file_obj.read()
-            decoded_data = raw_data.decode('utf-8').strip()
-            if decoded_data.startswith('\ufeff'):
-                decoded_data = decoded_data[1:]
-
-            exercises_data = json.loads(decoded_data)
-            logger.info(f"Parsed {len(exercises_data)} exercises from file")
-            if not isinstance(exercises_data, list):
-                logger.debug("Data is not a list, converting to single-item list")
-                exercises_data = [exercises_data]
-
-            # 使用 BulkExerciseSerializer
-            bulk_serializer = BulkExerciseSerializer(data=exercises_data)
-            if bulk_serializer.is_valid():
-                with transaction.atomic():
-                    exercises = bulk_serializer.save()
-                    count = len(exercises)
-                    logger.info(f"Imported {count} exercises by user {request.user.username}")
-                    log_user_action(request, 'import', 'Exercise', details={
-                        'count': count,
-                        'filename': file_obj.name
-                    })
-                    return Response({
-                        "message": f"Successfully imported {count} exercises",
-                        "count": count
-                    }, status=status.HTTP_201_CREATED)
-            else:
-                logger.error(f"Bulk validation errors: {bulk_serializer.errors}")
-                # 格式化错误信息
-                error_detail = {
-                    "error": "Invalid data",
-                    "details": bulk_serializer.errors
-                }
-                return Response(error_detail, status=status.HTTP_400_BAD_REQUEST)
+            # 流式解析 + 分块校验写入，内存只与块大小有关；整个文件仍在一个事务里，任一块失败整体回滚
+            ingestion = importing.Ingestion(on_duplicate=on_duplicate)
+            with transaction.atomic():
+                stats = ingestion.run(importing.iter_items(file_obj, ndjson))
+            count = stats['rows']
+            logger.info(f"Imported {count} exercises by user {request.user.username}: {ingestion.summary()}")
+            log_user_action(request, 'import', 'Exercise', details={
+                'count': count,
+                'filename': file_obj.name,
+                'skipped': stats['skipped'],
+                'updated': stats['updated'],
+            })
+            return Response({
+                "message": f"Successfully imported {count} exercises",
+                "count": count,
+                "skipped": stats['skipped'],
+                "updated": stats['updated'],
+            }, status=status.HTTP_201_CREATED)
 
+        except importing.ChunkValidationError as e:
+            logger.error(f"Bulk validation errors: {e.errors}")
+            # 格式化错误信息：index 为出错题目在文件中的序号
+            error_detail = {
+                "error": "Invalid data",
+                "details": e.errors
+            }
+            return Response(error_detail, status=status.HTTP_400_BAD_REQUEST)
         except UnicodeDecodeError as e:
             logger.error(f"Unicode decode error: {str(e)}")
             return Response({"error": "File must be UTF-8 encoded"}, status=status.HTTP_400_BAD_REQUEST)
         except json.JSONDecodeError as e:
             logger.error(f"JSON decode error: {str(e)}")
             return Response({"error": f"Invalid JSON format: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+        except importing.COMPRESSION_ERRORS as e:
+            logger.error(f"Gzip decode error: {str(e)}")
+            return Response({"error": f"Invalid gzip file: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             logger.error(f"Import error: {str(e)}")
             return Response({"error": f"Server error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def import_checkpointed(self, request, file_obj, on_duplicate='create', ndjson=False):
+        """
+        分块提交模式（?chunked=true）：每块单独提交并记录检查点，失败时已提交的块保留；
+        修复问题后重新上传同一文件，从检查点继续。?restart=true 忽略检查点从头导入。
+        """
+        checkpoint = importing.get_checkpoint(
+            importing.file_sha256(file_obj), filename=file_obj.name, restart=is_flag(request, 'restart')
+        )
+        resumed_from = checkpoint.rows_committed
+        progress = {"checkpoint_id": checkpoint.checkpoint_id, "resumed_from": resumed_from}
+        ingestion = importing.Ingestion(on_duplicate=on_duplicate)
+        try:
+            count = importing.import_checkpointed(
+                importing.iter_items(file_obj, ndjson), checkpoint, write_chunk=ingestion.write
+            )
+        except importing.ChunkValidationError as e:
+            logger.error(f"Bulk validation errors: {e.errors}")
+            return Response({
+                "error": "Invalid data", "details": e.errors, "rows_committed": checkpoint.rows_committed, **progress
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except importing.CheckpointConflict:
+            return Response({"error": "This file is already being imported"}, status=status.HTTP_409_CONFLICT)
+        except UnicodeDecodeError as e:
+            logger.error(f"Unicode decode error: {str(e)}")
+            return Response({"error": "File must be UTF-8 encoded"}, status=status.HTTP_400_BAD_REQUEST)
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON decode error: {str(e)}")
+            return Response({
+                "error": f"Invalid JSON format: {str(e)}", "rows_committed": checkpoint.rows_committed, **progress
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except importing.COMPRESSION_ERRORS as e:
+            logger.error(f"Gzip decode error: {str(e)}")
+            return Response({
+                "error": f"Invalid gzip file: {str(e)}", "rows_committed": checkpoint.rows_committed, **progress
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Import error: {str(e)}")
+            return Response({
+                "error": f"Server error: {str(e)}", "rows_committed": checkpoint.rows_committed, **progress
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-
+        logger.info(f"Imported {count} exercises (resumed from {resumed_from}) by user {request.user.username}")
+        log_user_action(request, 'import', 'Exercise', details={
+            'count': count, 'filename': file_obj.name, 'resumed_from': resumed_from
+        })
+        return Response({
+            "message": f"Successfully imported {count} exercises",
+            "count": count,
+            "rows_committed": checkpoint.rows_committed,
+            "skipped": ingestion.stats['skipped'],
+            "updated": ingestion.stats['updated'],
+            **progress,
+        }, status=status.HTTP_201_CREATED)
 
 
 class UserActionLogListView(generics.ListAPIView):
     permission_classes = [IsAdminUser]  # 保持注释状态
+    pagination_class = StandardPagination
     queryset = UserActionLog.objects.select_related('user').order_by('-timestamp')
     serializer_class = UserActionLogSerializer
 
@@ -0,0 +1,7 @@
+# Celery 为可选依赖：未安装时（IMPORT_JOB_MODE = 'thread' / 'eager'）不影响 Django 启动
+try:
+    from .celery import app as celery_app
+except ImportError:
+    celery_app = None
+
+__all__ = ("celery_app",)
@@ -86,6 +86,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     'corsheaders.middleware.CorsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.QueryStatsMiddleware',
 ]
 
 INTERNAL_IPS = [
@@ -158,3 +159,58 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 CORS_ALLOW_ALL_ORIGINS = True  # 开发时允许所有来源，生产时需配置白名单
 
 AUTH_USER_MODEL = 'core.User'
+
+# 题目列表走扁平读模型（exercise_read_model）；迁移 0009 会为已有题目补齐行，数据不一致时可执行 python manage.py rebuild_read_model
+EXERCISE_LIST_USE_READ_MODEL = True
+
+# 共享缓存：列表/计数/层级树/导出文件的失效代数都存在这里，多个 worker 必须看到同一份
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/1'),
+    }
+}
+# 只有单个进程处理请求（runserver、测试）时才可设为 True，允许用进程内缓存（LocMemCache）保存代数；
+# 否则进程内缓存上的列表/计数/导出缓存自动关闭
+CACHE_SINGLE_PROCESS = False
+
+# ExerciseList 响应缓存（使用 CACHES 中的别名，须为共享缓存），写入时按分类失效
+EXERCISE_LIST_CACHE_ENABLED = True
+EXERCISE_LIST_CACHE_ALIAS = 'default'
+EXERCISE_LIST_CACHE_TIMEOUT = 300
+
+# 按请求统计 SQL 条数/耗时/重复查询（DEBUG 下写响应头，生产环境聚合到 /api/metrics/queries/）
+QUERY_STATS_ENABLED = False
+
+# 分页总数：精确计数按 SQL + 表代数缓存 COUNT_CACHE_TIMEOUT 秒；
+# 数据库估算行数不低于 COUNT_ESTIMATE_THRESHOLD 时直接返回估算值（None 表示始终精确计数）
+COUNT_CACHE_ENABLED = True
+COUNT_CACHE_TIMEOUT = 30
+COUNT_ESTIMATE_THRESHOLD = 100000
+
+# 题目导入每次校验/写入的条数
+IMPORT_CHUNK_SIZE = 200
+# 批量导入使用编译后的整批校验（core/validation.py），错误信息与 DRF 逐条校验一致；False 时退回 DRF
+IMPORT_COMPILED_VALIDATION = True
+
+# 后台导入任务：celery（需运行 worker）| thread（当前进程后台线程，仅单进程部署；worker 被回收时任务中断）| eager（请求内同步执行）
+IMPORT_JOB_MODE = 'celery'
+# 执行中的任务超过这么多秒没有进度即视为中断，查询时标记为失败
+IMPORT_JOB_STALE_TIMEOUT = 600
+IMPORT_JOB_DIR = os.path.join(os.path.dirname(BASE_DIR), 'media', 'imports')
+IMPORT_JOB_MAX_ERRORS = 1000
+
+# 题目导出每块取数/编码的条数（每块 5 条查询）
+EXPORT_CHUNK_SIZE = 1000
+# 导出文件缓存：按筛选条件 + 数据代数存文件，重复下载直接读文件（ETag / Range），数据写入后清理过期代数的文件；
+# 代数依赖共享缓存，进程内缓存（未设 CACHE_SINGLE_PROCESS）时自动关闭
+EXPORT_CACHE_ENABLED = True
+EXPORT_CACHE_DIR = os.path.join(os.path.dirname(BASE_DIR), 'media', 'exports', 'cache')
+# 后台分类导出任务：取值同 IMPORT_JOB_MODE；完成的文件保存在 EXPORT_JOB_DIR
+EXPORT_JOB_MODE = 'celery'
+# 执行中的导出任务超过这么多秒没有进度即视为中断，查询时标记为失败
+EXPORT_JOB_STALE_TIMEOUT = 600
+EXPORT_JOB_DIR = os.path.join(os.path.dirname(BASE_DIR), 'media', 'exports', 'jobs')
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_TASK_IGNORE_RESULT = True
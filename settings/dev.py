@@ -20,3 +20,14 @@ DATABASES = {
         }
     }
 }
+
+# 本地开发使用进程内缓存，runserver 只有一个进程
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+CACHE_SINGLE_PROCESS = True
+# runserver 单进程，后台导入/导出在本进程线程中执行，不需要 Celery worker
+IMPORT_JOB_MODE = 'thread'
+EXPORT_JOB_MODE = 'thread'
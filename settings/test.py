@@ -20,3 +20,14 @@ DATABASES = {
         }
     }
 }
+
+# 测试在单进程内运行，用进程内缓存，不依赖 Redis
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+CACHE_SINGLE_PROCESS = True
+# 后台导入/导出在请求内同步执行，不需要 Celery broker
+IMPORT_JOB_MODE = 'eager'
+EXPORT_JOB_MODE = 'eager'